@@ -0,0 +1,50 @@
+"""
+API를 사용할 사용자를 만들고 접근 토큰을 발급합니다.
+
+실행: python -m app.cli.create_user [--name 홍길동]
+      python -m app.cli.create_user --rotate <사용자 ID>
+
+새 토큰은 한 번만 출력되며, 데이터베이스에는 토큰의 SHA-256 해시만 저장하므로 잃어버리면 다시 확인할 수 없습니다.
+이때는 --rotate로 같은 사용자에게 새 토큰을 발급하면 이전 토큰은 더 이상 사용할 수 없습니다.
+클라이언트는 발급받은 토큰을 Authorization: Bearer <토큰> 헤더로 보냅니다.
+ACCESS_TOKEN 환경 변수의 토큰은 계속 기본 사용자로 인증됩니다.
+"""
+import argparse
+import asyncio
+import secrets
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.database import users_collection, ensure_indexes
+from app.dependencies.auth import hash_token
+
+# 토큰 길이 (바이트, URL-safe Base64로 약 43자)
+TOKEN_BYTES = 32
+
+
+async def main(args: argparse.Namespace) -> None:
+    await ensure_indexes()
+    token = secrets.token_urlsafe(TOKEN_BYTES)
+    now = datetime.now(timezone.utc)
+
+    if args.rotate:
+        result = await users_collection.update_one(
+            {"_id": ObjectId(args.rotate)}, {"$set": {"token_hash": hash_token(token), "token_issued_at": now}})
+        if not result.matched_count:
+            raise SystemExit(f"User not found: {args.rotate}")
+        user_id = args.rotate
+    else:
+        result = await users_collection.insert_one(
+            {"name": args.name, "token_hash": hash_token(token), "created_at": now, "token_issued_at": now})
+        user_id = str(result.inserted_id)
+
+    print(f"user_id: {user_id}")
+    print(f"token:   {token}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API를 사용할 사용자를 만들고 접근 토큰을 발급합니다.")
+    parser.add_argument("--name", default="", help="사용자를 구분하기 위한 이름")
+    parser.add_argument("--rotate", default="", help="새 토큰을 발급할 기존 사용자 ID")
+    asyncio.run(main(parser.parse_args()))
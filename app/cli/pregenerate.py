@@ -0,0 +1,177 @@
+"""
+자주 찾는 요리와 식재료를 미리 생성하고, 다른 인스턴스가 시작할 때 읽을 수 있는 시드 팩을 기록합니다.
+
+실행: python -m app.cli.pregenerate --recipes dishes.txt --ingredients ingredients.txt --output seed.ndjson.gz
+      [--concurrency 4] [--cooking-steps] [--batch]
+
+이름 파일은 한 줄에 이름 하나씩 적습니다. 이미 저장된 이름은 다시 생성하지 않습니다.
+--batch를 지정하면 텍스트 생성을 Batch API로 한꺼번에 제출하여 비용을 줄이고 (최대 24시간 소요),
+이미지 생성과 저장은 결과를 받은 뒤 동시 실행 수를 제한하여 진행합니다.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List
+
+from app.config import client as openai_client
+from app.database import recipe_collection, ingredients_info_collection, cooking_step_collection, ensure_indexes
+from app.models.recipe.cooking_step_models import CookingStepRequest
+from app.models.recipe.ingredient_info_models import IngredientRequest
+from app.models.recipe.recipe_models import RecipeRequest
+from app.routes.recipe.cooking_step import generate_cooking_step
+from app.routes.recipe.ingredient_info import generate_ingredient_info, ingredient_messages, \
+    save_generated_ingredient_info
+from app.routes.recipe.recipe import generate_recipe, recipe_messages, save_generated_recipe
+from app.utils.cancellation import GenerationContext
+from app.utils.image_utils import close_http_client
+from app.utils.llm_utils import models_for_route
+from app.utils.seed_pack import write_seed_pack
+
+# Batch API 작업 상태를 확인하는 간격 (초)
+BATCH_POLL_INTERVAL = 30
+_BATCH_DONE = ("completed", "failed", "expired", "cancelled")
+
+
+def read_names(path: str) -> List[str]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as file:
+        return list(dict.fromkeys(line.strip() for line in file if line.strip()))
+
+
+async def missing_names(collection, names: List[str]) -> List[str]:
+    stored = {document["name"] async for document in collection.find({"name": {"$in": names}}, {"name": 1})}
+    return [name for name in names if name not in stored]
+
+
+async def run_bounded(jobs: Dict[str, Callable[[], Awaitable]], concurrency: int) -> int:
+    """
+    작업을 최대 concurrency개씩 동시에 실행하고 실패한 작업 수를 반환합니다. 실패한 작업은 기록만 하고 넘어갑니다.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def run(name: str, job: Callable[[], Awaitable]):
+        nonlocal failures
+        async with semaphore:
+            try:
+                await job()
+                logging.info(f"Generated {name}")
+            except Exception as e:
+                failures += 1
+                logging.error(f"Failed to generate {name}: {e}")
+
+    await asyncio.gather(*(run(name, job) for name, job in jobs.items()))
+    return failures
+
+
+async def run_batch(route: str, requests: Dict[str, List[dict]]) -> Dict[str, tuple]:
+    """
+    Chat Completion 요청을 Batch API로 제출하고 완료될 때까지 기다린 뒤, 이름별 (응답 내용, 모델)을 반환합니다.
+    """
+    model = models_for_route(route)[0]
+    lines = [json.dumps({
+        "custom_id": name,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {"model": model, "messages": messages},
+    }, ensure_ascii=False) for name, messages in requests.items()]
+    batch_file = io.BytesIO("\n".join(lines).encode("utf-8"))
+    uploaded = await openai_client.files.create(file=(f"{route}.jsonl", batch_file), purpose="batch")
+    batch = await openai_client.batches.create(input_file_id=uploaded.id, endpoint="/v1/chat/completions",
+                                               completion_window="24h")
+    logging.info(f"Submitted batch {batch.id} with {len(lines)} {route} requests")
+
+    while batch.status not in _BATCH_DONE:
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        batch = await openai_client.batches.retrieve(batch.id)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+
+    output = await openai_client.files.content(batch.output_file_id)
+    results = {}
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") != 200:
+            logging.error(f"Batch request {result['custom_id']} failed: {result.get('error')}")
+            continue
+        body = response["body"]
+        results[result["custom_id"]] = (body["choices"][0]["message"]["content"], body["model"])
+    return results
+
+
+async def generate_recipes(names: List[str], concurrency: int, batch: bool) -> int:
+    if not batch:
+        return await run_bounded({name: lambda name=name: generate_recipe(
+            RecipeRequest(food_name=name), None, GenerationContext()) for name in names}, concurrency)
+
+    requests = {name: await recipe_messages(RecipeRequest(food_name=name), None) for name in names}
+    results = await run_batch("recipe", requests)
+    failures = len(names) - len(results)
+    return failures + await run_bounded({name: lambda content=content, model=model: save_generated_recipe(
+        content, model, GenerationContext()) for name, (content, model) in results.items()}, concurrency)
+
+
+async def generate_ingredients(names: List[str], concurrency: int, batch: bool) -> int:
+    if not batch:
+        return await run_bounded({name: lambda name=name: generate_ingredient_info(
+            IngredientRequest(ingredient_name=name), GenerationContext()) for name in names}, concurrency)
+
+    requests = {name: ingredient_messages(IngredientRequest(ingredient_name=name)) for name in names}
+    results = await run_batch("ingredient_info", requests)
+    failures = len(names) - len(results)
+    return failures + await run_bounded({name: lambda content=content, model=model: save_generated_ingredient_info(
+        content, model, GenerationContext()) for name, (content, model) in results.items()}, concurrency)
+
+
+async def generate_cooking_steps(recipe_names: List[str], concurrency: int) -> int:
+    jobs = {}
+    async for recipe in recipe_collection.find({"name": {"$in": recipe_names}}, {"instructions.step": 1}):
+        recipe_id = str(recipe["_id"])
+        stored = {step["step_number"] async for step in
+                  cooking_step_collection.find({"recipe_id": recipe_id}, {"step_number": 1})}
+        for number in range(1, len(recipe.get("instructions", [])) + 1):
+            if number not in stored:
+                request = CookingStepRequest(recipe_id=recipe_id, step_number=number)
+                jobs[f"{recipe_id} step {number}"] = \
+                    lambda request=request: generate_cooking_step(request, GenerationContext())
+    return await run_bounded(jobs, concurrency)
+
+
+async def main(args: argparse.Namespace) -> None:
+    await ensure_indexes()
+    recipe_names = read_names(args.recipes)
+    ingredient_names = read_names(args.ingredients)
+
+    try:
+        failures = await generate_recipes(await missing_names(recipe_collection, recipe_names),
+                                          args.concurrency, args.batch)
+        failures += await generate_ingredients(await missing_names(ingredients_info_collection, ingredient_names),
+                                               args.concurrency, args.batch)
+        if args.cooking_steps:
+            failures += await generate_cooking_steps(recipe_names, args.concurrency)
+    finally:
+        await close_http_client()
+
+    if args.output:
+        counts = await write_seed_pack(args.output, recipe_names, ingredient_names, args.cooking_steps)
+        logging.info(f"Wrote seed pack {args.output}: {counts}")
+    if failures:
+        logging.warning(f"{failures} items failed; run again to retry them")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="요리와 식재료 정보를 미리 생성하고 시드 팩을 기록합니다.")
+    parser.add_argument("--recipes", default="", help="요리 이름 파일 (한 줄에 하나)")
+    parser.add_argument("--ingredients", default="", help="식재료 이름 파일 (한 줄에 하나)")
+    parser.add_argument("--output", default="", help="기록할 시드 팩 경로 (.ndjson.gz)")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 생성하는 항목 수")
+    parser.add_argument("--cooking-steps", action="store_true", help="레시피의 모든 조리 단계도 생성")
+    parser.add_argument("--batch", action="store_true", help="텍스트 생성을 Batch API로 제출")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,199 @@
+"""
+컬렉션을 gzip 압축 NDJSON 파일로 내보내고 가져옵니다.
+
+실행: python -m app.cli.transfer export --dir backup [--split-images] [--collections recipes,cooking_steps]
+      python -m app.cli.transfer import --dir backup [--collections ...]
+
+컬렉션마다 <이름>.ndjson.gz 파일 하나에 한 줄에 문서 하나씩 기록합니다.
+--split-images를 지정하면 이미지를 images/<컬렉션>/<문서 ID>.<확장자> 파일로 따로 저장하고 문서에는 경로만 남깁니다.
+내보내기와 가져오기 모두 커서와 파일을 배치 단위로 흘려보내므로 메모리 사용량은 컬렉션 크기와 관계없습니다.
+
+가져오기는 _id를 유지한 채 순서 없는 일괄 삽입을 사용하며, 배치가 끝날 때마다 진행 상황을 기록합니다.
+중간에 실패하면 같은 명령을 다시 실행하여 마지막으로 끝난 배치 다음부터 이어서 가져옵니다.
+가져온 레시피는 서버를 다시 시작해야 검색 색인에 반영됩니다.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import mimetypes
+import os
+from typing import Dict, List
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from app.config import IMAGE_STORAGE
+from app.database import recipe_collection, cooking_step_collection, ingredients_info_collection, \
+    refrigerator_collection, preference_collection
+from app.utils.image_storage import IMAGE_URL_PREFIX, portable_image, read_image, store_image
+from app.utils.versioning import reset_changes
+
+# 파일 이름 → 컬렉션 (레시피를 조리 단계보다 먼저 가져옴)
+TRANSFER_COLLECTIONS = {
+    "recipes": recipe_collection,
+    "ingredients_info": ingredients_info_collection,
+    "cooking_steps": cooking_step_collection,
+    "refrigerator": refrigerator_collection,
+    "preferences": preference_collection,
+}
+
+# 변경 로그로 동기화하는 사용자별 컬렉션
+_USER_COLLECTIONS = ("refrigerator", "preferences")
+
+_PROGRESS_FILE = "import_progress.json"
+_DUPLICATE_KEY = 11000
+
+
+def _selected(collections: str) -> List[str]:
+    names = [name.strip() for name in collections.split(",") if name.strip()] if collections \
+        else list(TRANSFER_COLLECTIONS)
+    unknown = [name for name in names if name not in TRANSFER_COLLECTIONS]
+    if unknown:
+        raise SystemExit(f"Unknown collections: {', '.join(unknown)}")
+    return names
+
+
+async def export_collection(directory: str, name: str, split_images: bool, batch_size: int) -> int:
+    """
+    컬렉션 하나를 파일로 내보냅니다. 임시 파일에 기록한 뒤 이름을 바꾸므로 중단되어도 이전 파일이 남습니다.
+    """
+    path = os.path.join(directory, f"{name}.ndjson.gz")
+    image_directory = os.path.join(directory, "images", name)
+    count = 0
+    with gzip.open(f"{path}.tmp", "wt", encoding="utf-8") as file:
+        async for document in TRANSFER_COLLECTIONS[name].find({}).batch_size(batch_size):
+            image = document.get("image_base64")
+            if image and split_images:
+                data, mime_type = await read_image(image)
+                extension = mimetypes.guess_extension(mime_type) or ".bin"
+                relative_path = os.path.join("images", name, f"{document['_id']}{extension}")
+                os.makedirs(image_directory, exist_ok=True)
+                with open(os.path.join(directory, relative_path), "wb") as image_file:
+                    image_file.write(data)
+                del document["image_base64"]
+                document["image_file"] = relative_path
+            elif image:
+                # GridFS에 저장된 이미지는 다른 인스턴스에서 읽을 수 없으므로 data URL로 바꿔서 기록
+                document["image_base64"] = await portable_image(image)
+            file.write(json_util.dumps(document) + "\n")
+            count += 1
+    os.replace(f"{path}.tmp", path)
+    return count
+
+
+async def _restore_image(directory: str, document: dict) -> None:
+    image_file = document.pop("image_file", None)
+    if image_file:
+        with open(os.path.join(directory, image_file), "rb") as file:
+            data = file.read()
+        document["image_base64"] = await store_image(data, mimetypes.guess_type(image_file)[0] or "image/png")
+        return
+
+    image = document.get("image_base64")
+    if IMAGE_STORAGE == "gridfs" and image and not image.startswith(IMAGE_URL_PREFIX):
+        document["image_base64"] = await store_image(*await read_image(image))
+
+
+async def _insert_batch(directory: str, name: str, documents: List[dict]) -> int:
+    # 이전 실행에서 이미 가져온 문서(같은 _id)는 이미지를 다시 저장하지 않도록 먼저 걸러냄
+    collection = TRANSFER_COLLECTIONS[name]
+    existing = {stored["_id"] async for stored in
+                collection.find({"_id": {"$in": [document["_id"] for document in documents]}}, {"_id": 1})}
+    documents = [document for document in documents if document["_id"] not in existing]
+    if not documents:
+        return 0
+    for document in documents:
+        await _restore_image(directory, document)
+
+    try:
+        result = await collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # 그 사이에 다른 곳에서 추가된 문서(같은 _id)는 건너뛰고, 그 외의 오류는 중단
+        errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != _DUPLICATE_KEY]
+        if errors:
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def _load_progress(directory: str) -> Dict[str, int]:
+    path = os.path.join(directory, _PROGRESS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _save_progress(directory: str, progress: Dict[str, int]) -> None:
+    path = os.path.join(directory, _PROGRESS_FILE)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(progress, file)
+    os.replace(f"{path}.tmp", path)
+
+
+async def import_collection(directory: str, name: str, batch_size: int, progress: Dict[str, int]) -> int:
+    """
+    파일 하나를 컬렉션으로 가져옵니다. progress에 기록된 줄 수만큼은 건너뜁니다.
+    """
+    path = os.path.join(directory, f"{name}.ndjson.gz")
+    if not os.path.exists(path):
+        return 0
+
+    done = progress.get(name, 0)
+    position = done
+    inserted = 0
+    batch: List[dict] = []
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for index, line in enumerate(file):
+            if index < done:
+                continue
+            position = index + 1
+            if not line.strip():
+                continue
+            batch.append(json_util.loads(line))
+            if len(batch) >= batch_size:
+                inserted += await _insert_batch(directory, name, batch)
+                progress[name] = position
+                _save_progress(directory, progress)
+                batch = []
+        if batch:
+            inserted += await _insert_batch(directory, name, batch)
+    progress[name] = position
+    _save_progress(directory, progress)
+
+    if name in _USER_COLLECTIONS:
+        # 변경 로그에 없는 문서가 추가되었으므로 사용자별로 전체 동기화하도록 함
+        for user_id in await TRANSFER_COLLECTIONS[name].distinct("user_id"):
+            await reset_changes(user_id, name)
+    return inserted
+
+
+async def main(args: argparse.Namespace) -> None:
+    names = _selected(args.collections)
+    if args.command == "export":
+        os.makedirs(args.dir, exist_ok=True)
+        for name in names:
+            count = await export_collection(args.dir, name, args.split_images, args.batch_size)
+            logging.info(f"Exported {count} documents from {name}")
+        return
+
+    progress = _load_progress(args.dir)
+    for name in names:
+        inserted = await import_collection(args.dir, name, args.batch_size, progress)
+        logging.info(f"Imported {inserted} documents into {name}")
+    # 모두 끝났으면 진행 기록을 지워 다음 가져오기는 처음부터 시작
+    if os.path.exists(os.path.join(args.dir, _PROGRESS_FILE)):
+        os.remove(os.path.join(args.dir, _PROGRESS_FILE))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="컬렉션을 gzip 압축 NDJSON 파일로 내보내고 가져옵니다.")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("--dir", required=True, help="내보낼 또는 가져올 디렉터리")
+    parser.add_argument("--collections", default="", help="쉼표로 구분한 컬렉션 이름 (기본값: 전체)")
+    parser.add_argument("--split-images", action="store_true", help="이미지를 별도 파일로 내보내기")
+    parser.add_argument("--batch-size", type=int, default=500, help="한 번에 읽고 삽입하는 문서 수")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
@@ -1,15 +1,140 @@
+import json
 import os
 from pathlib import Path
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 ENV_FILE = BASE_DIR / ".env"
 
 load_dotenv(ENV_FILE)
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
 ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN")
+# ACCESS_TOKEN으로 인증한 요청이 사용하는 사용자 ID
+DEFAULT_USER_ID = os.environ.get("DEFAULT_USER_ID", "default")
 MONGODB_URL = os.environ.get("MONGODB_URL")
+
+# 클라이언트 연결 끊김을 확인하는 주기 (초)
+DISCONNECT_POLL_INTERVAL = float(os.environ.get("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# 모델 티어별 호출 순서 (앞의 모델이 실패하면 다음 모델로 대체)
+MODEL_TIERS = json.loads(os.environ.get("MODEL_TIERS", "null")) or {
+    "quality": ["chatgpt-4o-latest", "gpt-4o"],
+    "standard": ["gpt-4o", "gpt-4o-mini"],
+    "fast": ["gpt-4o-mini", "gpt-4o"],
+}
+
+# 라우트별 사용할 모델 티어
+MODEL_ROUTES = json.loads(os.environ.get("MODEL_ROUTES", "null")) or {
+    "recipe": "quality",
+    "cooking_step": "standard",
+    "ingredient_info": "quality",
+    "chat": "fast",
+    "chat_summary": "fast",
+    "replace_ingredient": "fast",
+    "ingredient_detect": "quality",
+    "rearrange_refrigerator": "standard",
+}
+
+# 업로드 이미지 처리 설정
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+INGEST_MAX_EDGE = int(os.environ.get("INGEST_MAX_EDGE", "1024"))
+INGEST_JPEG_QUALITY = int(os.environ.get("INGEST_JPEG_QUALITY", "85"))
+
+# 식재료 탐지 결과 캐시 설정
+DETECT_CACHE_TTL_SECONDS = int(os.environ.get("DETECT_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+DETECT_CACHE_MAX_DISTANCE = int(os.environ.get("DETECT_CACHE_MAX_DISTANCE", "6"))
+
+# 동시에 실행할 수 있는 모델 호출 수
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "8"))
+
+# 한 번에 탐지할 수 있는 최대 이미지 수
+MAX_BATCH_IMAGES = int(os.environ.get("MAX_BATCH_IMAGES", "10"))
+
+# 생성된 이미지 다운로드 및 저장 설정
+# IMAGE_STORAGE: "inline" (문서에 data URL로 저장) 또는 "gridfs" (GridFS에 저장하고 /images 경로로 제공)
+IMAGE_STORAGE = os.environ.get("IMAGE_STORAGE", "inline")
+IMAGE_FETCH_TIMEOUT = float(os.environ.get("IMAGE_FETCH_TIMEOUT", "30"))
+IMAGE_FETCH_MAX_BYTES = int(os.environ.get("IMAGE_FETCH_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_FETCH_MAX_CONNECTIONS = int(os.environ.get("IMAGE_FETCH_MAX_CONNECTIONS", "20"))
+
+# 조건부 요청에 사용하는 Cache-Control 정책
+GENERATED_CACHE_CONTROL = os.environ.get("GENERATED_CACHE_CONTROL", "private, max-age=86400")
+USER_DATA_CACHE_CONTROL = os.environ.get("USER_DATA_CACHE_CONTROL", "private, no-cache")
+
+# 변경 로그에서 삭제 기록을 보관하는 버전 수 (이보다 오래된 since 요청은 전체 목록으로 응답)
+CHANGE_LOG_RETAINED_VERSIONS = int(os.environ.get("CHANGE_LOG_RETAINED_VERSIONS", "1000"))
+
+# 냉장고 재료 기반 레시피 추천 설정
+# 냉장고 재료로 레시피를 요청했을 때, 이 비율 이상 재료를 갖춘 저장된 레시피가 있으면 새로 생성하지 않음
+RECOMMEND_MIN_COVERAGE = float(os.environ.get("RECOMMEND_MIN_COVERAGE", "1.0"))
+RECOMMEND_LIMIT = int(os.environ.get("RECOMMEND_LIMIT", "10"))
+
+# 비슷한 레시피 검색에 사용하는 임베딩 설정
+EMBEDDING_DIM = int(os.environ.get("EMBEDDING_DIM", "512"))
+SIMILARITY_INDEX_PATH = os.environ.get("SIMILARITY_INDEX_PATH", str(BASE_DIR / "data" / "recipe_vectors"))
+
+# 자동 완성 접두사마다 보관하는 최대 항목 수 (한 번에 요청할 수 있는 최대 개수)
+AUTOCOMPLETE_MAX_RESULTS = int(os.environ.get("AUTOCOMPLETE_MAX_RESULTS", "20"))
+
+# 식단 계획에 한 번에 담을 수 있는 최대 레시피 수
+MAX_MEAL_PLAN_RECIPES = int(os.environ.get("MAX_MEAL_PLAN_RECIPES", "100"))
+
+# 인분 수를 바꾼 레시피를 (레시피 ID, 인분 수)별로 메모리에 보관하는 최대 개수
+SCALED_RECIPE_CACHE_SIZE = int(os.environ.get("SCALED_RECIPE_CACHE_SIZE", "1024"))
+
+
+# 레시피 채팅과 재료 대체 답변 캐시 설정
+# 같은 레시피에 대한 같은 질문이나 정규화된 문장의 유사도가 기준 이상인 질문에는 저장된 답을 사용
+ANSWER_CACHE_TTL_SECONDS = int(os.environ.get("ANSWER_CACHE_TTL_SECONDS", str(3 * 24 * 60 * 60)))
+ANSWER_CACHE_MIN_SIMILARITY = float(os.environ.get("ANSWER_CACHE_MIN_SIMILARITY", "0.7"))
+ANSWER_CACHE_MAX_CANDIDATES = int(os.environ.get("ANSWER_CACHE_MAX_CANDIDATES", "200"))
+
+# 레시피 채팅 세션 설정
+# 최근 대화가 이 토큰 수를 넘으면 최근 CHAT_RECENT_TURNS개를 제외한 대화를 요약하여 보관
+CHAT_SESSION_TTL_SECONDS = int(os.environ.get("CHAT_SESSION_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.environ.get("CHAT_HISTORY_TOKEN_BUDGET", "1000"))
+CHAT_RECENT_TURNS = int(os.environ.get("CHAT_RECENT_TURNS", "4"))
+# 프롬프트에 넣을 레시피 정보를 레시피 버전별로 메모리에 보관하는 최대 개수
+RECIPE_CONTEXT_CACHE_SIZE = int(os.environ.get("RECIPE_CONTEXT_CACHE_SIZE", "512"))
+
+# Idempotency-Key 설정
+# 완료된 응답은 IDEMPOTENCY_TTL_SECONDS 동안 보관하고, 진행 중인 같은 키의 요청은 최대 IDEMPOTENCY_WAIT_SECONDS 동안 기다림
+# 진행 중 표시가 IDEMPOTENCY_LOCK_SECONDS보다 오래되면 작업하던 서버가 중단된 것으로 보고 다시 생성
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "120"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "300"))
+IDEMPOTENCY_POLL_INTERVAL = float(os.environ.get("IDEMPOTENCY_POLL_INTERVAL", "0.5"))
+
+# 생성된 문서의 갱신 정책
+# 라우트별 프롬프트 버전 (프롬프트를 바꾸면 올려서 기존 문서를 읽힐 때 백그라운드에서 다시 생성)
+PROMPT_VERSIONS = json.loads(os.environ.get("PROMPT_VERSIONS", "null")) or {
+    "recipe": 1,
+    "cooking_step": 1,
+    "ingredient_info": 1,
+}
+# 이전 프롬프트 버전으로 생성된 문서 중 다시 생성할 문서의 비율 (%, 0~100)
+PROMPT_ROLLOUT_PERCENT = int(os.environ.get("PROMPT_ROLLOUT_PERCENT", "100"))
+# 라우트별로 생성 후 이 일수가 지나면 다시 생성 (0이면 기간으로는 만료하지 않음)
+GENERATED_MAX_AGE_DAYS = json.loads(os.environ.get("GENERATED_MAX_AGE_DAYS", "null")) or {
+    "recipe": 0,
+    "cooking_step": 0,
+    "ingredient_info": 0,
+}
+# 동시에 진행하는 백그라운드 재생성 작업 수
+REFRESH_CONCURRENCY = int(os.environ.get("REFRESH_CONCURRENCY", "2"))
+
+# 시작할 때 읽는 시드 팩 (미리 생성한 레시피, 식재료 정보, 조리 단계를 담은 gzip NDJSON 파일, 비어 있으면 사용하지 않음)
+SEED_PACK_PATH = os.environ.get("SEED_PACK_PATH", "")
+# 시드 팩을 읽고 쓸 때 한 번에 처리하는 문서 수
+SEED_PACK_BATCH_SIZE = int(os.environ.get("SEED_PACK_BATCH_SIZE", "500"))
+
+# 레시피 응답을 스트리밍으로 받으면서 이름, 설명, 재료가 나오는 즉시 이미지 생성을 시작 ("false"이면 순서대로 생성)
+RECIPE_PIPELINE = os.environ.get("RECIPE_PIPELINE", "true").lower() == "true"
+
+# /images 응답의 Cache-Control (인증이 필요하므로 private, 파일 ID마다 내용이 바뀌지 않으므로 immutable)
+IMAGE_CACHE_CONTROL = os.environ.get("IMAGE_CACHE_CONTROL", "private, max-age=31536000, immutable")
@@ -1,11 +1,89 @@
+from datetime import datetime, timezone
+
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
 
-from app.config import MONGODB_URL
+from app.config import MONGODB_URL, DETECT_CACHE_TTL_SECONDS, DEFAULT_USER_ID, ANSWER_CACHE_TTL_SECONDS, \
+    CHAT_SESSION_TTL_SECONDS, IDEMPOTENCY_TTL_SECONDS
 
 client = AsyncIOMotorClient(MONGODB_URL)
 db = client.deening
 recipe_collection = db.recipes
 cooking_step_collection = db.cooking_steps
 ingredients_info_collection = db.ingredients_info
+users_collection = db.users
 refrigerator_collection = db.refrigerator
 preference_collection = db.preferences
+ingredient_detect_cache_collection = db.ingredient_detect_cache
+versions_collection = db.versions
+change_log_collection = db.change_log
+answer_cache_collection = db.answer_cache
+chat_session_collection = db.chat_sessions
+idempotency_collection = db.idempotency_keys
+seed_pack_collection = db.seed_packs
+migrations_collection = db.migrations
+
+
+async def ensure_indexes():
+    """
+    애플리케이션 시작 시 필요한 인덱스를 생성합니다.
+    """
+    # 조건부 요청에서 이름(단계)으로 찾아 ETag를 확인
+    await recipe_collection.create_index([("name", ASCENDING), ("etag", ASCENDING)])
+    await cooking_step_collection.create_index(
+        [("recipe_id", ASCENDING), ("step_number", ASCENDING), ("etag", ASCENDING)])
+    await ingredients_info_collection.create_index([("name", ASCENDING), ("etag", ASCENDING)])
+
+    # 영양 정보와 조리 시간 범위 검색
+    await recipe_collection.create_index("nutritionValues.calories")
+    await recipe_collection.create_index("nutritionValues.protein")
+    await recipe_collection.create_index("cookTimeMinutes")
+
+    # 토큰 해시로 사용자를 찾음
+    await users_collection.create_index("token_hash", unique=True)
+
+    # 사용자별 데이터는 사용자 ID를 앞에 둔 인덱스로 조회
+    await refrigerator_collection.create_index([("user_id", ASCENDING), ("category", ASCENDING)])
+    await refrigerator_collection.create_index([("user_id", ASCENDING), ("name", ASCENDING)])
+    await preference_collection.create_index([("user_id", ASCENDING), ("name", ASCENDING), ("type", ASCENDING)])
+
+    # 문서마다 하나의 변경 기록만 유지하고, 버전 순으로 조회
+    await change_log_collection.create_index(
+        [("user_id", ASCENDING), ("collection", ASCENDING), ("document_id", ASCENDING)], unique=True)
+    await change_log_collection.create_index(
+        [("user_id", ASCENDING), ("collection", ASCENDING), ("version", ASCENDING)])
+
+    await ingredient_detect_cache_collection.create_index([("user_id", ASCENDING), ("bands", ASCENDING)])
+    await ingredient_detect_cache_collection.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=DETECT_CACHE_TTL_SECONDS)
+
+    # 같은 레시피 버전의 답변을 찾고, 오래된 답변은 자동으로 삭제
+    await answer_cache_collection.create_index(
+        [("kind", ASCENDING), ("recipe_id", ASCENDING), ("recipe_etag", ASCENDING), ("entities", ASCENDING),
+         ("key", ASCENDING)])
+    await answer_cache_collection.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=ANSWER_CACHE_TTL_SECONDS)
+
+    # 마지막 대화 후 일정 시간이 지난 채팅 세션은 자동으로 삭제
+    await chat_session_collection.create_index(
+        [("updated_at", ASCENDING)], expireAfterSeconds=CHAT_SESSION_TTL_SECONDS)
+
+    # Idempotency-Key 기록은 일정 시간이 지나면 자동으로 삭제
+    await idempotency_collection.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+
+async def assign_default_user():
+    """
+    사용자 구분이 도입되기 전에 저장된 냉장고와 선호도 데이터를 기본 사용자에게 할당합니다.
+    한 번 끝나면 migrations 컬렉션에 기록을 남겨 이후 시작할 때는 건너뜁니다.
+    """
+    migration_id = "assign_default_user"
+    if await migrations_collection.find_one({"_id": migration_id}, {"_id": 1}):
+        return
+
+    for collection in (refrigerator_collection, preference_collection, change_log_collection):
+        await collection.update_many({"user_id": {"$exists": False}}, {"$set": {"user_id": DEFAULT_USER_ID}})
+    # 중간에 실패하면 기록이 남지 않으므로 다음 시작 때 다시 실행 (update_many는 여러 번 실행해도 결과가 같음)
+    await migrations_collection.update_one(
+        {"_id": migration_id}, {"$set": {"applied_at": datetime.now(timezone.utc)}}, upsert=True)
@@ -1,10 +1,27 @@
+import hashlib
+
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from app.config import ACCESS_TOKEN
+from app.config import ACCESS_TOKEN, DEFAULT_USER_ID
+from app.database import users_collection
 
 security = HTTPBearer()
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    if credentials.credentials != ACCESS_TOKEN:
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """
+    토큰을 확인하고 요청한 사용자의 ID를 반환합니다.
+    ACCESS_TOKEN은 기본 사용자로, 그 외의 토큰은 users 컬렉션의 token_hash로 사용자를 찾습니다.
+    사용자와 토큰은 python -m app.cli.create_user로 발급합니다.
+    """
+    if credentials.credentials == ACCESS_TOKEN:
+        return DEFAULT_USER_ID
+
+    user = await users_collection.find_one({"token_hash": hash_token(credentials.credentials)}, {"_id": 1})
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
-    return credentials.credentials
\ No newline at end of file
+    return str(user["_id"])
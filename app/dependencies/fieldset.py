@@ -0,0 +1,12 @@
+from typing import Optional
+
+from fastapi import Query
+
+from app.utils.fieldset_utils import Fieldset
+
+
+def get_fieldset(
+        fields: Optional[str] = Query(None, description="응답에 포함할 필드 (쉼표로 구분, 예: recipe.name,recipe.nutrition)"),
+        exclude: Optional[str] = Query(None, description="응답에서 제외할 필드 (쉼표로 구분, 예: image_base64)"),
+) -> Fieldset:
+    return Fieldset(fields, exclude)
@@ -1,12 +1,39 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from app.config import SEED_PACK_PATH
+from app.database import assign_default_user, ensure_indexes
 from app.dependencies.auth import verify_token
-from app.routes import ping, root
+from app.routes import ping, root, metrics, image
 from app.routes.preference import preference
-from app.routes.recipe import recipe, ingredient_info, cooking_step, chat, search, replace_ingredient
+from app.routes.recipe import recipe, ingredient_info, cooking_step, chat, search, replace_ingredient, recommend, \
+    similar, autocomplete, meal_plan, scale
 from app.routes.refrigerator import ingredient_detect, refrigerator
 from app.routes.refrigerator import rearrange_refrigerator
+from app.utils.autocomplete import autocomplete_index
+from app.utils.image_utils import close_http_client
+from app.utils.nutrition_utils import backfill_numeric_fields
+from app.utils.recipe_index import recipe_index
+from app.utils.seed_pack import load_seed_pack
+from app.utils.similarity_index import similarity_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await assign_default_user()
+    await ensure_indexes()
+    await load_seed_pack(SEED_PACK_PATH)
+    await backfill_numeric_fields()
+    await recipe_index.build()
+    await similarity_index.load()
+    await autocomplete_index.build()
+    yield
+    similarity_index.save()
+    await close_http_client()
+
 
 app = FastAPI(
     title="Deening API",
@@ -21,6 +48,8 @@ app = FastAPI(
         "name": "GNU Affero General Public License v3.0",
         "url": "https://www.gnu.org/licenses/agpl-3.0.en.html",
     },
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Static files configuration
@@ -31,13 +60,20 @@ app.include_router(root.router)
 app.include_router(ping.router)
 
 # Protected routes
+app.include_router(recommend.router, dependencies=[Depends(verify_token)])
+app.include_router(meal_plan.router, dependencies=[Depends(verify_token)])
+app.include_router(scale.router, dependencies=[Depends(verify_token)])
 app.include_router(recipe.router, dependencies=[Depends(verify_token)])
 app.include_router(ingredient_info.router, dependencies=[Depends(verify_token)])
 app.include_router(cooking_step.router, dependencies=[Depends(verify_token)])
 app.include_router(chat.router, dependencies=[Depends(verify_token)])
 app.include_router(search.router, dependencies=[Depends(verify_token)])
+app.include_router(autocomplete.router, dependencies=[Depends(verify_token)])
+app.include_router(similar.router, dependencies=[Depends(verify_token)])
 app.include_router(replace_ingredient.router, dependencies=[Depends(verify_token)])
 app.include_router(ingredient_detect.router, dependencies=[Depends(verify_token)])
 app.include_router(refrigerator.router, dependencies=[Depends(verify_token)])
 app.include_router(rearrange_refrigerator.router, dependencies=[Depends(verify_token)])
 app.include_router(preference.router, dependencies=[Depends(verify_token)])
+app.include_router(metrics.router, dependencies=[Depends(verify_token)])
+app.include_router(image.router, dependencies=[Depends(verify_token)])
@@ -0,0 +1,8 @@
+from typing import Annotated
+
+from pydantic import Field
+
+# 응답의 image_base64 필드 (IMAGE_STORAGE 설정에 따라 형식이 다름)
+StoredImage = Annotated[str, Field(
+    description="IMAGE_STORAGE가 inline이면 이미지의 data URL(data:image/...;base64,...), "
+                "gridfs이면 이미지를 내려받을 서버 경로(/images/{file_id})입니다. 경로도 인증 헤더를 붙여 요청해야 합니다.")]
@@ -0,0 +1,17 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+class TimingStats(BaseModel):
+    count: int
+    total: float
+    min: float
+    max: float
+    avg: float
+
+
+class MetricsResponse(BaseModel):
+    counters: Dict[str, float]
+    timings: Dict[str, TimingStats]
+    ratios: Dict[str, float] = {}
@@ -34,6 +34,14 @@ class Preference(BaseModel):
 
 class GetKeywordsResponse(BaseModel):
     preference: Preference
+    version: int | None = None
+
+
+class GetKeywordsDeltaResponse(BaseModel):
+    version: int
+    full: bool
+    upserts: List[Keyword]
+    deletes: List[str]
 
 
 class UpdateKeywordRequest(BaseModel):
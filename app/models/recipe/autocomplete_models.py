@@ -0,0 +1,15 @@
+from typing import List, Literal
+
+from pydantic import BaseModel
+
+SuggestionType = Literal["recipe", "ingredient"]
+
+
+class Suggestion(BaseModel):
+    name: str
+    type: SuggestionType
+    id: str
+
+
+class AutocompleteResponse(BaseModel):
+    suggestions: List[Suggestion]
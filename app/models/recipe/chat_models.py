@@ -1,10 +1,14 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
 class ChatRequest(BaseModel):
     recipe_id: str
     question: str
+    session_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     answer: str
+    session_id: Optional[str] = None
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from app.models.image_models import StoredImage
+
 
 class CookingStepRequest(BaseModel):
     recipe_id: str
@@ -15,4 +17,4 @@ class CookingStep(BaseModel):
 class CookingStepResponse(BaseModel):
     id: str
     cooking_step: CookingStep
-    image_base64: str
+    image_base64: StoredImage
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from app.models.image_models import StoredImage
+
 
 class IngredientRequest(BaseModel):
     ingredient_name: str
@@ -13,4 +15,4 @@ class Ingredient(BaseModel):
 class IngredientResponse(BaseModel):
     id: str
     ingredient: Ingredient
-    image_base64: str
+    image_base64: StoredImage
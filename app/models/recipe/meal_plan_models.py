@@ -0,0 +1,38 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class MealPlanItem(BaseModel):
+    recipe_id: str
+    servings: float = Field(1, gt=0)
+
+
+class MealPlanRequest(BaseModel):
+    items: List[MealPlanItem]
+
+
+class MealPlanRecipe(BaseModel):
+    id: str
+    name: str
+    servings: float
+
+
+class NutritionTotals(BaseModel):
+    calories: float
+    protein: float
+    carbohydrates: float
+    fat: float
+
+
+class MealPlanIngredient(BaseModel):
+    name: str
+    amount: float
+    unit: str
+
+
+class MealPlanResponse(BaseModel):
+    recipes: List[MealPlanRecipe]
+    nutrition: NutritionTotals
+    ingredients: List[MealPlanIngredient]
+    shopping_list: List[MealPlanIngredient]
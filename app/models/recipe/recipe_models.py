@@ -2,6 +2,8 @@ from typing import List
 
 from pydantic import BaseModel
 
+from app.models.image_models import StoredImage
+
 
 class Ingredient(BaseModel):
     name: str
@@ -25,6 +27,7 @@ class Recipe(BaseModel):
     name: str
     description: str
     cookTime: str
+    servings: int = 1
     nutrition: Nutrition
     ingredients: List[Ingredient]
     instructions: List[Instruction]
@@ -38,4 +41,4 @@ class RecipeRequest(BaseModel):
 class RecipeResponse(BaseModel):
     id: str
     recipe: Recipe
-    image_base64: str
+    image_base64: StoredImage
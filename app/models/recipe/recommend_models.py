@@ -0,0 +1,16 @@
+from typing import List
+
+from pydantic import BaseModel
+
+
+class RecommendedRecipe(BaseModel):
+    id: str
+    name: str
+    coverage: float
+    matched: int
+    total: int
+    missing_ingredients: List[str]
+
+
+class RecommendResponse(BaseModel):
+    recipes: List[RecommendedRecipe]
@@ -0,0 +1,15 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from app.models.recipe.meal_plan_models import NutritionTotals
+from app.models.recipe.recipe_models import Ingredient, Nutrition
+
+
+class ScaledRecipeResponse(BaseModel):
+    id: str
+    servings: int
+    original_servings: int
+    ingredients: List[Ingredient]
+    nutrition: Nutrition
+    total_nutrition: NutritionTotals
@@ -2,6 +2,8 @@ from typing import List
 
 from pydantic import BaseModel
 
+from app.models.image_models import StoredImage
+
 
 class SearchRequest(BaseModel):
     search_query: str
@@ -10,8 +12,21 @@ class SearchRequest(BaseModel):
 class RecipeSimple(BaseModel):
     id: str
     name: str
-    image_base64: str
+    image_base64: StoredImage
+
+
+class FacetBucket(BaseModel):
+    # 범위를 알 수 없는 레시피(숫자 필드가 없는 경우)는 min과 max가 None
+    min: float | None
+    max: float | None
+    count: int
+
+
+class SearchFacets(BaseModel):
+    calories: List[FacetBucket]
+    cook_time: List[FacetBucket]
 
 
 class SearchResponse(BaseModel):
     search_results: List[RecipeSimple]
+    facets: SearchFacets | None = None
@@ -0,0 +1,16 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from app.models.image_models import StoredImage
+
+
+class SimilarRecipe(BaseModel):
+    id: str
+    name: str
+    image_base64: StoredImage
+    score: float
+
+
+class SimilarRecipesResponse(BaseModel):
+    recipes: List[SimilarRecipe]
@@ -8,8 +8,14 @@ class IngredientDetectRequest(BaseModel):
     image: UploadFile
 
 
+class IngredientSource(BaseModel):
+    ingredient: str
+    image_indexes: List[int]
+
+
 class IngredientDetectResponse(BaseModel):
     ingredients: List[str]
+    sources: List[IngredientSource] | None = None
 
 
 class NoIngredientsFoundResponse(BaseModel):
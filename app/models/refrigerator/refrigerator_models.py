@@ -45,6 +45,14 @@ class Refrigerator(BaseModel):
 
 class GetIngredientsResponse(BaseModel):
     refrigerator: Refrigerator
+    version: int | None = None
+
+
+class GetIngredientsDeltaResponse(BaseModel):
+    version: int
+    full: bool
+    upserts: List[Ingredient]
+    deletes: List[str]
 
 
 class GetIngredientsByCategoryResponse(BaseModel):
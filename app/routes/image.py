@@ -0,0 +1,32 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, HTTPException
+from gridfs.errors import NoFile
+from starlette.responses import StreamingResponse
+
+from app.config import IMAGE_CACHE_CONTROL
+from app.models.error_models import ErrorResponse
+from app.utils.image_storage import GridFSImageStorage
+
+router = APIRouter()
+storage = GridFSImageStorage()
+
+
+@router.get("/images/{file_id}", tags=["Image"], responses={404: {"model": ErrorResponse}})
+async def get_image(file_id: str):
+    """
+    GridFS에 저장된 이미지를 조각 단위로 전송합니다.
+    이미지 내용은 바뀌지 않지만 인증이 필요한 경로이므로 공유 캐시에는 저장하지 않도록 합니다.
+    """
+    try:
+        grid_out = await storage.bucket.open_download_stream(ObjectId(file_id))
+    except (InvalidId, NoFile):
+        raise HTTPException(status_code=404, detail="이미지를 찾을 수 없습니다.")
+
+    async def chunks():
+        while chunk := await grid_out.readchunk():
+            yield chunk
+
+    media_type = (grid_out.metadata or {}).get("contentType", "image/png")
+    return StreamingResponse(chunks(), media_type=media_type,
+                             headers={"Cache-Control": IMAGE_CACHE_CONTROL})
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+
+from app.models.metrics_models import MetricsResponse
+from app.utils import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", tags=["Metrics"], response_model=MetricsResponse)
+async def get_metrics():
+    """
+    서버에서 수집한 지표(취소된 생성 작업, 절약된 토큰 등)를 반환합니다.
+    """
+    return metrics.snapshot()
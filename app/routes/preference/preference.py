@@ -1,59 +1,114 @@
 import logging
+from typing import Optional
 
 from bson import ObjectId
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Depends, Request
 
+from app.config import USER_DATA_CACHE_CONTROL
 from app.database import preference_collection
+from app.dependencies.auth import verify_token
+from app.dependencies.fieldset import get_fieldset
 from app.models.error_models import ErrorResponse
 from app.models.preference.preference_models import (
-    GetKeywordsResponse, Keyword, Preference,
+    GetKeywordsResponse, GetKeywordsDeltaResponse,
     AddKeywordRequest, AddKeywordResponse, DeleteKeywordResponse,
     UpdateKeywordRequest, UpdateKeywordResponse
 )
+from app.utils.etag_utils import cache_headers, etag_matches, not_modified, version_etag
+from app.utils.fieldset_utils import Fieldset
+from app.utils.response_utils import trusted_response
+from app.utils.versioning import get_changes, get_version, record_changes
 
 router = APIRouter()
 
+# 키워드 항목의 응답 필드 → 문서 필드
+KEYWORD_FIELDS = {"id": "_id", "name": "name", "type": "type"}
 
-@router.get("/preferences/keywords", tags=["Preference"], response_model=GetKeywordsResponse)
-async def get_keywords():
+
+def serialize_keyword(keyword: dict) -> dict:
+    """
+    선호도 문서를 응답의 키워드 항목 형태로 변환합니다.
+    """
+    return {"id": str(keyword["_id"]), "name": keyword.get("name"), "type": keyword.get("type")}
+
+
+@router.get("/preferences/keywords", tags=["Preference"],
+            response_model=GetKeywordsResponse | GetKeywordsDeltaResponse)
+async def get_keywords(http_request: Request, since: Optional[int] = None,
+                       fieldset: Fieldset = Depends(get_fieldset), user_id: str = Depends(verify_token)):
     """
     저장된 모든 키워드 목록을 반환합니다.
     키워드가 없을 경우 빈 배열을 반환합니다.
+    If-None-Match 헤더의 ETag가 현재 선호도 버전과 같으면 304를 반환합니다.
+    since 파라미터로 버전을 주면 그 이후에 추가, 수정, 삭제된 키워드만 반환합니다.
+    fields / exclude 파라미터로 키워드 항목의 필드를 고를 수 있습니다.
     """
     try:
-        keywords = await preference_collection.find().to_list(length=None)
+        if since is not None:
+            return await _get_keyword_changes(user_id, since, fieldset)
 
-        # 키워드가 없을 경우 빈 Preference 객체 반환
-        if not keywords:
-            return GetKeywordsResponse(preference=Preference(keywords=[]))
+        # 선호도 버전만 확인하여 변경이 없으면 키워드를 읽지 않음
+        version = await get_version(user_id, "preferences")
+        etag = fieldset.etag(version_etag(f"preferences-{user_id}", version))
+        if etag_matches(http_request, etag):
+            return not_modified(etag, USER_DATA_CACHE_CONTROL)
 
-        # ObjectId를 문자열로 변환하여 키워드 목록 생성
-        keyword_list = [Keyword(id=str(keyword["_id"]), name=keyword["name"], type=keyword["type"])
-                        for keyword in keywords]
+        projection = fieldset.inclusion_projection(KEYWORD_FIELDS)
+        keywords = await preference_collection.find({"user_id": user_id}, projection).to_list(length=None)
 
-        return GetKeywordsResponse(preference=Preference(keywords=keyword_list))
+        # ObjectId를 문자열로 변환하여 키워드 목록 생성 (키워드가 없을 경우 빈 배열)
+        keyword_list = [fieldset.prune(serialize_keyword(keyword)) for keyword in keywords]
+
+        return trusted_response({"preference": {"keywords": keyword_list}, "version": version},
+                                headers=cache_headers(etag, USER_DATA_CACHE_CONTROL))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _get_keyword_changes(user_id: str, since: int, fieldset: Fieldset):
+    changes = await get_changes(user_id, "preferences", since)
+    if changes is not None:
+        version, upserts, deletes = changes
+        full = False
+    else:
+        # 변경 기록이 정리된 오래된 버전이면 전체 목록을 보냄
+        version = await get_version(user_id, "preferences")
+        projection = fieldset.inclusion_projection(KEYWORD_FIELDS)
+        keywords = await preference_collection.find({"user_id": user_id}, projection).to_list(length=None)
+        upserts = [serialize_keyword(keyword) for keyword in keywords]
+        deletes = []
+        full = True
+
+    return trusted_response({
+        "version": version,
+        "full": full,
+        "upserts": [fieldset.prune(keyword) for keyword in upserts],
+        "deletes": deletes,
+    }, headers=cache_headers(None, USER_DATA_CACHE_CONTROL))
+
+
 @router.put("/preferences/keywords", tags=["Preference"],
             responses={400: {"model": ErrorResponse}},
             response_model=AddKeywordResponse)
-async def add_keyword(request: AddKeywordRequest):
+async def add_keyword(request: AddKeywordRequest, user_id: str = Depends(verify_token)):
     """
     새로운 키워드를 추가합니다. 이미 존재하는 키워드는 추가되지 않습니다.
     """
     try:
         # 이미 존재하는 키워드인지 확인
         existing_keyword = await preference_collection.find_one(
-            {"name": request.name, "type": request.type}
+            {"user_id": user_id, "name": request.name, "type": request.type}
         )
 
         if existing_keyword:
             raise HTTPException(status_code=400, detail="이미 존재하는 키워드입니다.")
 
         # 새로운 키워드 추가
-        await preference_collection.insert_one(request.model_dump())
+        keyword = {"user_id": user_id, **request.model_dump()}
+        await preference_collection.insert_one(keyword)
+        await record_changes(user_id, "preferences", [("upsert", str(keyword["_id"]), serialize_keyword(keyword))])
         return {"message": "키워드가 성공적으로 추가되었습니다."}
     except HTTPException:
         raise
@@ -64,7 +119,7 @@ async def add_keyword(request: AddKeywordRequest):
 @router.delete("/preferences/keyword/{keyword_id}", tags=["Preference"],
                response_model=DeleteKeywordResponse,
                responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
-async def delete_keyword(keyword_id: str):
+async def delete_keyword(keyword_id: str, user_id: str = Depends(verify_token)):
     """
     주어진 ID로 키워드를 삭제합니다.
     """
@@ -74,11 +129,12 @@ async def delete_keyword(keyword_id: str):
         raise HTTPException(status_code=404, detail="유효하지 않은 키워드 ID입니다.")
 
     try:
-        result = await preference_collection.delete_one({"_id": object_id})
+        result = await preference_collection.delete_one({"_id": object_id, "user_id": user_id})
 
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="해당 ID의 키워드를 찾을 수 없습니다.")
 
+        await record_changes(user_id, "preferences", [("delete", keyword_id, None)])
         return {"message": "키워드가 성공적으로 삭제되었습니다."}
     except HTTPException:
         raise
@@ -89,7 +145,8 @@ async def delete_keyword(keyword_id: str):
 @router.patch("/preferences/keyword/{keyword_id}", tags=["Preference"],
               response_model=UpdateKeywordResponse,
               responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
-async def update_keyword(keyword_id: str, request: UpdateKeywordRequest):
+async def update_keyword(keyword_id: str, request: UpdateKeywordRequest,
+                         user_id: str = Depends(verify_token)):
     """
     주어진 ID로 키워드를 수정합니다.
     """
@@ -100,7 +157,7 @@ async def update_keyword(keyword_id: str, request: UpdateKeywordRequest):
 
     try:
         # 키워드 존재 여부 확인
-        existing_keyword = await preference_collection.find_one({"_id": object_id})
+        existing_keyword = await preference_collection.find_one({"_id": object_id, "user_id": user_id})
         if not existing_keyword:
             raise HTTPException(status_code=404, detail="해당 ID의 키워드를 찾을 수 없습니다.")
 
@@ -116,6 +173,8 @@ async def update_keyword(keyword_id: str, request: UpdateKeywordRequest):
         if result.modified_count == 0:
             return {"message": "변경된 내용이 없습니다."}
 
+        updated_keyword = {**existing_keyword, **update_data}
+        await record_changes(user_id, "preferences", [("upsert", keyword_id, serialize_keyword(updated_keyword))])
         return {"message": "키워드가 성공적으로 수정되었습니다."}
     except HTTPException:
         raise
@@ -0,0 +1,22 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query
+
+from app.config import AUTOCOMPLETE_MAX_RESULTS
+from app.models.recipe.autocomplete_models import AutocompleteResponse, SuggestionType
+from app.utils.autocomplete import autocomplete_index
+from app.utils.response_utils import trusted_response
+
+router = APIRouter()
+
+
+@router.get("/recipe/autocomplete", tags=["Recipe"], response_model=AutocompleteResponse)
+async def autocomplete(query: str, limit: int = Query(10, ge=1, le=AUTOCOMPLETE_MAX_RESULTS),
+                       type: Optional[SuggestionType] = None):
+    """
+    입력 중인 검색어로 시작하는 레시피와 식재료 이름을 짧은 순서로 반환합니다.
+    자모 단위로 비교하므로 입력 중인 글자('김ㅊ', '닭'을 치는 도중의 '달' 등)도 일치합니다.
+    type 파라미터로 레시피(recipe) 또는 식재료(ingredient)만 받을 수 있습니다.
+    """
+    suggestions = autocomplete_index.suggest(query, limit, type)
+    return trusted_response({"suggestions": [suggestion._asdict() for suggestion in suggestions]})
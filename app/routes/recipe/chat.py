@@ -1,21 +1,34 @@
 import logging
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-from app.config import client as openai_client
 from app.database import recipe_collection
+from app.dependencies.auth import verify_token
 from app.models.error_models import ErrorResponse
 from app.models.recipe.chat_models import ChatRequest, ChatResponse
+from app.models.recipe.recipe_models import Recipe
+from app.utils import metrics
+from app.utils.answer_cache import find_answer, question_entities, store_answer
+from app.utils.cancellation import run_cancellable
+from app.utils.chat_intents import answer_locally
+from app.utils.chat_session import build_messages, find_session, recipe_context, save_turn
+from app.utils.etag_utils import ensure_etag
+from app.utils.llm_utils import create_chat_completion
 
 router = APIRouter()
 
+metrics.register_ratio("chat.deflection_rate", "chat.deflected", "chat.questions")
+
 
 @router.post("/recipe/chat", tags=["Recipe"], response_model=ChatResponse,
              responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
-async def chat_with_recipe(request: ChatRequest):
+async def chat_with_recipe(request: ChatRequest, http_request: Request, user_id: str = Depends(verify_token)):
     """
     레시피에 대한 질문을 처리하고 답변을 제공합니다.
+    조리 시간, 영양 정보, 재료 양처럼 레시피에 저장된 정보로 답할 수 있는 질문은 모델을 호출하지 않고 바로 답합니다.
+    같은 레시피에 대해 이미 답한 질문과 같거나 비슷한 질문에는 저장된 답을 사용합니다.
+    대화는 서버에 세션으로 저장되며, 응답의 session_id를 다음 요청에 넣으면 이전 대화를 이어갑니다.
     """
     try:
         # 레시피 데이터 조회
@@ -23,58 +36,51 @@ async def chat_with_recipe(request: ChatRequest):
         if not recipe:
             raise HTTPException(status_code=404, detail="레시피를 찾을 수 없습니다.")
 
-        # 영양 정보 문자열 구성
-        nutrition_info = (f"칼로리: {recipe['nutrition']['calories']}kcal, "
-                          f"단백질: {recipe['nutrition']['protein']}g, "
-                          f"탄수화물: {recipe['nutrition']['carbohydrates']}g, "
-                          f"지방: {recipe['nutrition']['fat']}g")
-
-        # 재료 목록 문자열 구성
-        ingredients_list = "\n".join(
-            f"- {ing['name']}: {ing['amount']}{ing['unit']}"
-            for ing in recipe['ingredients']
-        )
-
-        # 조리 과정 문자열 구성
-        instructions_list = "\n".join(
-            f"{step['step']}. {step['description']}"
-            for step in recipe['instructions']
-        )
-
-        # 챗봇 프롬프트 구성
-        chat_prompt = f"""다음은 '{recipe['name']}'에 대한 레시피 정보입니다:
-
-        요리 설명: {recipe['description']}
-        조리 시간: {recipe['cookTime']}
-        영양 정보: {nutrition_info}
-        
-        재료:
-        {ingredients_list}
-        
-        조리 과정:
-        {instructions_list}
-
-        사용자의 질문: {request.question}
-
-        주의사항:
-        1. 답변은 친절하고 이해하기 쉽게, 간결하게 작성해주세요.
-        2. 줄바꿈이나 마크다운 문법 없이 채팅 형식으로 작성해주세요.
-        """
-
-        # ChatGPT API 호출
-        chat_response = openai_client.chat.completions.create(
-            model="chatgpt-4o-latest",
-            messages=[
-                {"role": "system", "content": "당신은 요리 전문가입니다. 레시피와 조리 방법에 대한 질문에 친절하고 전문적으로 답변해주세요."},
-                {"role": "user", "content": chat_prompt}
-            ]
-        )
+        session = None
+        if request.session_id:
+            session = await find_session(request.session_id, user_id, request.recipe_id)
+            if not session:
+                raise HTTPException(status_code=404, detail="채팅 세션을 찾을 수 없습니다.")
+
+        metrics.increment("chat.questions")
+        local_answer = answer_locally(request.question, recipe)
+        if local_answer:
+            metrics.increment("chat.deflected")
+            metrics.increment(f"chat.intent.{local_answer.intent}")
+            session_id = await save_turn(session, user_id, request.recipe_id, request.question, local_answer.answer)
+            return ChatResponse(answer=local_answer.answer, session_id=session_id)
+
+        # 레시피가 바뀌면 ETag가 달라지므로 예전 레시피에 대한 답은 사용되지 않음
+        recipe_etag = await ensure_etag(recipe_collection, recipe, Recipe)
+
+        # 이전 대화가 있으면 답이 대화 내용에 따라 달라지므로 답변 캐시를 사용하지 않음
+        has_history = bool(session and (session.get("turns") or session.get("summary")))
+        entities = question_entities(request.question, (ing["name"] for ing in recipe["ingredients"]))
+        if not has_history:
+            cached = await find_answer("chat", request.recipe_id, recipe_etag, request.question, entities)
+            if cached:
+                session_id = await save_turn(session, user_id, request.recipe_id, request.question,
+                                             cached["answer"])
+                return ChatResponse(answer=cached["answer"], session_id=session_id)
+
+        # 레시피 정보는 레시피 버전별로 한 번만 만들어 항상 프롬프트 앞부분에 둠
+        messages = build_messages(recipe_context(recipe, recipe_etag), session, request.question)
+
+        # ChatGPT API 호출 (클라이언트가 연결을 끊으면 취소)
+        chat_response = await run_cancellable(
+            http_request, None, lambda context: create_chat_completion("chat", messages, context))
 
         # 응답 처리
         answer = chat_response.choices[0].message.content.strip()
+        if not has_history:
+            await store_answer("chat", request.recipe_id, recipe_etag, request.question, {"answer": answer},
+                               entities)
+        session_id = await save_turn(session, user_id, request.recipe_id, request.question, answer)
 
-        return ChatResponse(answer=answer)
+        return ChatResponse(answer=answer, session_id=session_id)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Chat error: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
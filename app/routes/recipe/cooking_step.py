@@ -1,164 +1,238 @@
 import json
 import logging
 import re
+from typing import Optional
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-from app.config import client as openai_client
+from app.config import client as openai_client, GENERATED_CACHE_CONTROL
 from app.database import recipe_collection, cooking_step_collection
+from app.dependencies.auth import verify_token
+from app.dependencies.fieldset import get_fieldset
 from app.models.error_models import ErrorResponse
 from app.models.recipe.cooking_step_models import CookingStepRequest, CookingStep, CookingStepResponse
-from app.utils.image_utils import download_and_encode_image
+from app.utils.cancellation import GenerationContext
+from app.utils.etag_utils import cache_headers, compute_etag, ensure_etag, etag_matches, not_modified
+from app.utils.fieldset_utils import Fieldset
+from app.utils.freshness import generation_metadata, is_stale, schedule_refresh
+from app.utils.idempotency import claim_idempotency_key, run_idempotent
+from app.utils.image_storage import delete_image
+from app.utils.image_utils import fetch_image_to_storage
+from app.utils.llm_utils import create_chat_completion
+from app.utils.response_utils import pick_fields, trusted_response
 
 router = APIRouter()
 logging.basicConfig(level=logging.DEBUG)
 
+# 응답 필드 → 문서 필드
+COOKING_STEP_FIELDS = {"id": "_id", "cooking_step": list(CookingStep.model_fields), "image_base64": "image_base64"}
+
 
 @router.post("/recipe/cooking-step", tags=["Recipe"], response_model=CookingStepResponse,
              responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
-async def get_cooking_step_info(request: CookingStepRequest):
+async def get_cooking_step_info(request: CookingStepRequest, http_request: Request,
+                                fieldset: Fieldset = Depends(get_fieldset), user_id: str = Depends(verify_token)):
     """
     레시피의 특정 조리 단계에 대한 상세 정보를 반환하거나 생성합니다.
+    If-None-Match 헤더의 ETag가 저장된 정보와 같으면 304를 반환합니다.
+    오래된 정보는 바로 반환하고 백그라운드에서 다시 생성합니다.
+    Idempotency-Key 헤더가 있으면 같은 키로 재시도한 요청은 새로 생성하지 않고 진행 중인 생성을 기다리거나 저장된 응답을 반환합니다.
+    fields / exclude 파라미터로 필요한 필드만 받을 수 있습니다.
     """
     try:
-        # 기존 조리 단계 정보 검색
-        existing_step = await cooking_step_collection.find_one({
+        step_query = {
             "recipe_id": request.recipe_id,
             "step_number": request.step_number
-        })
-
-        if existing_step:
-            # 기존 정보가 있으면 그대로 반환
-            cooking_step = CookingStep(**existing_step)
-            return CookingStepResponse(
-                id=str(existing_step['_id']),
-                cooking_step=cooking_step,
-                image_base64=existing_step.get('image_base64')
-            )
-
-        # 기존 정보가 없으면 새로 생성
-        recipe = await recipe_collection.find_one({"_id": ObjectId(request.recipe_id)})
-        if not recipe:
-            raise HTTPException(status_code=404, detail="레시피를 찾을 수 없습니다.")
-
-        # 레시피의 필요한 정보만 추출
-        recipe_context = {
-            "name": recipe['name'],
-            "ingredients": recipe['ingredients'],
-            "instructions": recipe['instructions'][request.step_number - 1] if request.step_number <= len(
-                recipe['instructions']) else None
         }
 
-        # Format ingredients based on their structure
-        if isinstance(recipe_context['ingredients'][0], dict):
-            formatted_ingredients = ', '.join(
-                [f"{ing.get('name', 'Unknown')} ({ing.get('amount', 'Unknown amount')})" for ing in
-                 recipe_context['ingredients']])
-        else:
-            formatted_ingredients = ', '.join(recipe_context['ingredients'])
-
-        cooking_step_prompt = f"""레시피 '{recipe_context['name']}'의 {request.step_number}번째 조리 단계에 대한 상세 정보를 JSON 형식으로 제공해주세요.
-
-        레시피 컨텍스트:
-        - 재료: {formatted_ingredients}
-        - 현재 단계 지침: {recipe_context['instructions']}
-
-        다음 구조를 따라 자세한 정보를 작성해주세요:
-        {{
-          "recipe_id": "{request.recipe_id}",
-          "step_number": {request.step_number},
-          "description": "조리 과정에 대한 상세한 설명. 다음 내용을 포함해주세요:
-            1. 정확한 조리 방법과 기술
-            2. 주의해야 할 점
-            3. 시간이나 온도와 같은 구체적인 수치
-            4. 재료의 상태나 질감에 대한 설명
-            5. 이 단계를 잘 수행하기 위한 팁이나 요령"
-        }}
-
-        주의사항:
-        1. 설명은 초보자도 이해하기 쉽게 상세하고 명확하게 작성해주세요.
-        2. 안전과 관련된 주의사항이 있다면 반드시 포함시켜주세요.
-        3. 요리의 맛과 품질을 향상시킬 수 있는 전문적인 조언을 제공해주세요.
-        4. 반드시 유효한 JSON 형식으로만 응답해주세요. 추가 설명이나 주석은 불필요합니다.
-        """
-
-        logging.debug(f"Cooking step prompt: {cooking_step_prompt}")
-
-        cooking_step_response = openai_client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system",
-                 "content": "당신은 세계적인 요리 전문가입니다. 다양한 요리 기법과 재료에 대한 깊은 이해를 바탕으로, 정확하고 유용한 조리 정보를 제공합니다."},
-                {"role": "user", "content": cooking_step_prompt}
-            ]
-        )
-
-        # Log the full response for debugging
-        logging.debug(f"OpenAI API response: {cooking_step_response}")
-
-        # ChatGPT 응답 파싱
-        response_content = cooking_step_response.choices[0].message.content.strip()
-        logging.debug(f"Stripped response content: {response_content}")
-
-        # 코드 블록 제거 및 JSON 추출
-        json_content = re.search(r'\{[\s\S]*\}', response_content)
-        if json_content:
-            response_content = json_content.group()
-            logging.debug(f"Extracted JSON content: {response_content}")
-        else:
-            logging.error("No JSON content found in the response")
-            raise ValueError("No JSON content found in the response")
+        # 조건부 요청이면 ETag와 생성 정보만 읽어 확인
+        if http_request.headers.get("if-none-match"):
+            stored = await cooking_step_collection.find_one(step_query, {"etag": 1, "generation": 1})
+            etag = fieldset.etag(stored.get("etag")) if stored else None
+            if etag_matches(http_request, etag):
+                # 항상 재검증하는 클라이언트에도 새 프롬프트 버전이 퍼지도록 304를 보내기 전에 재생성 예약
+                _refresh_if_stale(stored, request)
+                return not_modified(etag, GENERATED_CACHE_CONTROL)
 
-        try:
-            cooking_step_json = json.loads(response_content)
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON decode error: {e}")
-            raise ValueError(f"Invalid JSON: {e}")
+        # 기존 조리 단계 정보 검색 (요청된 필드만 읽음)
+        projection = fieldset.projection(COOKING_STEP_FIELDS, required=("_id", "etag", "generation"))
+        existing_step = await cooking_step_collection.find_one(step_query, projection)
+
+        if existing_step:
+            _refresh_if_stale(existing_step, request)
 
-        logging.debug(f"Parsed JSON: {cooking_step_json}")
+            # 기존 정보가 있으면 그대로 반환
+            etag = existing_step.get("etag") if fieldset \
+                else await ensure_etag(cooking_step_collection, existing_step, CookingStep)
+            return trusted_response(fieldset.prune({
+                "id": str(existing_step['_id']),
+                "cooking_step": pick_fields(existing_step, CookingStep),
+                "image_base64": existing_step.get('image_base64'),
+            }), headers=cache_headers(fieldset.etag(etag), GENERATED_CACHE_CONTROL))
+
+        # 같은 Idempotency-Key로 끝난 요청이 있으면 저장된 응답을 사용
+        claim = await claim_idempotency_key(http_request, user_id, "cooking_step", request)
+        if claim and claim.response is not None:
+            cooking_step_response = CookingStepResponse(**claim.response)
+        else:
+            # 기존 정보가 없으면 새로 생성 (클라이언트가 연결을 끊으면 취소)
+            cooking_step_response = await run_idempotent(
+                http_request, claim, f"cooking-step:{request.recipe_id}:{request.step_number}",
+                lambda context: generate_cooking_step(request, context))
+        etag = compute_etag(cooking_step_response.cooking_step.model_dump(), cooking_step_response.image_base64)
+        return trusted_response(fieldset.prune(cooking_step_response.model_dump()),
+                                headers=cache_headers(fieldset.etag(etag), GENERATED_CACHE_CONTROL))
+
+    except HTTPException:
+        raise
+    except json.JSONDecodeError as e:
+        logging.error(f"JSON decode error: {e}")
+        raise HTTPException(status_code=400, detail=f"생성된 조리 과정 정보를 JSON으로 파싱할 수 없습니다: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
 
-        cooking_step = CookingStep(**cooking_step_json)
 
-        image_prompt = f"""Create a photorealistic image for the following cooking step:
+def _refresh_if_stale(existing_step: dict, request: CookingStepRequest) -> None:
+    if is_stale("cooking_step", existing_step):
+        # 오래된 정보도 바로 반환하고, 같은 문서를 백그라운드에서 다시 생성
+        step_id = str(existing_step["_id"])
+        schedule_refresh("cooking_step", f"cooking-step:{step_id}",
+                         lambda context: generate_cooking_step(request, context, step_id=step_id))
 
-        Recipe: {recipe_context['name']}
-        Step Number: {cooking_step.step_number}
-        Description: {cooking_step.description}
 
-        Image requirements:
-        1. Show a close-up, detailed view of the exact action being performed.
-        2. Include the chef's hands and relevant utensils or equipment.
-        3. Ensure the ingredients or dish are clearly visible and identifiable.
-        4. Use bright, even lighting to highlight all details of the cooking process.
-        5. Capture the image from a slightly elevated angle (about 30-45 degrees) to provide a clear view of the cooking surface and action.
-        6. Reflect the correct stage of cooking (e.g., raw ingredients, partially cooked, or finished dish).
-        7. Include any specific visual cues mentioned in the step description (e.g., color changes, texture, or consistency).
+async def generate_cooking_step(request: CookingStepRequest, context: GenerationContext,
+                                step_id: Optional[str] = None) -> CookingStepResponse:
+    """
+    GPT와 DALL·E로 조리 단계 정보를 생성하고 저장합니다.
+    step_id가 주어지면 오래된 정보를 다시 생성하여 같은 문서를 교체합니다.
+    """
+    recipe = await recipe_collection.find_one({"_id": ObjectId(request.recipe_id)})
+    if not recipe:
+        raise HTTPException(status_code=404, detail="레시피를 찾을 수 없습니다.")
+
+    # 레시피의 필요한 정보만 추출
+    recipe_context = {
+        "name": recipe['name'],
+        "ingredients": recipe['ingredients'],
+        "instructions": recipe['instructions'][request.step_number - 1] if request.step_number <= len(
+            recipe['instructions']) else None
+    }
+
+    # Format ingredients based on their structure
+    if isinstance(recipe_context['ingredients'][0], dict):
+        formatted_ingredients = ', '.join(
+            [f"{ing.get('name', 'Unknown')} ({ing.get('amount', 'Unknown amount')})" for ing in
+             recipe_context['ingredients']])
+    else:
+        formatted_ingredients = ', '.join(recipe_context['ingredients'])
+
+    cooking_step_prompt = f"""레시피 '{recipe_context['name']}'의 {request.step_number}번째 조리 단계에 대한 상세 정보를 JSON 형식으로 제공해주세요.
+
+    레시피 컨텍스트:
+    - 재료: {formatted_ingredients}
+    - 현재 단계 지침: {recipe_context['instructions']}
+
+    다음 구조를 따라 자세한 정보를 작성해주세요:
+    {{
+      "recipe_id": "{request.recipe_id}",
+      "step_number": {request.step_number},
+      "description": "조리 과정에 대한 상세한 설명. 다음 내용을 포함해주세요:
+        1. 정확한 조리 방법과 기술
+        2. 주의해야 할 점
+        3. 시간이나 온도와 같은 구체적인 수치
+        4. 재료의 상태나 질감에 대한 설명
+        5. 이 단계를 잘 수행하기 위한 팁이나 요령"
+    }}
+
+    주의사항:
+    1. 설명은 초보자도 이해하기 쉽게 상세하고 명확하게 작성해주세요.
+    2. 안전과 관련된 주의사항이 있다면 반드시 포함시켜주세요.
+    3. 요리의 맛과 품질을 향상시킬 수 있는 전문적인 조언을 제공해주세요.
+    4. 반드시 유효한 JSON 형식으로만 응답해주세요. 추가 설명이나 주석은 불필요합니다.
+    """
 
-        Style: Photorealistic, high-quality food photography suitable for a professional cookbook or culinary website.
-        """
+    logging.debug(f"Cooking step prompt: {cooking_step_prompt}")
 
-        image_response = openai_client.images.generate(
-            model="dall-e-3",
-            prompt=image_prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1,
-        )
+    messages = [
+        {"role": "system",
+         "content": "당신은 세계적인 요리 전문가입니다. 다양한 요리 기법과 재료에 대한 깊은 이해를 바탕으로, 정확하고 유용한 조리 정보를 제공합니다."},
+        {"role": "user", "content": cooking_step_prompt}
+    ]
+    cooking_step_response = await create_chat_completion("cooking_step", messages, context)
 
-        image_url = image_response.data[0].url
-        image_base64 = 'data:image/png;base64,' + download_and_encode_image(image_url)  # 이미지 다운로드 및 Base64 인코딩
+    # Log the full response for debugging
+    logging.debug(f"OpenAI API response: {cooking_step_response}")
 
-        cooking_step_dict = cooking_step.model_dump()
-        cooking_step_dict['image_base64'] = image_base64  # URL 대신 Base64 인코딩된 이미지 저장
-        result = await cooking_step_collection.insert_one(cooking_step_dict)
-        cooking_step_id = str(result.inserted_id)
+    # ChatGPT 응답 파싱
+    response_content = cooking_step_response.choices[0].message.content.strip()
+    logging.debug(f"Stripped response content: {response_content}")
 
-        return CookingStepResponse(id=cooking_step_id, cooking_step=cooking_step, image_base64=image_base64)
+    # 코드 블록 제거 및 JSON 추출
+    json_content = re.search(r'\{[\s\S]*\}', response_content)
+    if json_content:
+        response_content = json_content.group()
+        logging.debug(f"Extracted JSON content: {response_content}")
+    else:
+        logging.error("No JSON content found in the response")
+        raise ValueError("No JSON content found in the response")
 
+    try:
+        cooking_step_json = json.loads(response_content)
     except json.JSONDecodeError as e:
         logging.error(f"JSON decode error: {e}")
-        raise HTTPException(status_code=400, detail=f"생성된 조리 과정 정보를 JSON으로 파싱할 수 없습니다: {e}")
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}", exc_info=True)
-        raise HTTPException(status_code=400, detail=str(e))
+        raise ValueError(f"Invalid JSON: {e}")
+
+    logging.debug(f"Parsed JSON: {cooking_step_json}")
+
+    cooking_step = CookingStep(**cooking_step_json)
+
+    image_prompt = f"""Create a photorealistic image for the following cooking step:
+
+    Recipe: {recipe_context['name']}
+    Step Number: {cooking_step.step_number}
+    Description: {cooking_step.description}
+
+    Image requirements:
+    1. Show a close-up, detailed view of the exact action being performed.
+    2. Include the chef's hands and relevant utensils or equipment.
+    3. Ensure the ingredients or dish are clearly visible and identifiable.
+    4. Use bright, even lighting to highlight all details of the cooking process.
+    5. Capture the image from a slightly elevated angle (about 30-45 degrees) to provide a clear view of the cooking surface and action.
+    6. Reflect the correct stage of cooking (e.g., raw ingredients, partially cooked, or finished dish).
+    7. Include any specific visual cues mentioned in the step description (e.g., color changes, texture, or consistency).
+
+    Style: Photorealistic, high-quality food photography suitable for a professional cookbook or culinary website.
+    """
+
+    image_response = await openai_client.images.generate(
+        model="dall-e-3",
+        prompt=image_prompt,
+        size="1024x1024",
+        quality="standard",
+        n=1,
+    )
+
+    # 이미지 생성 비용까지 지불했으므로 연결이 끊겨도 끝까지 저장
+    context.mark_worth_caching()
+
+    image_url = image_response.data[0].url
+    image_base64 = await fetch_image_to_storage(image_url)  # 이미지 다운로드 후 저장소에 저장
+
+    cooking_step_dict = cooking_step.model_dump()
+    cooking_step_dict['image_base64'] = image_base64  # 만료되는 URL 대신 저장된 이미지 저장
+    cooking_step_dict['etag'] = compute_etag(cooking_step.model_dump(), image_base64)
+    cooking_step_dict['generation'] = generation_metadata("cooking_step", cooking_step_response.model)
+    if step_id:
+        previous = await cooking_step_collection.find_one_and_update(
+            {"_id": ObjectId(step_id)}, {"$set": cooking_step_dict}, {"image_base64": 1})
+        # 교체된 이미지를 저장소에서 지움
+        if previous and previous.get("image_base64") != image_base64:
+            await delete_image(previous.get("image_base64"))
+        return CookingStepResponse(id=step_id, cooking_step=cooking_step, image_base64=image_base64)
+
+    result = await cooking_step_collection.insert_one(cooking_step_dict)
+    cooking_step_id = str(result.inserted_id)
+
+    return CookingStepResponse(id=cooking_step_id, cooking_step=cooking_step, image_base64=image_base64)
@@ -1,114 +1,208 @@
 import json
 import logging
 import re
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-from app.config import client as openai_client
+from app.config import client as openai_client, GENERATED_CACHE_CONTROL
 from app.database import ingredients_info_collection
+from app.dependencies.auth import verify_token
+from app.dependencies.fieldset import get_fieldset
 from app.models.error_models import ErrorResponse
 from app.models.recipe.ingredient_info_models import IngredientRequest, Ingredient, IngredientResponse
-from app.utils.image_utils import download_and_encode_image
+from app.utils.autocomplete import autocomplete_index
+from app.utils.cancellation import GenerationContext
+from app.utils.etag_utils import cache_headers, compute_etag, ensure_etag, etag_matches, not_modified
+from app.utils.fieldset_utils import Fieldset
+from app.utils.freshness import generation_metadata, is_stale, schedule_refresh
+from app.utils.idempotency import claim_idempotency_key, run_idempotent
+from app.utils.image_storage import delete_image
+from app.utils.image_utils import fetch_image_to_storage
+from app.utils.llm_utils import create_chat_completion
+from app.utils.response_utils import pick_fields, trusted_response
 
 router = APIRouter()
 
+# 응답 필드 → 문서 필드
+INGREDIENT_FIELDS = {"id": "_id", "ingredient": list(Ingredient.model_fields), "image_base64": "image_base64"}
+
 
 @router.post("/recipe/ingredient-info", tags=["Recipe"], response_model=IngredientResponse,
              responses={400: {"model": ErrorResponse}})
-async def get_ingredient_info(request: IngredientRequest):
+async def get_ingredient_info(request: IngredientRequest, http_request: Request,
+                              fieldset: Fieldset = Depends(get_fieldset), user_id: str = Depends(verify_token)):
     """
     식재료 이름으로 검색하여 정보를 반환하거나, 없으면 새로 생성합니다.
+    If-None-Match 헤더의 ETag가 저장된 정보와 같으면 304를 반환합니다.
+    오래된 정보는 바로 반환하고 백그라운드에서 다시 생성합니다.
+    Idempotency-Key 헤더가 있으면 같은 키로 재시도한 요청은 새로 생성하지 않고 진행 중인 생성을 기다리거나 저장된 응답을 반환합니다.
+    fields / exclude 파라미터로 필요한 필드만 받을 수 있습니다.
     """
     try:
-        # 데이터베이스에서 재료 검색
-        ingredient_data = await ingredients_info_collection.find_one({"name": request.ingredient_name})
+        # 조건부 요청이면 ETag와 생성 정보만 읽어 확인
+        if http_request.headers.get("if-none-match"):
+            stored = await ingredients_info_collection.find_one({"name": request.ingredient_name},
+                                                                {"etag": 1, "generation": 1})
+            etag = fieldset.etag(stored.get("etag")) if stored else None
+            if etag_matches(http_request, etag):
+                # 항상 재검증하는 클라이언트에도 새 프롬프트 버전이 퍼지도록 304를 보내기 전에 재생성 예약
+                _refresh_if_stale(stored, request)
+                return not_modified(etag, GENERATED_CACHE_CONTROL)
+
+        # 데이터베이스에서 재료 검색 (요청된 필드만 읽음)
+        projection = fieldset.projection(INGREDIENT_FIELDS, required=("_id", "etag", "generation"))
+        ingredient_data = await ingredients_info_collection.find_one({"name": request.ingredient_name}, projection)
 
         if ingredient_data:
-            # 이미 존재하는 재료 정보 반환
-            image_base64 = ingredient_data.pop('image_base64', None)
-            ingredient_id = str(ingredient_data.pop('_id'))
-            ingredient = Ingredient(**ingredient_data)
-            return IngredientResponse(ingredient=ingredient, image_base64=image_base64, id=ingredient_id)
-
-        # 재료 정보가 없으면 새로 생성
-        ingredient_prompt = f"""'{request.ingredient_name}'에 대한 상세한 정보를 JSON 형식으로 생성해주세요. 다음 구조를 따라주세요:
-
-        {{
-          "name": "{request.ingredient_name}",
-          "description": "식재료에 대한 상세한 설명. 다음 내용을 포함해주세요:
-            1. 식재료의 일반적인 특징 (외형, 맛, 향 등)
-            2. 영양학적 가치 (주요 영양소, 건강상의 이점 등)
-            3. 일반적인 조리법이나 사용 방법
-            4. 보관 방법 및 유통기한
-            5. 구매 시 주의사항이나 선별 방법",
-          "category": "식재료의 대분류 (예: 채소, 과일, 육류, 해산물, 유제품, 곡물 등)",
-          "season": "제철 시기 또는 '연중' (해당되는 경우)",
-          "alternatives": ["대체 가능한 식재료 목록 (2-3개)"]
-        }}
-
-        주의사항:
-        1. 설명은 정확하고 객관적이어야 하며, 과학적 근거가 있는 정보를 제공해야 합니다.
-        2. 각 항목에 대해 구체적이고 유용한 정보를 제공해주세요.
-        3. 반드시 유효한 JSON 형식으로만 응답해주세요. 추가 설명이나 주석은 불필요합니다.
-        """
-
-        ingredient_response = openai_client.chat.completions.create(
-            model="chatgpt-4o-latest",
-            messages=[
-                {"role": "system", "content": "당신은 식품영양학과 요리 전문가입니다. 다양한 식재료에 대한 깊이 있는 지식을 바탕으로, 정확하고 유용한 정보를 제공합니다."},
-                {"role": "user", "content": ingredient_prompt}
-            ]
-        )
-
-        # ChatGPT 응답 파싱
-        response_content = ingredient_response.choices[0].message.content.strip()
-
-        # 코드 블록 제거 및 JSON 추출
-        json_content = re.search(r'\{[\s\S]*\}', response_content)
-        if json_content:
-            response_content = json_content.group()
-
-        ingredient_json = json.loads(response_content)
-        ingredient = Ingredient(**ingredient_json)
-
-        image_prompt = f"""Create a high-quality, photorealistic image of {ingredient.name} with the following specifications:
-
-        1. Subject: A fresh, pristine {ingredient.name} in its most commonly found or used form.
-        2. Setting: Place the ingredient in a context that suggests its culinary use or natural environment.
-        3. Lighting: Use bright, even lighting to clearly show the ingredient's color, texture, and details.
-        4. Composition: 
-           - Main focus should be on the {ingredient.name}, occupying about 70% of the frame.
-           - Include some complementary elements that hint at its use or origin (e.g., a cutting board, knife, or typical accompanying ingredients).
-        5. Style: Clean, professional food photography style, as if for a high-end cookbook or culinary magazine.
-        6. Detail: Capture the unique characteristics described: {ingredient.description[:100]}...
-
-        Additional notes:
-        - If applicable, show the ingredient both whole and cut to reveal its interior.
-        - Avoid any text or labels in the image.
-        - Ensure the image is appetizing and showcases the ingredient in its best light.
-        """
-
-        image_response = openai_client.images.generate(
-            model="dall-e-3",
-            prompt=image_prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1,
-        )
-
-        image_url = image_response.data[0].url
-        image_base64 = 'data:image/png;base64,' + download_and_encode_image(image_url)  # 이미지 다운로드 및 Base64 인코딩
-
-        ingredient_dict = ingredient.model_dump()
-        ingredient_dict['image_base64'] = image_base64  # URL 대신 Base64 인코딩된 이미지 저장
-        result = await ingredients_info_collection.insert_one(ingredient_dict)
-        ingredient_id = str(result.inserted_id)
+            _refresh_if_stale(ingredient_data, request)
 
-        return IngredientResponse(ingredient=ingredient, image_base64=image_base64, id=ingredient_id)
-    
+            # 이미 존재하는 재료 정보 반환
+            etag = ingredient_data.get("etag") if fieldset \
+                else await ensure_etag(ingredients_info_collection, ingredient_data, Ingredient)
+            return trusted_response(fieldset.prune({
+                "id": str(ingredient_data['_id']),
+                "ingredient": pick_fields(ingredient_data, Ingredient),
+                "image_base64": ingredient_data.get('image_base64'),
+            }), headers=cache_headers(fieldset.etag(etag), GENERATED_CACHE_CONTROL))
+
+        # 같은 Idempotency-Key로 끝난 요청이 있으면 저장된 응답을 사용
+        claim = await claim_idempotency_key(http_request, user_id, "ingredient_info", request)
+        if claim and claim.response is not None:
+            ingredient_response = IngredientResponse(**claim.response)
+        else:
+            # 재료 정보가 없으면 새로 생성 (클라이언트가 연결을 끊으면 취소)
+            ingredient_response = await run_idempotent(
+                http_request, claim, f"ingredient-info:{request.ingredient_name}",
+                lambda context: generate_ingredient_info(request, context))
+        etag = compute_etag(ingredient_response.ingredient.model_dump(), ingredient_response.image_base64)
+        return trusted_response(fieldset.prune(ingredient_response.model_dump()),
+                                headers=cache_headers(fieldset.etag(etag), GENERATED_CACHE_CONTROL))
+
+    except HTTPException:
+        raise
     except json.JSONDecodeError as e:
         logging.error(f"JSON decode error: {e}")
         raise HTTPException(status_code=400, detail=f"생성된 식재료 정보를 JSON으로 파싱할 수 없습니다: {e}")
     except Exception as e:
         logging.error(f"Unexpected error: {e}", exc_info=True)
         raise HTTPException(status_code=400, detail=str(e))
+
+
+def _refresh_if_stale(ingredient_data: dict, request: IngredientRequest) -> None:
+    if is_stale("ingredient_info", ingredient_data):
+        # 오래된 정보도 바로 반환하고, 같은 문서를 백그라운드에서 다시 생성
+        ingredient_id = str(ingredient_data["_id"])
+        schedule_refresh("ingredient_info", f"ingredient-info:{ingredient_id}",
+                         lambda context: generate_ingredient_info(request, context, ingredient_id=ingredient_id))
+
+
+async def generate_ingredient_info(request: IngredientRequest, context: GenerationContext,
+                                   ingredient_id: Optional[str] = None) -> IngredientResponse:
+    """
+    GPT와 DALL·E로 식재료 정보를 생성하고 저장합니다.
+    ingredient_id가 주어지면 오래된 정보를 다시 생성하여 같은 문서를 교체합니다.
+    """
+    messages = ingredient_messages(request)
+    ingredient_response = await create_chat_completion("ingredient_info", messages, context)
+    return await save_generated_ingredient_info(ingredient_response.choices[0].message.content,
+                                                ingredient_response.model, context, ingredient_id)
+
+
+def ingredient_messages(request: IngredientRequest) -> List[dict]:
+    """
+    식재료 정보 생성 프롬프트를 만듭니다.
+    """
+    ingredient_prompt = f"""'{request.ingredient_name}'에 대한 상세한 정보를 JSON 형식으로 생성해주세요. 다음 구조를 따라주세요:
+
+    {{
+      "name": "{request.ingredient_name}",
+      "description": "식재료에 대한 상세한 설명. 다음 내용을 포함해주세요:
+        1. 식재료의 일반적인 특징 (외형, 맛, 향 등)
+        2. 영양학적 가치 (주요 영양소, 건강상의 이점 등)
+        3. 일반적인 조리법이나 사용 방법
+        4. 보관 방법 및 유통기한
+        5. 구매 시 주의사항이나 선별 방법",
+      "category": "식재료의 대분류 (예: 채소, 과일, 육류, 해산물, 유제품, 곡물 등)",
+      "season": "제철 시기 또는 '연중' (해당되는 경우)",
+      "alternatives": ["대체 가능한 식재료 목록 (2-3개)"]
+    }}
+
+    주의사항:
+    1. 설명은 정확하고 객관적이어야 하며, 과학적 근거가 있는 정보를 제공해야 합니다.
+    2. 각 항목에 대해 구체적이고 유용한 정보를 제공해주세요.
+    3. 반드시 유효한 JSON 형식으로만 응답해주세요. 추가 설명이나 주석은 불필요합니다.
+    """
+
+    messages = [
+        {"role": "system", "content": "당신은 식품영양학과 요리 전문가입니다. 다양한 식재료에 대한 깊이 있는 지식을 바탕으로, 정확하고 유용한 정보를 제공합니다."},
+        {"role": "user", "content": ingredient_prompt}
+    ]
+    return messages
+
+
+async def save_generated_ingredient_info(response_content: str, model: str, context: GenerationContext,
+                                         ingredient_id: Optional[str] = None) -> IngredientResponse:
+    """
+    모델이 생성한 식재료 정보 JSON으로 DALL·E 이미지를 만들고 식재료 정보를 저장합니다.
+    """
+    # ChatGPT 응답 파싱
+    response_content = response_content.strip()
+
+    # 코드 블록 제거 및 JSON 추출
+    json_content = re.search(r'\{[\s\S]*\}', response_content)
+    if json_content:
+        response_content = json_content.group()
+
+    ingredient_json = json.loads(response_content)
+    ingredient = Ingredient(**ingredient_json)
+
+    image_prompt = f"""Create a high-quality, photorealistic image of {ingredient.name} with the following specifications:
+
+    1. Subject: A fresh, pristine {ingredient.name} in its most commonly found or used form.
+    2. Setting: Place the ingredient in a context that suggests its culinary use or natural environment.
+    3. Lighting: Use bright, even lighting to clearly show the ingredient's color, texture, and details.
+    4. Composition: 
+       - Main focus should be on the {ingredient.name}, occupying about 70% of the frame.
+       - Include some complementary elements that hint at its use or origin (e.g., a cutting board, knife, or typical accompanying ingredients).
+    5. Style: Clean, professional food photography style, as if for a high-end cookbook or culinary magazine.
+    6. Detail: Capture the unique characteristics described: {ingredient.description[:100]}...
+
+    Additional notes:
+    - If applicable, show the ingredient both whole and cut to reveal its interior.
+    - Avoid any text or labels in the image.
+    - Ensure the image is appetizing and showcases the ingredient in its best light.
+    """
+
+    image_response = await openai_client.images.generate(
+        model="dall-e-3",
+        prompt=image_prompt,
+        size="1024x1024",
+        quality="standard",
+        n=1,
+    )
+
+    # 이미지 생성 비용까지 지불했으므로 연결이 끊겨도 끝까지 저장
+    context.mark_worth_caching()
+
+    image_url = image_response.data[0].url
+    image_base64 = await fetch_image_to_storage(image_url)  # 이미지 다운로드 후 저장소에 저장
+
+    ingredient_dict = ingredient.model_dump()
+    ingredient_dict['image_base64'] = image_base64  # 만료되는 URL 대신 저장된 이미지 저장
+    ingredient_dict['etag'] = compute_etag(ingredient.model_dump(), image_base64)
+    ingredient_dict['generation'] = generation_metadata("ingredient_info", model)
+    if ingredient_id:
+        previous = await ingredients_info_collection.find_one_and_update(
+            {"_id": ObjectId(ingredient_id)}, {"$set": ingredient_dict}, {"image_base64": 1})
+        # 교체된 이미지를 저장소에서 지움
+        if previous and previous.get("image_base64") != image_base64:
+            await delete_image(previous.get("image_base64"))
+        return IngredientResponse(ingredient=ingredient, image_base64=image_base64, id=ingredient_id)
+
+    result = await ingredients_info_collection.insert_one(ingredient_dict)
+    ingredient_id = str(result.inserted_id)
+    autocomplete_index.add(ingredient.name, "ingredient", ingredient_id)
+
+    return IngredientResponse(ingredient=ingredient, image_base64=image_base64, id=ingredient_id)
@@ -0,0 +1,58 @@
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.config import MAX_MEAL_PLAN_RECIPES
+from app.database import recipe_collection, refrigerator_collection
+from app.dependencies.auth import verify_token
+from app.models.error_models import ErrorResponse
+from app.models.recipe.meal_plan_models import MealPlanRequest, MealPlanResponse
+from app.utils.meal_plan_utils import summarize_plan
+from app.utils.response_utils import trusted_response
+
+router = APIRouter()
+
+# 합산에 필요한 필드만 읽음 (이미지는 읽지 않음)
+MEAL_PLAN_PROJECTION = {"name": 1, "servings": 1, "nutrition": 1, "nutritionValues": 1, "ingredients": 1}
+
+
+@router.post("/recipe/meal-plan", tags=["Recipe"], response_model=MealPlanResponse,
+             responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
+async def create_meal_plan(request: MealPlanRequest, user_id: str = Depends(verify_token)):
+    """
+    여러 레시피와 인분 수로 식단을 구성하여 영양 정보 합계와 필요한 재료 목록을 반환합니다.
+    같은 재료는 단위를 맞춰 합치고, 냉장고에 있는 재료를 뺀 장보기 목록을 함께 반환합니다.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="식단에 레시피를 추가해주세요.")
+    if len(request.items) > MAX_MEAL_PLAN_RECIPES:
+        raise HTTPException(status_code=400, detail=f"레시피는 최대 {MAX_MEAL_PLAN_RECIPES}개까지 추가할 수 있습니다.")
+
+    try:
+        object_ids = [ObjectId(item.recipe_id) for item in request.items]
+    except:
+        raise HTTPException(status_code=404, detail="유효하지 않은 레시피 ID입니다.")
+
+    try:
+        # 모든 레시피를 한 번의 쿼리로 읽음
+        documents = await recipe_collection.find({"_id": {"$in": object_ids}}, MEAL_PLAN_PROJECTION) \
+            .to_list(length=None)
+        documents = {str(document["_id"]): document for document in documents}
+
+        missing = [item.recipe_id for item in request.items if item.recipe_id not in documents]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"해당 ID의 레시피를 찾을 수 없습니다: {', '.join(missing)}")
+
+        recipes = [documents[item.recipe_id] for item in request.items]
+        refrigerator = await refrigerator_collection.find(
+            {"user_id": user_id}, {"_id": 0, "name": 1, "amount": 1, "unit": 1}).to_list(length=None)
+
+        summary = summarize_plan(recipes, [item.servings for item in request.items], refrigerator)
+        return trusted_response({
+            "recipes": [{"id": item.recipe_id, "name": recipe.get("name"), "servings": item.servings}
+                        for item, recipe in zip(request.items, recipes)],
+            **summary,
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
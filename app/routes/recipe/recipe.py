@@ -1,165 +1,349 @@
+import asyncio
 import json
 import logging
 import re
+from typing import List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-from app.config import client as openai_client
-from app.database import recipe_collection, refrigerator_collection, preference_collection
+from app.config import client as openai_client, GENERATED_CACHE_CONTROL, RECOMMEND_MIN_COVERAGE, RECIPE_PIPELINE
+from app.database import recipe_collection, refrigerator_collection, preference_collection, cooking_step_collection
+from app.dependencies.auth import verify_token
+from app.dependencies.fieldset import get_fieldset
 from app.models.error_models import ErrorResponse
 from app.models.recipe.recipe_models import Recipe, RecipeRequest, RecipeResponse
-from app.utils.image_utils import download_and_encode_image
+from app.utils import metrics
+from app.utils.autocomplete import autocomplete_index
+from app.utils.cancellation import GenerationContext
+from app.utils.etag_utils import cache_headers, compute_etag, ensure_etag, etag_matches, not_modified
+from app.utils.fieldset_utils import Fieldset
+from app.utils.freshness import generation_metadata, is_stale, schedule_refresh
+from app.utils.idempotency import claim_idempotency_key, run_idempotent
+from app.utils.image_storage import delete_image
+from app.utils.image_utils import fetch_image_to_storage
+from app.utils.llm_utils import create_chat_completion, stream_chat_completion
+from app.utils.nutrition_utils import numeric_fields
+from app.utils.recipe_index import recipe_index
+from app.utils.recipe_stream import IMAGE_PROMPT_INGREDIENTS, RecipeStreamParser
+from app.utils.response_utils import pick_fields, trusted_response
+from app.utils.similarity_index import similarity_index
 
 router = APIRouter()
 
+# 응답 필드 → 문서 필드
+RECIPE_FIELDS = {"id": "_id", "recipe": list(Recipe.model_fields), "image_base64": "image_base64"}
+
 
 @router.post("/recipe", tags=["Recipe"], response_model=RecipeResponse, responses={400: {"model": ErrorResponse}})
-async def get_recipe(request: RecipeRequest):
+async def get_recipe(request: RecipeRequest, http_request: Request, fieldset: Fieldset = Depends(get_fieldset),
+                     user_id: str = Depends(verify_token)):
     """
     주어진 음식 이름에 대한 레시피를 검색하거나 생성합니다.
     사용자의 선호도를 반영하고, 선택적으로 냉장고 재료만 사용하도록 설정할 수 있습니다.
+    냉장고 재료를 사용하는 경우, 냉장고 재료로 만들 수 있는 저장된 레시피가 있으면 새로 생성하지 않고 반환합니다.
+    If-None-Match 헤더의 ETag가 저장된 레시피와 같으면 304를 반환합니다.
+    오래된 레시피는 바로 반환하고 백그라운드에서 다시 생성합니다.
+    Idempotency-Key 헤더가 있으면 같은 키로 재시도한 요청은 새로 생성하지 않고 진행 중인 생성을 기다리거나 저장된 응답을 반환합니다.
+    fields / exclude 파라미터로 필요한 필드만 받을 수 있습니다.
     """
     try:
-        # 데이터베이스에서 레시피 검색
-        recipe_data = await recipe_collection.find_one({"name": request.food_name})
+        # 조건부 요청이면 ETag와 생성 정보만 읽어 확인
+        if http_request.headers.get("if-none-match"):
+            stored = await recipe_collection.find_one({"name": request.food_name},
+                                                      {"etag": 1, "name": 1, "generation": 1})
+            etag = fieldset.etag(stored.get("etag")) if stored else None
+            if etag_matches(http_request, etag):
+                # 항상 재검증하는 클라이언트에도 새 프롬프트 버전이 퍼지도록 304를 보내기 전에 재생성 예약
+                _refresh_if_stale(stored)
+                return not_modified(etag, GENERATED_CACHE_CONTROL)
+
+        # 데이터베이스에서 레시피 검색 (요청된 필드만 읽음)
+        projection = fieldset.projection(RECIPE_FIELDS, required=("_id", "etag", "name", "generation"))
+        recipe_data = await recipe_collection.find_one({"name": request.food_name}, projection)
 
         if recipe_data:
             # 이미 존재하는 레시피 정보 반환
-            image_base64 = recipe_data.pop('image_base64', None)
-            recipe = Recipe(**recipe_data)
-            return RecipeResponse(id=str(recipe_data['_id']), recipe=recipe, image_base64=image_base64)
-
-        # 선호도 정보 가져오기
-        preferences = await preference_collection.find().to_list(length=None)
-        preference_info = ""
-        if preferences:
-            like_keywords = [p["name"] for p in preferences if p["type"] == "like"]
-            dislike_keywords = [p["name"] for p in preferences if p["type"] == "dislike"]
-            preference_info = f"""
-            선호하는 재료/맛: {', '.join(like_keywords)}
-            기피하는 재료/맛: {', '.join(dislike_keywords)}
-            """
+            return await _stored_recipe_response(recipe_data, fieldset)
 
-        # 냉장고 재료 정보 가져오기
-        refrigerator_info = ""
         if request.use_refrigerator:
-            ingredients = await refrigerator_collection.find().to_list(length=None)
-            if ingredients:
-                available_ingredients = [f"{i['name']} ({i['amount']}{i['unit']})" for i in ingredients]
-                refrigerator_info = f"""
-                사용 가능한 재료:
-                {', '.join(available_ingredients)}
-                
-                위 재료들만 사용하여 레시피를 만들어주세요.
-                """
-
-        # 레시피 생성 프롬프트
-        recipe_prompt = f"""'{request.food_name}'에 대한 상세한 레시피를 JSON 형식으로 생성해주세요.
-
-        {preference_info}
-        {refrigerator_info}
-
-        다음 구조를 따라주세요:
+            # 냉장고 재료로 만들 수 있는 비슷한 이름의 레시피가 이미 있으면 생성하지 않음
+            ingredients = await refrigerator_collection.find({"user_id": user_id}, {"_id": 0, "name": 1}) \
+                .to_list(length=None)
+            matches = recipe_index.recommend([ingredient["name"] for ingredient in ingredients], limit=1,
+                                             min_coverage=RECOMMEND_MIN_COVERAGE, name_contains=request.food_name)
+            if matches:
+                recipe_data = await recipe_collection.find_one({"_id": ObjectId(matches[0].id)}, projection)
+                if recipe_data:
+                    return await _stored_recipe_response(recipe_data, fieldset)
+
+        # 같은 Idempotency-Key로 끝난 요청이 있으면 저장된 응답을 사용
+        claim = await claim_idempotency_key(http_request, user_id, "recipe", request)
+        if claim and claim.response is not None:
+            recipe_response = RecipeResponse(**claim.response)
+        else:
+            # 클라이언트가 연결을 끊으면 생성 작업을 취소
+            recipe_response = await run_idempotent(
+                http_request, claim, f"recipe:{request.food_name}",
+                lambda context: generate_recipe(request, user_id, context))
+        etag = compute_etag(recipe_response.recipe.model_dump(), recipe_response.image_base64)
+        return trusted_response(fieldset.prune(recipe_response.model_dump()),
+                                headers=cache_headers(fieldset.etag(etag), GENERATED_CACHE_CONTROL))
+
+    except HTTPException:
+        raise
+    except json.JSONDecodeError as e:
+        logging.error(f"JSON decode error: {e}")
+        raise HTTPException(status_code=400, detail=f"생성된 레시피 정보를 JSON으로 파싱할 수 없습니다: {e}")
+    except Exception as e:
+        logging.error(f"Unexpected error: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _refresh_if_stale(recipe_data: dict) -> None:
+    if is_stale("recipe", recipe_data):
+        # 오래된 레시피도 바로 반환하고, 같은 문서를 백그라운드에서 다시 생성
+        recipe_id = str(recipe_data["_id"])
+        refresh_request = RecipeRequest(food_name=recipe_data["name"])
+        schedule_refresh("recipe", f"recipe:{recipe_id}",
+                         lambda context: generate_recipe(refresh_request, None, context, recipe_id=recipe_id))
+
+
+async def _stored_recipe_response(recipe_data: dict, fieldset: Fieldset):
+    _refresh_if_stale(recipe_data)
+    etag = recipe_data.get("etag") if fieldset else await ensure_etag(recipe_collection, recipe_data, Recipe)
+    return trusted_response(fieldset.prune({
+        "id": str(recipe_data['_id']),
+        "recipe": pick_fields(recipe_data, Recipe),
+        "image_base64": recipe_data.get('image_base64'),
+    }), headers=cache_headers(fieldset.etag(etag), GENERATED_CACHE_CONTROL))
+
+
+async def generate_recipe(request: RecipeRequest, user_id: Optional[str], context: GenerationContext,
+                          recipe_id: Optional[str] = None) -> RecipeResponse:
+    """
+    GPT와 DALL·E로 새 레시피를 생성하고 저장합니다.
+    요청한 사용자의 선호도와 냉장고 재료를 반영하지만, 생성된 레시피는 모든 사용자가 공유합니다.
+    recipe_id가 주어지면 오래된 레시피를 다시 생성하여 같은 문서를 교체합니다 (사용자 선호도는 반영하지 않음).
+    """
+    messages = await recipe_messages(request, user_id)
+    response_content, model, image_url = await generate_recipe_content(messages, context)
+    return await save_generated_recipe(response_content, model, context, recipe_id, image_url)
+
+
+async def generate_recipe_content(messages: List[dict], context: GenerationContext,
+                                  pipelined: bool = RECIPE_PIPELINE) -> Tuple[str, str, str]:
+    """
+    레시피 JSON과 DALL·E 이미지를 생성하여 (응답 내용, 모델, 이미지 URL)을 반환합니다.
+    pipelined이면 응답을 스트리밍으로 받으면서 이름, 설명, 앞쪽 재료가 나오는 즉시 이미지 생성을 시작하여
+    나머지 레시피(조리 과정 등)의 생성과 이미지 생성을 겹쳐 실행합니다.
+    """
+    if not pipelined:
+        recipe_response = await create_chat_completion("recipe", messages, context, completion_tokens=1000)
+        response_content = recipe_response.choices[0].message.content
+        recipe = parse_recipe(response_content)
+        image_url = await create_recipe_image(recipe.name, recipe.description,
+                                              [ingredient.name for ingredient in recipe.ingredients])
+        return response_content, recipe_response.model, image_url
+
+    parser = RecipeStreamParser()
+    image_task: Optional[asyncio.Task] = None
+
+    def on_text(delta: str) -> None:
+        nonlocal image_task
+        fields = parser.feed(delta)
+        if fields:
+            image_task = asyncio.create_task(create_recipe_image(*fields))
+            metrics.increment("recipe.pipelined_images")
+
+    try:
+        response_content, model = await stream_chat_completion("recipe", messages, on_text, context,
+                                                               completion_tokens=1000)
+        if image_task is None:
+            # 스트리밍 중에 필드를 찾지 못했으면 전체 레시피를 읽은 뒤 이미지 생성
+            recipe = parse_recipe(response_content)
+            image_task = asyncio.create_task(create_recipe_image(
+                recipe.name, recipe.description, [ingredient.name for ingredient in recipe.ingredients]))
+        return response_content, model, await image_task
+    except BaseException:
+        # 레시피 생성이 실패하거나 취소되면 진행 중인 이미지 생성도 취소
+        if image_task is not None:
+            image_task.cancel()
+        raise
+
+
+async def recipe_messages(request: RecipeRequest, user_id: Optional[str]) -> List[dict]:
+    """
+    레시피 생성 프롬프트를 만듭니다. user_id가 없으면 선호도를 반영하지 않습니다.
+    """
+    # 선호도 정보 가져오기
+    preferences = await preference_collection.find({"user_id": user_id}).to_list(length=None) if user_id else []
+    preference_info = ""
+    if preferences:
+        like_keywords = [p["name"] for p in preferences if p["type"] == "like"]
+        dislike_keywords = [p["name"] for p in preferences if p["type"] == "dislike"]
+        preference_info = f"""
+        선호하는 재료/맛: {', '.join(like_keywords)}
+        기피하는 재료/맛: {', '.join(dislike_keywords)}
+        """
+
+    # 냉장고 재료 정보 가져오기
+    refrigerator_info = ""
+    if request.use_refrigerator:
+        ingredients = await refrigerator_collection.find({"user_id": user_id}).to_list(length=None)
+        if ingredients:
+            available_ingredients = [f"{i['name']} ({i['amount']}{i['unit']})" for i in ingredients]
+            refrigerator_info = f"""
+            사용 가능한 재료:
+            {', '.join(available_ingredients)}
+            
+            위 재료들만 사용하여 레시피를 만들어주세요.
+            """
+
+    # 레시피 생성 프롬프트
+    recipe_prompt = f"""'{request.food_name}'에 대한 상세한 레시피를 JSON 형식으로 생성해주세요.
+
+    {preference_info}
+    {refrigerator_info}
+
+    다음 구조를 따라주세요:
+    {{
+      "name": "{request.food_name}",
+      "description": "요리에 대한 간단한 설명 (역사, 특징, 맛 등)",
+      "cookTime": "총 조리 시간 (예: '1시간 30분')",
+      "servings": 재료 양의 기준이 되는 인분 수 (정수),
+      "nutrition": {{
+        "calories": 1인분 기준 칼로리 (정수),
+        "protein": "단백질(g)",
+        "carbohydrates": "탄수화물(g)",
+        "fat": "지방(g)"
+      }},
+      "ingredients": [
+        {{
+          "name": "재료 이름",
+          "amount": 양 (숫자),
+          "unit": "단위 (g, ml, 개 등)"
+        }}
+      ],
+      "instructions": [
         {{
-          "name": "{request.food_name}",
-          "description": "요리에 대한 간단한 설명 (역사, 특징, 맛 등)",
-          "cookTime": "총 조리 시간 (예: '1시간 30분')",
-          "nutrition": {{
-            "calories": 1인분 기준 칼로리 (정수),
-            "protein": "단백질(g)",
-            "carbohydrates": "탄수화물(g)",
-            "fat": "지방(g)"
-          }},
-          "ingredients": [
-            {{
-              "name": "재료 이름",
-              "amount": 양 (숫자),
-              "unit": "단위 (g, ml, 개 등)"
-            }}
-          ],
-          "instructions": [
-            {{
-              "step": 단계 번호 (정수),
-              "description": "상세한 조리 방법 설명"
-            }}
-          ]
+          "step": 단계 번호 (정수),
+          "description": "상세한 조리 방법 설명"
         }}
+      ]
+    }}
 
-        주의사항:
-        1. 재료는 최소 5개 이상 포함해주세요.
-        2. 조리 단계는 최소 5단계 이상으로 상세히 설명해주세요.
-        3. 각 단계별 설명은 초보자도 이해할 수 있도록 구체적이고 명확하게 작성해주세요.
-        4. 영양 정보는 1인분 기준으로 제공해주세요.
-        5. 선호도 정보를 고려하여 레시피를 조정해주세요.
-        6. 냉장고 재료 사용이 지정된 경우, 해당 재료들만 사용하여 레시피를 만들어주세요.
-        7. 반드시 유효한 JSON 형식으로만 응답해주세요. 추가 설명이나 주석은 불필요합니다.
-        """
+    주의사항:
+    1. 재료는 최소 5개 이상 포함해주세요.
+    2. 조리 단계는 최소 5단계 이상으로 상세히 설명해주세요.
+    3. 각 단계별 설명은 초보자도 이해할 수 있도록 구체적이고 명확하게 작성해주세요.
+    4. 영양 정보는 1인분 기준으로 제공해주세요.
+    5. 선호도 정보를 고려하여 레시피를 조정해주세요.
+    6. 냉장고 재료 사용이 지정된 경우, 해당 재료들만 사용하여 레시피를 만들어주세요.
+    7. 반드시 유효한 JSON 형식으로만 응답해주세요. 추가 설명이나 주석은 불필요합니다.
+    """
 
-        recipe_response = openai_client.chat.completions.create(
-            model="chatgpt-4o-latest",
-            messages=[
-                {"role": "system", "content": "당신은 세계적인 요리 전문가입니다. 다양한 요리법과 식재료에 대한 깊은 이해를 바탕으로, 정확하고 맛있는 레시피를 제공합니다."},
-                {"role": "user", "content": recipe_prompt}
-            ]
-        )
-
-        # ChatGPT 응답 파싱
-        response_content = recipe_response.choices[0].message.content.strip()
-
-        # 코드 블록 제거 및 JSON 추출
-        json_content = re.search(r'\{[\s\S]*\}', response_content)
-        if json_content:
-            response_content = json_content.group()
-
-        recipe_json = json.loads(response_content)
-        recipe = Recipe(**recipe_json)
-
-        image_prompt = f"""Create a high-quality, photorealistic image of {recipe.name} with the following specifications:
-
-        1. Subject: A beautifully plated dish of {recipe.name}, ready to be served.
-        2. Setting: Place the dish in a context that complements its style and origin (e.g., rustic table for homestyle dishes, elegant setting for gourmet meals).
-        3. Lighting: Use soft, warm lighting to enhance the appetizing appearance of the food.
-        4. Composition: 
-           - The main dish should be the focal point, occupying about 70% of the frame.
-           - Include some garnishes or side elements that complement the main dish.
-           - You may include some background elements to set the scene (e.g., table setting, complementary ingredients).
-        5. Style: Professional food photography style, as if for a high-end restaurant menu or cookbook.
-        6. Details to highlight:
-           - Texture and color of the main ingredients
-           - Any unique features mentioned in the recipe description
-           - Garnishes or toppings that make the dish visually appealing
-
-        Recipe details:
-        - Description: {recipe.description}
-        - Main ingredients: {', '.join([ingredient.name for ingredient in recipe.ingredients[:5]])}
-
-        Additional notes:
-        - Ensure the image looks appetizing and showcases the dish in its best light.
-        - The plating should reflect the style and origin of the dish.
-        - Avoid any text or labels in the image.
-        """
+    messages = [
+        {"role": "system", "content": "당신은 세계적인 요리 전문가입니다. 다양한 요리법과 식재료에 대한 깊은 이해를 바탕으로, 정확하고 맛있는 레시피를 제공합니다."},
+        {"role": "user", "content": recipe_prompt}
+    ]
+    return messages
+
+
+def parse_recipe(response_content: str) -> Recipe:
+    """
+    모델 응답에서 레시피 JSON을 추출합니다.
+    """
+    # ChatGPT 응답 파싱
+    response_content = response_content.strip()
+
+    # 코드 블록 제거 및 JSON 추출
+    json_content = re.search(r'\{[\s\S]*\}', response_content)
+    if json_content:
+        response_content = json_content.group()
+
+    recipe_json = json.loads(response_content)
+    return Recipe(**recipe_json)
+
+
+async def create_recipe_image(name: str, description: str, ingredient_names: List[str]) -> str:
+    """
+    요리 이름, 설명, 앞쪽 재료 이름만으로 DALL·E 이미지를 생성하고 이미지 URL을 반환합니다.
+    """
+    image_prompt = f"""Create a high-quality, photorealistic image of {name} with the following specifications:
+
+    1. Subject: A beautifully plated dish of {name}, ready to be served.
+    2. Setting: Place the dish in a context that complements its style and origin (e.g., rustic table for homestyle dishes, elegant setting for gourmet meals).
+    3. Lighting: Use soft, warm lighting to enhance the appetizing appearance of the food.
+    4. Composition: 
+       - The main dish should be the focal point, occupying about 70% of the frame.
+       - Include some garnishes or side elements that complement the main dish.
+       - You may include some background elements to set the scene (e.g., table setting, complementary ingredients).
+    5. Style: Professional food photography style, as if for a high-end restaurant menu or cookbook.
+    6. Details to highlight:
+       - Texture and color of the main ingredients
+       - Any unique features mentioned in the recipe description
+       - Garnishes or toppings that make the dish visually appealing
+
+    Recipe details:
+    - Description: {description}
+    - Main ingredients: {', '.join(ingredient_names[:IMAGE_PROMPT_INGREDIENTS])}
+
+    Additional notes:
+    - Ensure the image looks appetizing and showcases the dish in its best light.
+    - The plating should reflect the style and origin of the dish.
+    - Avoid any text or labels in the image.
+    """
 
-        image_response = openai_client.images.generate(
-            model="dall-e-3",
-            prompt=image_prompt,
-            size="1024x1024",
-            quality="standard",
-            n=1,
-        )
+    image_response = await openai_client.images.generate(
+        model="dall-e-3",
+        prompt=image_prompt,
+        size="1024x1024",
+        quality="standard",
+        n=1,
+    )
+    return image_response.data[0].url
+
+
+async def save_generated_recipe(response_content: str, model: str, context: GenerationContext,
+                                recipe_id: Optional[str] = None, image_url: Optional[str] = None) -> RecipeResponse:
+    """
+    모델이 생성한 레시피 JSON과 이미지를 저장합니다. 이미지 URL이 없으면 DALL·E 이미지를 먼저 만듭니다.
+    """
+    recipe = parse_recipe(response_content)
+    if image_url is None:
+        image_url = await create_recipe_image(recipe.name, recipe.description,
+                                              [ingredient.name for ingredient in recipe.ingredients])
 
-        image_url = image_response.data[0].url
-        image_base64 = 'data:image/png;base64,' + download_and_encode_image(image_url)  # 이미지 다운로드 및 Base64 인코딩
+    # 이미지 생성 비용까지 지불했으므로 연결이 끊겨도 끝까지 저장
+    context.mark_worth_caching()
 
-        recipe_dict = recipe.model_dump()
-        recipe_dict['image_base64'] = image_base64  # URL 대신 Base64 인코딩된 이미지 저장
-        result = await recipe_collection.insert_one(recipe_dict)
-        recipe_id = str(result.inserted_id)
+    image_base64 = await fetch_image_to_storage(image_url)  # 이미지 다운로드 후 저장소에 저장
 
+    recipe_dict = recipe.model_dump()
+    recipe_dict['image_base64'] = image_base64  # 만료되는 URL 대신 저장된 이미지 저장
+    recipe_dict['etag'] = compute_etag(recipe.model_dump(), image_base64)
+    recipe_dict.update(numeric_fields(recipe_dict))  # 범위 검색용 숫자 필드
+    recipe_dict['generation'] = generation_metadata("recipe", model)
+    ingredient_names = [ingredient.name for ingredient in recipe.ingredients]
+
+    if recipe_id:
+        # ETag가 바뀌므로 이 레시피의 답변 캐시와 인분 수 캐시는 자동으로 무효화됨
+        previous = await recipe_collection.find_one_and_update(
+            {"_id": ObjectId(recipe_id)}, {"$set": recipe_dict}, {"image_base64": 1})
+        # 교체된 이미지를 저장소에서 지움
+        if previous and previous.get("image_base64") != image_base64:
+            await delete_image(previous.get("image_base64"))
+        recipe_index.update(recipe_id, recipe.name, ingredient_names)
+        similarity_index.update(recipe_id, recipe.name, recipe.description, ingredient_names, recipe_dict["etag"])
+        # 조리 단계 정보도 바뀐 레시피에 맞게 읽힐 때 다시 생성
+        await cooking_step_collection.update_many({"recipe_id": recipe_id}, {"$set": {"generation.stale": True}})
         return RecipeResponse(id=recipe_id, recipe=recipe, image_base64=image_base64)
 
-    except json.JSONDecodeError as e:
-        logging.error(f"JSON decode error: {e}")
-        raise HTTPException(status_code=400, detail=f"생성된 레시피 정보를 JSON으로 파싱할 수 없습니다: {e}")
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}", exc_info=True)
-        raise HTTPException(status_code=400, detail=str(e))
+    result = await recipe_collection.insert_one(recipe_dict)
+    recipe_id = str(result.inserted_id)
+    recipe_index.add(recipe_id, recipe.name, ingredient_names)
+    similarity_index.add(recipe_id, recipe.name, recipe.description, ingredient_names, recipe_dict["etag"])
+    autocomplete_index.add(recipe.name, "recipe", recipe_id)
+
+    return RecipeResponse(id=recipe_id, recipe=recipe, image_base64=image_base64)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.config import RECOMMEND_LIMIT
+from app.database import refrigerator_collection
+from app.dependencies.auth import verify_token
+from app.models.error_models import ErrorResponse
+from app.models.recipe.recommend_models import RecommendResponse
+from app.utils.recipe_index import recipe_index
+from app.utils.response_utils import trusted_response
+
+router = APIRouter()
+
+
+@router.get("/recipe/recommend", tags=["Recipe"], response_model=RecommendResponse,
+            responses={400: {"model": ErrorResponse}})
+async def recommend_recipes(limit: int = Query(RECOMMEND_LIMIT, ge=1, le=100),
+                            min_coverage: float = Query(0.0, ge=0.0, le=1.0),
+                            user_id: str = Depends(verify_token)):
+    """
+    저장된 레시피 중 냉장고 재료로 만들 수 있는 비율이 높은 레시피를 추천합니다.
+    각 레시피에 대해 갖춘 재료의 비율과 부족한 재료를 함께 반환합니다.
+    """
+    try:
+        ingredients = await refrigerator_collection.find({"user_id": user_id}, {"_id": 0, "name": 1}) \
+            .to_list(length=None)
+        matches = recipe_index.recommend([ingredient["name"] for ingredient in ingredients], limit, min_coverage)
+        return trusted_response({"recipes": [match._asdict() for match in matches]})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
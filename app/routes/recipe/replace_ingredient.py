@@ -3,20 +3,25 @@ import logging
 import re
 
 from bson import ObjectId
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 
-from app.config import client as openai_client
 from app.database import recipe_collection
+from app.models.recipe.recipe_models import Recipe
 from app.models.recipe.replace_ingredient_models import ReplaceIngredientRequest, ReplaceIngredientResponse
+from app.utils.answer_cache import find_answer, store_answer
+from app.utils.cancellation import run_cancellable
+from app.utils.etag_utils import ensure_etag
+from app.utils.llm_utils import create_chat_completion
 
 router = APIRouter()
 logging.basicConfig(level=logging.DEBUG)
 
 
 @router.post("/recipe/replace-ingredient", tags=["Recipe"], response_model=ReplaceIngredientResponse)
-async def replace_ingredient(request: ReplaceIngredientRequest):
+async def replace_ingredient(request: ReplaceIngredientRequest, http_request: Request):
     """
     레시피의 특정 재료에 대한 대체 재료를 추천하고 맛의 변화를 설명합니다.
+    같은 레시피의 같은 재료에 대한 추천은 레시피가 바뀌기 전까지 저장된 답을 사용합니다.
     """
     try:
         # 데이터베이스에서 레시피 검색
@@ -29,6 +34,13 @@ async def replace_ingredient(request: ReplaceIngredientRequest):
         if not ingredient_exists:
             raise HTTPException(status_code=404, detail="지정된 재료를 레시피에서 찾을 수 없습니다.")
 
+        # 재료 이름이 곧 질문이므로 정확히 일치하는 답만 사용
+        recipe_etag = await ensure_etag(recipe_collection, recipe, Recipe)
+        cached = await find_answer("replace_ingredient", request.recipe_id, recipe_etag, request.ingredient_name,
+                                   similar=False)
+        if cached:
+            return ReplaceIngredientResponse(**cached)
+
         # 대체 재료 및 맛 변화 설명을 위한 프롬프트
         prompt = f"""다음 레시피의 '{request.ingredient_name}'를 대체할 수 있는 가장 적합한 재료와 그로 인한 맛의 변화를 설명해주세요.
 
@@ -52,14 +64,13 @@ async def replace_ingredient(request: ReplaceIngredientRequest):
 
         logging.debug(f"Replace ingredient prompt: {prompt}")
 
-        response = openai_client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {"role": "system", "content": "당신은 요리 전문가로서 재료 대체에 대한 전문적인 지식을 가지고 있습니다."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
+        messages = [
+            {"role": "system", "content": "당신은 요리 전문가로서 재료 대체에 대한 전문적인 지식을 가지고 있습니다."},
+            {"role": "user", "content": prompt}
+        ]
+        response = await run_cancellable(
+            http_request, f"replace-ingredient:{request.recipe_id}:{request.ingredient_name}",
+            lambda context: create_chat_completion("replace_ingredient", messages, context, temperature=0.7))
 
         # Log the full response for debugging
         logging.debug(f"OpenAI API response: {response}")
@@ -85,11 +96,17 @@ async def replace_ingredient(request: ReplaceIngredientRequest):
 
         logging.debug(f"Parsed JSON: {result_json}")
 
-        return ReplaceIngredientResponse(
+        result = ReplaceIngredientResponse(
             replaced_ingredient=result_json["replaced_ingredient"],
             taste_change_description=result_json["taste_change_description"]
         )
+        await store_answer("replace_ingredient", request.recipe_id, recipe_etag, request.ingredient_name,
+                           result.model_dump())
+
+        return result
 
+    except HTTPException:
+        raise
     except json.JSONDecodeError as e:
         logging.error(f"JSON decode error: {e}")
         raise HTTPException(status_code=400, detail=f"생성된 대체 재료 정보를 JSON으로 파싱할 수 없습니다: {e}")
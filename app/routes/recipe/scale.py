@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from typing import Tuple
+
+from bson import ObjectId
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.config import GENERATED_CACHE_CONTROL, SCALED_RECIPE_CACHE_SIZE
+from app.database import recipe_collection
+from app.models.error_models import ErrorResponse
+from app.models.recipe.recipe_models import Recipe
+from app.models.recipe.scale_models import ScaledRecipeResponse
+from app.utils import metrics
+from app.utils.etag_utils import cache_headers, ensure_etag, etag_matches, not_modified
+from app.utils.response_utils import trusted_response
+from app.utils.scaling_utils import scale_recipe
+
+router = APIRouter()
+
+# (레시피 ID, 인분 수) → (ETag, 응답 내용), 오래 쓰지 않은 항목부터 제거
+_scaled_cache: "OrderedDict[Tuple[str, int], Tuple[str, dict]]" = OrderedDict()
+
+# 인분 수 계산에 필요한 필드만 읽음
+SCALE_PROJECTION = {"name": 1, "description": 1, "cookTime": 1, "servings": 1, "nutrition": 1,
+                    "nutritionValues": 1, "ingredients": 1, "instructions": 1, "etag": 1}
+
+
+@router.get("/recipe/{recipe_id}/scale", tags=["Recipe"], response_model=ScaledRecipeResponse,
+            responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
+async def get_scaled_recipe(recipe_id: str, http_request: Request, servings: int = Query(..., ge=1, le=100)):
+    """
+    레시피의 재료 양을 주어진 인분 수에 맞게 바꾸고, 전체 영양 정보를 다시 계산하여 반환합니다.
+    단위는 읽기 좋은 범위로 바꿉니다 (예: 1200g → 1.2kg, 3큰술 → 1.5큰술).
+    모델을 호출하지 않으며, 결과는 (레시피 ID, 인분 수)별로 캐시됩니다.
+    """
+    try:
+        object_id = ObjectId(recipe_id)
+    except:
+        raise HTTPException(status_code=404, detail="유효하지 않은 레시피 ID입니다.")
+
+    try:
+        # 레시피의 ETag만 읽어 캐시가 유효한지 확인
+        stored = await recipe_collection.find_one({"_id": object_id}, {"etag": 1})
+        if not stored:
+            raise HTTPException(status_code=404, detail="해당 ID의 레시피를 찾을 수 없습니다.")
+
+        recipe = None
+        base_etag = stored.get("etag")
+        if base_etag is None:
+            # ETag가 없는 예전 레시피는 이미지까지 읽어 ETag를 계산해 둠
+            recipe = await recipe_collection.find_one({"_id": object_id})
+            base_etag = await ensure_etag(recipe_collection, recipe, Recipe)
+        etag = f'{base_etag[:-1]}-s{servings}"'
+        if etag_matches(http_request, etag):
+            return not_modified(etag, GENERATED_CACHE_CONTROL)
+        headers = cache_headers(etag, GENERATED_CACHE_CONTROL)
+
+        key = (recipe_id, servings)
+        cached = _scaled_cache.get(key)
+        if cached and cached[0] == etag:
+            _scaled_cache.move_to_end(key)
+            metrics.increment("scale.cache_hits")
+            return trusted_response(cached[1], headers=headers)
+
+        metrics.increment("scale.cache_misses")
+        if recipe is None:
+            recipe = await recipe_collection.find_one({"_id": object_id}, SCALE_PROJECTION)
+        content = {"id": recipe_id, **scale_recipe(recipe, servings)}
+
+        _scaled_cache[key] = (etag, content)
+        _scaled_cache.move_to_end(key)
+        while len(_scaled_cache) > SCALED_RECIPE_CACHE_SIZE:
+            _scaled_cache.popitem(last=False)
+
+        return trusted_response(content, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
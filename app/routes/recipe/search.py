@@ -1,46 +1,127 @@
+import asyncio
+from typing import List, Optional
+
 from bson.regex import Regex
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pymongo import ASCENDING
 
 from app.database import recipe_collection
-from app.models.recipe.search_models import SearchResponse, RecipeSimple
+from app.dependencies.fieldset import get_fieldset
+from app.models.recipe.search_models import SearchResponse
+from app.utils.fieldset_utils import Fieldset
+from app.utils.response_utils import trusted_response
 
 router = APIRouter()
 
+# 검색 결과 항목의 응답 필드 → 문서 필드
+SEARCH_RESULT_FIELDS = {"id": "_id", "name": "name", "image_base64": "image_base64"}
+
+# 패싯 구간 경계 (칼로리는 1인분 kcal, 조리 시간은 분)
+CALORIE_BOUNDARIES = [0, 300, 500, 800, 1200, 100000]
+COOK_TIME_BOUNDARIES = [0, 15, 30, 60, 120, 100000]
+
 
 @router.get("/recipe/search", tags=["Recipe"], response_model=SearchResponse)
-async def search_recipes(query: str):
+async def search_recipes(query: str = "",
+                         min_calories: Optional[float] = Query(None, ge=0),
+                         max_calories: Optional[float] = Query(None, ge=0),
+                         max_cook_time: Optional[int] = Query(None, ge=0, description="최대 조리 시간 (분)"),
+                         min_protein: Optional[float] = Query(None, ge=0, description="최소 단백질 (g)"),
+                         max_carbohydrates: Optional[float] = Query(None, ge=0, description="최대 탄수화물 (g)"),
+                         max_fat: Optional[float] = Query(None, ge=0, description="최대 지방 (g)"),
+                         facets: bool = False,
+                         fieldset: Fieldset = Depends(get_fieldset)):
     """
     주어진 검색어로 레시피를 검색합니다.
     검색은 레시피 이름과 설명을 대상으로 수행됩니다.
+    칼로리, 조리 시간, 단백질, 탄수화물, 지방의 범위로 결과를 거를 수 있으며, 검색어 없이 범위만으로도 검색할 수 있습니다.
+    facets=true이면 칼로리와 조리 시간 구간별 레시피 수를 함께 반환합니다.
+    fields / exclude 파라미터로 검색 결과 항목의 필드(id, name, image_base64)를 고를 수 있습니다.
     """
     try:
-        # 검색어가 비어있는 경우 처리
-        if not query.strip():
+        conditions = _range_conditions(min_calories, max_calories, max_cook_time,
+                                       min_protein, max_carbohydrates, max_fat)
+
+        # 검색어와 범위 조건이 모두 비어있는 경우 처리
+        if not query.strip() and not conditions:
             raise HTTPException(status_code=400, detail="검색어를 입력해주세요.")
 
-        # 대소문자 구분 없이 검색하기 위한 정규식 패턴 생성
-        search_pattern = Regex(f".*{query}.*", "i")
+        if query.strip():
+            # 대소문자 구분 없이 검색하기 위한 정규식 패턴 생성
+            search_pattern = Regex(f".*{query}.*", "i")
+            conditions.append({"$or": [{"name": search_pattern}, {"description": search_pattern}]})
+        match = {"$and": conditions} if len(conditions) > 1 else conditions[0]
 
-        # 이름 또는 설명에 검색어가 포함된 레시피 검색
-        search_results = await recipe_collection.find({
-            "$or": [
-                {"name": search_pattern},
-                {"description": search_pattern}
-            ]
-        }).sort("name", ASCENDING).to_list(length=None)
+        # 이름 또는 설명에 검색어가 포함된 레시피 검색 (응답에 필요한 필드만 읽음)
+        results_query = recipe_collection.find(match, fieldset.inclusion_projection(SEARCH_RESULT_FIELDS)) \
+            .sort("name", ASCENDING).to_list(length=None)
+        if facets:
+            search_results, facet_counts = await asyncio.gather(results_query, _facet_counts(match))
+        else:
+            search_results, facet_counts = await results_query, None
 
-        # 검색 결과를 RecipeSimple 모델로 변환
+        # 검색 결과를 RecipeSimple 형태로 변환
         simple_results = [
-            RecipeSimple(
-                id=str(recipe["_id"]),
-                name=recipe["name"],
-                image_base64=recipe.get("image_base64", "")  # Base64 이미지 사용
-            )
+            fieldset.prune({
+                "id": str(recipe["_id"]),
+                "name": recipe.get("name"),
+                "image_base64": recipe.get("image_base64", "")  # Base64 이미지 사용
+            })
             for recipe in search_results
         ]
 
-        return SearchResponse(search_results=simple_results)
+        content = {"search_results": simple_results}
+        if facet_counts is not None:
+            content["facets"] = facet_counts
+        return trusted_response(content)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"검색 중 오류가 발생했습니다: {str(e)}")
+
+
+def _range_conditions(min_calories, max_calories, max_cook_time, min_protein, max_carbohydrates, max_fat) -> List[dict]:
+    ranges = [
+        ("nutritionValues.calories", "$gte", min_calories),
+        ("nutritionValues.calories", "$lte", max_calories),
+        ("cookTimeMinutes", "$lte", max_cook_time),
+        ("nutritionValues.protein", "$gte", min_protein),
+        ("nutritionValues.carbohydrates", "$lte", max_carbohydrates),
+        ("nutritionValues.fat", "$lte", max_fat),
+    ]
+    bounds = {}
+    for field, operator, value in ranges:
+        if value is not None:
+            bounds.setdefault(field, {})[operator] = value
+    return [{field: bound} for field, bound in bounds.items()]
+
+
+async def _facet_counts(match: dict) -> dict:
+    """
+    한 번의 집계로 칼로리와 조리 시간 구간별 레시피 수를 구합니다.
+    """
+    pipeline = [
+        {"$match": match},
+        {"$facet": {
+            "calories": [{"$bucket": {"groupBy": "$nutritionValues.calories",
+                                      "boundaries": CALORIE_BOUNDARIES, "default": "unknown"}}],
+            "cook_time": [{"$bucket": {"groupBy": "$cookTimeMinutes",
+                                       "boundaries": COOK_TIME_BOUNDARIES, "default": "unknown"}}],
+        }},
+    ]
+    result = (await recipe_collection.aggregate(pipeline).to_list(length=1))[0]
+    return {
+        "calories": _buckets(result["calories"], CALORIE_BOUNDARIES),
+        "cook_time": _buckets(result["cook_time"], COOK_TIME_BOUNDARIES),
+    }
+
+
+def _buckets(counts: List[dict], boundaries: List[float]) -> List[dict]:
+    # 빈 구간도 0으로 채워 항상 같은 구간 목록을 반환
+    by_lower = {bucket["_id"]: bucket["count"] for bucket in counts}
+    buckets = [{"min": lower, "max": upper, "count": by_lower.get(lower, 0)}
+               for lower, upper in zip(boundaries, boundaries[1:])]
+    if by_lower.get("unknown"):
+        buckets.append({"min": None, "max": None, "count": by_lower["unknown"]})
+    return buckets
@@ -0,0 +1,74 @@
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.database import recipe_collection
+from app.dependencies.fieldset import get_fieldset
+from app.models.error_models import ErrorResponse
+from app.models.recipe.similar_models import SimilarRecipesResponse
+from app.utils.fieldset_utils import Fieldset
+from app.utils.response_utils import trusted_response
+from app.utils.similarity_index import similarity_index
+
+router = APIRouter()
+
+# 비슷한 레시피 항목의 응답 필드 → 문서 필드
+SIMILAR_RECIPE_FIELDS = {"id": "_id", "name": "name", "image_base64": "image_base64", "score": "_id"}
+
+# 삭제된 레시피를 대비해 더 가져오는 수와, 그래도 모자랄 때 다시 조회하는 최대 횟수
+SIMILAR_OVERFETCH = 5
+SIMILAR_FETCH_ROUNDS = 2
+
+
+@router.get("/recipe/{recipe_id}/similar", tags=["Recipe"], response_model=SimilarRecipesResponse,
+            responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
+async def get_similar_recipes(recipe_id: str, limit: int = Query(10, ge=1, le=50),
+                              fieldset: Fieldset = Depends(get_fieldset)):
+    """
+    주어진 레시피와 이름, 설명, 재료가 비슷한 레시피를 유사도 순으로 반환합니다.
+    fields / exclude 파라미터로 항목의 필드(id, name, image_base64, score)를 고를 수 있습니다.
+    """
+    try:
+        object_id = ObjectId(recipe_id)
+    except:
+        raise HTTPException(status_code=404, detail="유효하지 않은 레시피 ID입니다.")
+
+    try:
+        if not similarity_index.contains(recipe_id):
+            # 색인에 아직 없는 레시피는 지금 임베딩하여 추가
+            recipe = await recipe_collection.find_one(
+                {"_id": object_id}, {"name": 1, "description": 1, "ingredients.name": 1, "etag": 1})
+            if not recipe:
+                raise HTTPException(status_code=404, detail="해당 ID의 레시피를 찾을 수 없습니다.")
+            similarity_index.add(recipe_id, recipe.get("name", ""), recipe.get("description", ""),
+                                 [ingredient["name"] for ingredient in recipe.get("ingredients", [])],
+                                 recipe.get("etag") or "")
+
+        # 색인에 남아 있는 삭제된 레시피를 빼도 limit개가 남도록 더 가져오고, 찾은 삭제된 레시피는 색인에서 제거
+        for _ in range(SIMILAR_FETCH_ROUNDS):
+            neighbours = similarity_index.similar(recipe_id, limit + SIMILAR_OVERFETCH)
+            documents = await recipe_collection.find(
+                {"_id": {"$in": [ObjectId(neighbour_id) for neighbour_id, _ in neighbours]}},
+                fieldset.inclusion_projection(SIMILAR_RECIPE_FIELDS)
+            ).to_list(length=None)
+            documents = {str(document["_id"]): document for document in documents}
+            deleted = [neighbour_id for neighbour_id, _ in neighbours if neighbour_id not in documents]
+            for neighbour_id in deleted:
+                similarity_index.remove(neighbour_id)
+            if len(documents) >= limit or not deleted:
+                break
+
+        # 유사도 순서를 유지하고, 삭제된 레시피는 제외
+        recipes = [
+            fieldset.prune({
+                "id": neighbour_id,
+                "name": documents[neighbour_id].get("name"),
+                "image_base64": documents[neighbour_id].get("image_base64", ""),
+                "score": score,
+            })
+            for neighbour_id, score in neighbours if neighbour_id in documents
+        ][:limit]
+        return trusted_response({"recipes": recipes})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -2,23 +2,26 @@ import json
 import logging
 import re
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
-from app.config import client as openai_client
 from app.database import refrigerator_collection
+from app.dependencies.auth import verify_token
 from app.models.error_models import ErrorResponse
 from app.models.refrigerator.refrigerator_models import GetIngredientsResponse, Refrigerator, IngredientCategory, \
     Ingredient
+from app.routes.refrigerator.refrigerator import serialize_ingredient
+from app.utils.llm_utils import create_chat_completion
+from app.utils.versioning import record_changes, reset_changes
 
 router = APIRouter()
 
 
 @router.post("/refrigerator/rearrange-refrigerator", tags=["Refrigerator"], response_model=GetIngredientsResponse,
              responses={400: {"model": ErrorResponse}})
-async def rearrange_refrigerator():
+async def rearrange_refrigerator(user_id: str = Depends(verify_token)):
     try:
         # 현재 냉장고 내용물 가져오기
-        ingredients = await refrigerator_collection.find().to_list(length=None)
+        ingredients = await refrigerator_collection.find({"user_id": user_id}).to_list(length=None)
 
         # ChatGPT에 보낼 메시지 준비
         rearrange_prompt = f"""현재 냉장고 내용물을 분석하고, 최적화된 재배치 방안을 JSON 형식으로 제공해주세요. 다음 구조를 따라주세요:
@@ -55,9 +58,9 @@ async def rearrange_refrigerator():
         """
 
         # ChatGPT로부터 제안 받기
-        response = openai_client.chat.completions.create(
-            model="chatgpt-4o-latest",
-            messages=[
+        response = await create_chat_completion(
+            "rearrange_refrigerator",
+            [
                 {"role": "system", "content": "당신은 식품 보관 및 냉장고 정리 전문가입니다. 식재료의 특성을 고려하여 최적의 보관 방법과 냉장고 정리 방안을 제시합니다."},
                 {"role": "user", "content": rearrange_prompt}
             ]
@@ -80,28 +83,39 @@ async def rearrange_refrigerator():
         if 'categories' not in optimized_data:
             raise HTTPException(status_code=500, detail="Invalid optimization suggestion format")
 
-        # 현재 냉장고 내용물 비우기
-        await refrigerator_collection.delete_many({})
-
-        # 최적화된 재료를 데이터베이스에 다시 삽입
-        for category in optimized_data['categories']:
-            for ingredient in category['ingredients']:
-                await refrigerator_collection.insert_one({
-                    "name": ingredient['name'],
-                    "amount": ingredient['amount'],
-                    "unit": ingredient['unit'],
-                    "category": category['category']
-                })
+        try:
+            # 현재 냉장고 내용물 비우기
+            await refrigerator_collection.delete_many({"_id": {"$in": [ing["_id"] for ing in ingredients]}})
+            changes = [("delete", str(ing["_id"]), None) for ing in ingredients]
+
+            # 최적화된 재료를 데이터베이스에 다시 삽입
+            for category in optimized_data['categories']:
+                for ingredient in category['ingredients']:
+                    document = {
+                        "user_id": user_id,
+                        "name": ingredient['name'],
+                        "amount": ingredient['amount'],
+                        "unit": ingredient['unit'],
+                        "category": category['category'],
+                        "storage_type": ingredient.get('storage_type', "REFRIGERATED")
+                    }
+                    await refrigerator_collection.insert_one(document)
+                    changes.append(("upsert", str(document["_id"]), serialize_ingredient(document)))
+            await record_changes(user_id, "refrigerator", changes)
+        except Exception:
+            # 비운 뒤 다시 채우는 도중 실패하면 변경 로그와 냉장고가 어긋나므로 전체 목록으로 다시 동기화하게 함
+            await reset_changes(user_id, "refrigerator")
+            raise
 
         # 업데이트된 냉장고 내용물 가져오기
-        updated_ingredients = await refrigerator_collection.find().to_list(length=None)
+        updated_ingredients = await refrigerator_collection.find({"user_id": user_id}).to_list(length=None)
 
         # 응답 준비
         categories = []
         for category in optimized_data['categories']:
             category_ingredients = [
                 Ingredient(id=str(ing['_id']), name=ing['name'], amount=ing['amount'], unit=ing['unit'],
-                           category=ing['category'])
+                           category=ing['category'], storage_type=ing.get('storage_type', "REFRIGERATED"))
                 for ing in updated_ingredients if ing['category'] == category['category']
             ]
             categories.append(IngredientCategory(
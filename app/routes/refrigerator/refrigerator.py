@@ -1,82 +1,148 @@
 import logging
 from itertools import groupby
+from typing import Optional
 
 from bson import ObjectId
-from fastapi import HTTPException, APIRouter
+from fastapi import HTTPException, APIRouter, Depends, Request
 
+from app.config import USER_DATA_CACHE_CONTROL
 from app.database import refrigerator_collection
+from app.dependencies.auth import verify_token
+from app.dependencies.fieldset import get_fieldset
 from app.models.error_models import ErrorResponse
-from app.models.refrigerator.refrigerator_models import GetIngredientsResponse, Ingredient, IngredientCategory, \
-    Refrigerator, AddIngredientResponse, AddIngredientRequest, DeleteIngredientResponse, UpdateIngredientResponse, \
+from app.models.refrigerator.refrigerator_models import GetIngredientsResponse, GetIngredientsDeltaResponse, \
+    AddIngredientResponse, AddIngredientRequest, DeleteIngredientResponse, UpdateIngredientResponse, \
     UpdateIngredientRequest
+from app.utils.etag_utils import cache_headers, etag_matches, not_modified, version_etag
+from app.utils.fieldset_utils import Fieldset
+from app.utils.response_utils import trusted_response
+from app.utils.versioning import get_changes, get_version, record_changes, reset_changes
 
 router = APIRouter()
 
+# 재료 항목의 응답 필드 → 문서 필드
+INGREDIENT_FIELDS = {"id": "_id", "name": "name", "amount": "amount", "unit": "unit", "category": "category",
+                     "storage_type": "storage_type"}
 
-@router.get("/refrigerator/ingredients", tags=["Refrigerator"], response_model=GetIngredientsResponse)
-async def get_ingredients():
+
+def serialize_ingredient(item: dict) -> dict:
+    """
+    냉장고 문서를 응답의 재료 항목 형태로 변환합니다.
+    """
+    return {
+        "id": str(item["_id"]),
+        "name": item.get("name"),
+        "amount": item.get("amount"),
+        "unit": item.get("unit"),
+        "category": item["category"],
+        "storage_type": item.get("storage_type", "REFRIGERATED")
+    }
+
+
+@router.get("/refrigerator/ingredients", tags=["Refrigerator"],
+            response_model=GetIngredientsResponse | GetIngredientsDeltaResponse)
+async def get_ingredients(http_request: Request, since: Optional[int] = None,
+                          fieldset: Fieldset = Depends(get_fieldset), user_id: str = Depends(verify_token)):
     """
     냉장고에 있는 모든 재료의 리스트를 카테고리별로 묶어 반환합니다.
     재료가 없을 경우 빈 배열을 반환합니다.
+    If-None-Match 헤더의 ETag가 현재 냉장고 버전과 같으면 304를 반환합니다.
+    since 파라미터로 버전을 주면 그 이후에 추가, 수정, 삭제된 재료만 반환합니다.
+    fields / exclude 파라미터로 재료 항목의 필드를 고를 수 있습니다.
     """
     try:
-        ingredients = await refrigerator_collection.find().to_list(length=None)
+        if since is not None:
+            return await _get_ingredient_changes(user_id, since, fieldset)
 
-        # 재료가 없을 경우 빈 Refrigerator 객체 반환
-        if not ingredients:
-            return GetIngredientsResponse(refrigerator=Refrigerator(categories=[]))
+        # 냉장고 버전만 확인하여 변경이 없으면 재료를 읽지 않음
+        version = await get_version(user_id, "refrigerator")
+        etag = fieldset.etag(version_etag(f"refrigerator-{user_id}", version))
+        if etag_matches(http_request, etag):
+            return not_modified(etag, USER_DATA_CACHE_CONTROL)
+        headers = cache_headers(etag, USER_DATA_CACHE_CONTROL)
+
+        # 카테고리별로 묶기 위해 category는 항상 읽음
+        projection = fieldset.inclusion_projection(INGREDIENT_FIELDS, required=("_id", "category"))
+        ingredients = await refrigerator_collection.find({"user_id": user_id}, projection).to_list(length=None)
 
         # 카테고리별로 정렬
         sorted_ingredients = sorted(ingredients, key=lambda x: x["category"])
 
-        # 카테고리별로 그룹화
+        # 카테고리별로 그룹화 (재료가 없을 경우 빈 배열)
         grouped_ingredients = []
         for category, items in groupby(sorted_ingredients, key=lambda x: x["category"]):
-            category_ingredients = [
-                Ingredient(
-                    id=str(item["_id"]),
-                    name=item["name"],
-                    amount=item["amount"],
-                    unit=item["unit"],
-                    category=item["category"],
-                    storage_type=item.get("storage_type", "REFRIGERATED")
-                ) for item in items
-            ]
-            grouped_ingredients.append(IngredientCategory(category=category, ingredients=category_ingredients))
-
-        refrigerator = Refrigerator(categories=grouped_ingredients)
-        return GetIngredientsResponse(refrigerator=refrigerator)
+            category_ingredients = [fieldset.prune(serialize_ingredient(item)) for item in items]
+            grouped_ingredients.append({"category": category, "ingredients": category_ingredients})
+
+        return trusted_response({"refrigerator": {"categories": grouped_ingredients}, "version": version},
+                                headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _get_ingredient_changes(user_id: str, since: int, fieldset: Fieldset):
+    changes = await get_changes(user_id, "refrigerator", since)
+    if changes is not None:
+        version, upserts, deletes = changes
+        full = False
+    else:
+        # 변경 기록이 정리된 오래된 버전이면 전체 목록을 보냄
+        version = await get_version(user_id, "refrigerator")
+        projection = fieldset.inclusion_projection(INGREDIENT_FIELDS, required=("_id", "category"))
+        ingredients = await refrigerator_collection.find({"user_id": user_id}, projection).to_list(length=None)
+        upserts = [serialize_ingredient(item) for item in ingredients]
+        deletes = []
+        full = True
+
+    return trusted_response({
+        "version": version,
+        "full": full,
+        "upserts": [fieldset.prune(item) for item in upserts],
+        "deletes": deletes,
+    }, headers=cache_headers(None, USER_DATA_CACHE_CONTROL))
+
+
 @router.put("/refrigerator/ingredients", tags=["Refrigerator"], responses={400: {"model": ErrorResponse}},
             response_model=AddIngredientResponse)
-async def add_ingredients(request: AddIngredientRequest):
+async def add_ingredients(request: AddIngredientRequest, user_id: str = Depends(verify_token)):
     """
     냉장고에 여러 재료를 추가합니다. 이미 존재하는 재료의 경우 단위와 보관 타입이 같을 때만 양을 더합니다.
     """
     try:
-        for ingredient in request.ingredients:
-            # 기존 재료 찾기 - 보관 타입도 확인
-            existing_ingredient = await refrigerator_collection.find_one({
-                "name": ingredient.name,
-                "category": ingredient.category,
-                "unit": ingredient.unit,
-                "storage_type": ingredient.storage_type
-            })
-
-            if existing_ingredient:
-                # 이미 존재하는 재료이고 단위와 보관 타입이 같다면 양을 더함
-                new_amount = existing_ingredient["amount"] + ingredient.amount
-                await refrigerator_collection.update_one(
-                    {"_id": existing_ingredient["_id"]},
-                    {"$set": {"amount": new_amount}}
-                )
-            else:
-                # 새로운 재료이거나 단위/보관 타입이 다르다면 새로 추가
-                await refrigerator_collection.insert_one(ingredient.model_dump())
-
+        changes = []
+        try:
+            for ingredient in request.ingredients:
+                # 기존 재료 찾기 - 보관 타입도 확인
+                existing_ingredient = await refrigerator_collection.find_one({
+                    "user_id": user_id,
+                    "name": ingredient.name,
+                    "category": ingredient.category,
+                    "unit": ingredient.unit,
+                    "storage_type": ingredient.storage_type
+                })
+
+                if existing_ingredient:
+                    # 이미 존재하는 재료이고 단위와 보관 타입이 같다면 양을 더함
+                    new_amount = existing_ingredient["amount"] + ingredient.amount
+                    await refrigerator_collection.update_one(
+                        {"_id": existing_ingredient["_id"]},
+                        {"$set": {"amount": new_amount}}
+                    )
+                    updated_ingredient = {**existing_ingredient, "amount": new_amount}
+                else:
+                    # 새로운 재료이거나 단위/보관 타입이 다르다면 새로 추가
+                    updated_ingredient = {"user_id": user_id, **ingredient.model_dump()}
+                    await refrigerator_collection.insert_one(updated_ingredient)
+
+                changes.append(("upsert", str(updated_ingredient["_id"]), serialize_ingredient(updated_ingredient)))
+
+            await record_changes(user_id, "refrigerator", changes)
+        except Exception:
+            # 일부 재료만 저장된 채 실패하면 변경 로그에 빠진 재료가 있으므로 전체 목록으로 다시 동기화하게 함
+            await reset_changes(user_id, "refrigerator")
+            raise
         return {"message": "재료가 성공적으로 추가되었습니다."}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -85,7 +151,7 @@ async def add_ingredients(request: AddIngredientRequest):
 @router.delete("/refrigerator/ingredient/{ingredient_id}", tags=["Refrigerator"],
                response_model=DeleteIngredientResponse,
                responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
-async def delete_ingredient(ingredient_id: str):
+async def delete_ingredient(ingredient_id: str, user_id: str = Depends(verify_token)):
     """
     주어진 ID로 냉장고에서 재료를 삭제합니다.
     """
@@ -97,11 +163,12 @@ async def delete_ingredient(ingredient_id: str):
 
     try:
         # 재료 삭제
-        result = await refrigerator_collection.delete_one({"_id": object_id})
+        result = await refrigerator_collection.delete_one({"_id": object_id, "user_id": user_id})
 
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="해당 ID의 재료를 찾을 수 없습니다.")
 
+        await record_changes(user_id, "refrigerator", [("delete", ingredient_id, None)])
         return {"message": "재료가 성공적으로 삭제되었습니다."}
     except HTTPException:
         raise
@@ -112,7 +179,8 @@ async def delete_ingredient(ingredient_id: str):
 @router.patch("/refrigerator/ingredient/{ingredient_id}", tags=["Refrigerator"],
               response_model=UpdateIngredientResponse,
               responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}})
-async def update_ingredient(ingredient_id: str, request: UpdateIngredientRequest):
+async def update_ingredient(ingredient_id: str, request: UpdateIngredientRequest,
+                            user_id: str = Depends(verify_token)):
     """
     주어진 ID로 냉장고에 있는 재료를 수정합니다.
     """
@@ -124,7 +192,7 @@ async def update_ingredient(ingredient_id: str, request: UpdateIngredientRequest
 
     try:
         # 재료 존재 여부 확인
-        existing_ingredient = await refrigerator_collection.find_one({"_id": object_id})
+        existing_ingredient = await refrigerator_collection.find_one({"_id": object_id, "user_id": user_id})
         if not existing_ingredient:
             raise HTTPException(status_code=404, detail="해당 ID의 재료를 찾을 수 없습니다.")
 
@@ -140,6 +208,9 @@ async def update_ingredient(ingredient_id: str, request: UpdateIngredientRequest
         if result.modified_count == 0:
             return {"message": "변경된 내용이 없습니다."}
 
+        updated_ingredient = {**existing_ingredient, **update_data}
+        await record_changes(user_id, "refrigerator",
+                             [("upsert", ingredient_id, serialize_ingredient(updated_ingredient))])
         return {"message": "재료가 성공적으로 수정되었습니다."}
     except HTTPException:
         raise
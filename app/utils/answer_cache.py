@@ -0,0 +1,90 @@
+import re
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from pymongo import DESCENDING
+
+from app.config import ANSWER_CACHE_MIN_SIMILARITY, ANSWER_CACHE_MAX_CANDIDATES
+from app.database import answer_cache_collection
+from app.utils import metrics
+from app.utils.recipe_index import normalize_ingredient
+
+_PUNCTUATION = re.compile(r"[^\w]+")
+_NUMBERS = re.compile(r"\d+")
+# 부정 표현 ('매운가요'와 '안 매운가요'는 문자가 거의 같지만 뜻이 반대)
+_NEGATIONS = ("안", "못", "않", "없", "말고", "빼고", "제외", "not", "n't", "without")
+
+
+def normalize_text(text: str) -> str:
+    """
+    질문을 비교할 수 있도록 문장 부호와 공백을 제거하고 소문자로 바꿉니다.
+    """
+    return _PUNCTUATION.sub("", text).lower()
+
+
+def _bigrams(text: str) -> set:
+    return {text[index:index + 2] for index in range(len(text) - 1)} or {text}
+
+
+def similarity(first: str, second: str) -> float:
+    """
+    정규화된 두 질문의 문자 bigram 자카드 유사도를 계산합니다.
+    """
+    first_grams, second_grams = _bigrams(first), _bigrams(second)
+    return len(first_grams & second_grams) / len(first_grams | second_grams)
+
+
+def question_entities(question: str, ingredient_names: Iterable[str]) -> str:
+    """
+    질문에 나온 레시피 재료, 숫자, 부정 표현 여부로 만든 키입니다.
+    비슷한 문장이라도 묻는 재료나 단계가 다르거나('김치 얼마나?'와 '두부 얼마나?')
+    부정 여부가 다르면('매운가요?'와 '안 매운가요?') 같은 답을 쓰지 않도록 합니다.
+    """
+    normalized = normalize_ingredient(question)
+    mentioned = sorted({normalize_ingredient(name) for name in ingredient_names
+                        if normalize_ingredient(name) and normalize_ingredient(name) in normalized})
+    negated = ["!"] if any(negation in question.lower() for negation in _NEGATIONS) else []
+    return "|".join(mentioned + _NUMBERS.findall(question) + negated)
+
+
+async def find_answer(kind: str, recipe_id: str, recipe_etag: str, text: str, entities: str = "",
+                      similar: bool = True) -> Optional[dict]:
+    """
+    같은 레시피(같은 ETag)에 대해 같은 질문이나 충분히 비슷한 질문의 답이 저장되어 있으면 반환합니다.
+    레시피가 바뀌면 ETag가 달라지므로 예전 답은 사용되지 않습니다.
+    """
+    key = normalize_text(text)
+    scope = {"kind": kind, "recipe_id": recipe_id, "recipe_etag": recipe_etag, "entities": entities}
+
+    exact = await answer_cache_collection.find_one({**scope, "key": key}, {"answer": 1})
+    if exact:
+        metrics.increment(f"answer_cache.{kind}.exact_hits")
+        return exact["answer"]
+
+    if similar:
+        candidates = await answer_cache_collection.find(scope, {"key": 1, "answer": 1}) \
+            .sort("created_at", DESCENDING).limit(ANSWER_CACHE_MAX_CANDIDATES).to_list(length=None)
+        best, best_score = None, ANSWER_CACHE_MIN_SIMILARITY
+        for candidate in candidates:
+            score = similarity(key, candidate["key"])
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is not None:
+            metrics.increment(f"answer_cache.{kind}.similar_hits")
+            return best["answer"]
+
+    metrics.increment(f"answer_cache.{kind}.misses")
+    return None
+
+
+async def store_answer(kind: str, recipe_id: str, recipe_etag: str, text: str, answer: dict,
+                       entities: str = "") -> None:
+    """
+    답을 캐시에 저장합니다. 같은 질문의 답이 이미 있으면 덮어씁니다.
+    """
+    await answer_cache_collection.update_one(
+        {"kind": kind, "recipe_id": recipe_id, "recipe_etag": recipe_etag, "entities": entities,
+         "key": normalize_text(text)},
+        {"$set": {"answer": answer, "created_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
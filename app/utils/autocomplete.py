@@ -0,0 +1,124 @@
+import bisect
+import heapq
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from app.config import AUTOCOMPLETE_MAX_RESULTS
+from app.database import recipe_collection, ingredients_info_collection
+
+_HANGUL_BASE = 0xAC00
+_HANGUL_LAST = 0xD7A3
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONGSEONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+              "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+
+# 겹받침과 이중 모음은 입력 순서대로 나눔 (예: '달' 다음에 'ㄱ'을 치면 '닭'이 되므로 ㄺ → ㄹㄱ)
+_COMPOUND = {
+    "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ", "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ",
+    "ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ", "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ",
+}
+
+_SPACES = re.compile(r"\s+")
+
+
+def to_jamo(text: str) -> str:
+    """
+    한글 음절을 입력 순서대로의 자모 문자열로 분해합니다.
+    입력 중인 글자('김ㅊ', '닭'을 치는 도중의 '달' 등)도 완성된 이름의 접두사가 되도록 합니다.
+    """
+    result = []
+    for char in _SPACES.sub("", text).lower():
+        code = ord(char)
+        if _HANGUL_BASE <= code <= _HANGUL_LAST:
+            index = code - _HANGUL_BASE
+            jamo = (_CHOSEONG[index // 588], _JUNGSEONG[index % 588 // 28], _JONGSEONG[index % 28])
+        else:
+            jamo = (char,)
+        for part in jamo:
+            result.append(_COMPOUND.get(part, part))
+    return "".join(result)
+
+
+class Suggestion(NamedTuple):
+    name: str
+    type: str
+    id: str
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # 이 접두사로 시작하는 이름 중 짧은 순서로 상위 항목만 보관
+        self.top: List[tuple] = []
+
+
+class AutocompleteIndex:
+    """
+    레시피와 식재료 이름의 자모 단위 접두사 트라이입니다. 종류(recipe, ingredient)마다 트라이를 따로 둡니다.
+    각 노드가 상위 항목을 미리 들고 있으므로 조회는 접두사 길이만큼만 내려가면 됩니다.
+    """
+
+    def __init__(self, max_results: int = AUTOCOMPLETE_MAX_RESULTS):
+        self._roots: Dict[str, _Node] = {}
+        self._max_results = max_results
+        self._names = set()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    async def build(self) -> None:
+        """
+        저장된 레시피와 식재료 이름으로 트라이를 만듭니다.
+        """
+        async for recipe in recipe_collection.find({}, {"name": 1}):
+            self.add(recipe.get("name", ""), "recipe", str(recipe["_id"]))
+        async for ingredient in ingredients_info_collection.find({}, {"name": 1}):
+            self.add(ingredient.get("name", ""), "ingredient", str(ingredient["_id"]))
+
+    def add(self, name: str, type_: str, id_: str) -> None:
+        """
+        이름 하나를 트라이에 추가합니다. 같은 종류의 같은 이름은 한 번만 추가합니다.
+        """
+        key = to_jamo(name)
+        if not key or (type_, name) in self._names:
+            return
+        self._names.add((type_, name))
+
+        entry = (len(key), name, type_, id_)
+        node = self._roots.setdefault(type_, _Node())
+        self._offer(node, entry)
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+            self._offer(node, entry)
+
+    def _offer(self, node: _Node, entry: tuple) -> None:
+        if len(node.top) >= self._max_results and entry >= node.top[-1]:
+            return
+        bisect.insort(node.top, entry)
+        del node.top[self._max_results:]
+
+    def suggest(self, prefix: str, limit: int = 10, type_: Optional[str] = None) -> List[Suggestion]:
+        """
+        접두사로 시작하는 이름을 짧은 순서로 반환합니다.
+        """
+        key = to_jamo(prefix)
+        tops = []
+        for kind, node in self._roots.items():
+            if type_ is not None and kind != type_:
+                continue
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    break
+            else:
+                tops.append(node.top)
+
+        entries = heapq.merge(*tops)
+        return [Suggestion(name, kind, id_) for _, name, kind, id_ in entries][:limit]
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from fastapi import HTTPException, Request
+
+from app.config import DISCONNECT_POLL_INTERVAL
+from app.utils import metrics
+
+T = TypeVar("T")
+
+# 이미지 한 장이 차지하는 입력 토큰의 대략적인 값 (1024px, high detail 기준)
+IMAGE_INPUT_TOKENS = 765
+
+
+class GenerationContext:
+    """
+    진행 중인 생성 작업의 상태입니다.
+    생성 함수는 모델 호출 전후로 예상 토큰을 기록하고,
+    결과를 버리기 아까운 시점이 되면 worth_caching을 표시합니다.
+    """
+
+    def __init__(self):
+        self.pending_tokens = 0
+        self.worth_caching = False
+
+    def expect_tokens(self, tokens: int) -> None:
+        self.pending_tokens += tokens
+
+    def spend_tokens(self, tokens: int) -> None:
+        self.pending_tokens = max(0, self.pending_tokens - tokens)
+
+    def mark_worth_caching(self) -> None:
+        self.worth_caching = True
+
+
+class _InFlight:
+    def __init__(self, task: asyncio.Task, context: GenerationContext):
+        self.task = task
+        self.context = context
+        self.waiters = 0
+
+
+# 동일한 키로 진행 중인 생성 작업 (같은 요청은 하나의 작업을 공유합니다)
+_in_flight: Dict[str, _InFlight] = {}
+
+
+def estimate_tokens(messages: List[dict], completion_tokens: int = 500) -> int:
+    """
+    메시지 목록의 입력 토큰과 예상 출력 토큰을 대략적으로 추정합니다.
+    한글 기준 약 2글자당 1토큰으로 계산합니다.
+    """
+    characters = 0
+    images = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            characters += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                characters += len(part["text"])
+            else:
+                images += 1
+    return characters // 2 + images * IMAGE_INPUT_TOKENS + completion_tokens
+
+
+def _consume_result(task: asyncio.Task) -> None:
+    # 기다리는 요청이 없는 작업의 예외가 조용히 사라지지 않도록 기록
+    if task.cancelled():
+        return
+    exception = task.exception()
+    if exception is not None and not isinstance(exception, HTTPException):
+        logging.error(f"Background generation failed: {exception}", exc_info=exception)
+
+
+def running_task(key: str) -> Optional[asyncio.Task]:
+    """
+    같은 키로 아직 실행 중인 생성 작업을 반환합니다. 끝났거나 취소가 요청된 작업이면 None을 반환합니다.
+    """
+    entry = _in_flight.get(key)
+    if entry is None or entry.task.done() or entry.task.cancelling():
+        return None
+    return entry.task
+
+
+def _abandon(entry: _InFlight) -> None:
+    if entry.waiters > 0 or entry.context.worth_caching:
+        # 다른 요청이 기다리고 있거나 결과를 저장할 가치가 있으면 백그라운드에서 마저 실행
+        metrics.increment("generation.background_completions")
+        return
+
+    entry.task.cancel()
+    metrics.increment("generation.cancelled")
+    metrics.increment("generation.saved_tokens", entry.context.pending_tokens)
+
+
+async def run_cancellable(request: Request, key: Optional[str],
+                          factory: Callable[[GenerationContext], Awaitable[T]]) -> T:
+    """
+    생성 작업을 실행하면서 클라이언트 연결 상태를 감시합니다.
+    같은 키의 작업이 이미 진행 중이면 그 결과를 함께 기다립니다.
+    클라이언트 연결이 끊어지면 아무도 기다리지 않는 작업은 취소합니다.
+    """
+    entry = _in_flight.get(key) if key else None
+    if entry is None:
+        context = GenerationContext()
+        entry = _InFlight(asyncio.create_task(factory(context)), context)
+        entry.task.add_done_callback(_consume_result)
+        if key:
+            _in_flight[key] = entry
+            entry.task.add_done_callback(
+                lambda _: _in_flight.pop(key) if _in_flight.get(key) is entry else None)
+    else:
+        metrics.increment("generation.coalesced")
+
+    entry.waiters += 1
+    disconnected = False
+    try:
+        while True:
+            done, _ = await asyncio.wait({entry.task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return entry.task.result()
+            if await request.is_disconnected():
+                disconnected = True
+                break
+    except asyncio.CancelledError:
+        disconnected = True
+        raise
+    finally:
+        entry.waiters -= 1
+        if disconnected:
+            _abandon(entry)
+
+    raise HTTPException(status_code=499, detail="클라이언트 연결이 끊어졌습니다.")
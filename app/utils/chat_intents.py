@@ -0,0 +1,149 @@
+import re
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from app.utils.recipe_index import normalize_ingredient
+
+# 저장된 정보만으로 답할 수 없는 질문에 자주 나오는 표현 (이런 질문은 모델에게 넘김)
+# ('칼로리 낮추려면?', '지방 빼고 만들 수 있나요?', '저탄수화물로 하려면?'처럼 저장된 값이 아니라 방법을 묻는 질문 포함)
+_OPEN_ENDED = ("대신", "대체", "바꿔", "바꾸", "빼도", "빼고", "없으면", "왜", "어떻게 하면", "하려면", "팁", "추천",
+               "보관", "어울", "맛있게", "실패", "비결", "차이", "건강", "다이어트", "아이", "비건", "알레르기",
+               "낮추", "줄이", "늘리", "높이", "보충", "저탄", "저칼로리", "저염", "저지방", "저당")
+
+_COOK_TIME = ("얼마나 걸", "시간이 얼마", "조리 시간", "조리시간", "몇 분", "몇분", "몇 시간", "몇시간", "how long")
+_CALORIES = ("칼로리", "열량", "kcal")
+_NUTRITION = ("영양",)
+_NUTRIENTS = (("단백질", "protein"), ("탄수화물", "carbohydrates"), ("지방", "fat"))
+_SERVINGS = ("몇 인분", "몇인분", "몇 명", "몇명")
+_INGREDIENT_LIST = ("재료가 뭐", "재료 뭐", "무슨 재료", "어떤 재료", "필요한 재료", "재료 알려", "재료 목록")
+# 재료의 양을 묻는 표현 ('김치 얼마나 넣어요?', '마늘 몇 쪽?', '두부 양은?')
+_AMOUNT = re.compile(r"얼마나?\s*(?:넣|들어|써|쓰|사용)"
+                     r"|몇\s*(?:g|그램|kg|ml|리터|개|큰술|작은술|스푼|숟가락|컵|쪽|장|줌|꼬집|모|알|봉)"
+                     r"|(?:^|\s|의)양(?:은|이)")
+# 양이 아니라 필요 여부나 넣는 시점을 묻는 표현 ('양파가 꼭 필요해요?', '마늘 넣는 타이밍이 언제예요?')
+_NOT_AMOUNT = ("돼요", "되나요", "될까", "해도", "꼭", "필요", "언제", "타이밍", "순서", "먼저", "나중")
+# 재료의 양이 아니라 조리 방법을 묻는 표현 ('김치를 얼마나 볶아요?')
+_PROCESS = ("볶", "끓", "익", "굽", "구워", "삶", "튀", "데치", "재워", "절여", "불려", "썰", "자르", "다져")
+_STEP_COUNT = ("몇 단계", "몇단계")
+# '2번 나눠 넣어요'처럼 횟수를 뜻하는 '번'과 구분하기 위해 '번째'나 '번 단계'만 단계 번호로 봄
+_STEP = re.compile(r"(\d+)\s*(?:단계|번째|번\s*단계)")
+
+
+class IntentAnswer(NamedTuple):
+    intent: str
+    answer: str
+
+
+def _topic(word: str) -> str:
+    # 받침 유무에 따라 은/는을 붙임
+    last = word[-1] if word else ""
+    if "가" <= last <= "힣":
+        return f"{word}{'은' if (ord(last) - ord('가')) % 28 else '는'}"
+    return f"{word}은(는)"
+
+
+def _contains(question: str, keywords) -> bool:
+    return any(keyword in question for keyword in keywords)
+
+
+def _format_amount(amount) -> str:
+    return f"{amount:g}" if isinstance(amount, float) else str(amount)
+
+
+def _about_process(question: str) -> bool:
+    # 특정 조리 과정이나 단계에 대한 질문 ('몇 분 끓여요?', '3단계에서 몇 분?')은 저장된 전체 값으로 답할 수 없음
+    return _contains(question, _PROCESS) or _STEP.search(question) is not None
+
+
+def _cook_time(question: str, recipe: dict) -> Optional[str]:
+    if _about_process(question):
+        return None
+    if _contains(question, _COOK_TIME) and recipe.get("cookTime"):
+        return f"{_topic(recipe['name'])} 총 {recipe['cookTime']} 정도 걸립니다."
+    return None
+
+
+def _nutrition(question: str, recipe: dict) -> Optional[str]:
+    if _about_process(question):
+        return None
+    nutrition = recipe.get("nutrition") or {}
+    if _contains(question, _CALORIES) and "calories" in nutrition:
+        return f"{_topic(recipe['name'])} 1인분 기준 {nutrition['calories']}kcal입니다."
+
+    asked = [(label, field) for label, field in _NUTRIENTS if label in question or field in question]
+    if asked and all(field in nutrition for _, field in asked):
+        parts = ", ".join(f"{label} {nutrition[field]}" for label, field in asked)
+        return f"{recipe['name']} 1인분에는 {parts}이 들어 있습니다."
+
+    if _contains(question, _NUTRITION) and nutrition:
+        return (f"{recipe['name']} 1인분 기준 칼로리 {nutrition.get('calories')}kcal, "
+                f"단백질 {nutrition.get('protein')}, 탄수화물 {nutrition.get('carbohydrates')}, "
+                f"지방 {nutrition.get('fat')}입니다.")
+    return None
+
+
+def _servings(question: str, recipe: dict) -> Optional[str]:
+    if _contains(question, _SERVINGS):
+        return f"이 레시피의 재료는 {recipe.get('servings') or 1}인분 기준입니다."
+    return None
+
+
+def _ingredient_list(question: str, recipe: dict) -> Optional[str]:
+    if _contains(question, _INGREDIENT_LIST) and recipe.get("ingredients"):
+        items = ", ".join(f"{ingredient['name']} {_format_amount(ingredient['amount'])}{ingredient['unit']}"
+                          for ingredient in recipe["ingredients"])
+        return f"{recipe['name']}에는 {items}이(가) 필요합니다."
+    return None
+
+
+def _ingredient_amount(question: str, recipe: dict) -> Optional[str]:
+    if not _AMOUNT.search(question) or _contains(question, _NOT_AMOUNT) or _contains(question, _PROCESS):
+        return None
+    normalized = normalize_ingredient(question)
+    # 긴 이름부터 확인하여 '대파'보다 '대파 흰 부분'처럼 구체적인 재료를 먼저 찾음
+    for ingredient in sorted(recipe.get("ingredients", []), key=lambda item: -len(item["name"])):
+        if normalize_ingredient(ingredient["name"]) in normalized:
+            return (f"{_topic(ingredient['name'])} {_format_amount(ingredient['amount'])}{ingredient['unit']} "
+                    f"넣으면 됩니다.")
+    return None
+
+
+def _steps(question: str, recipe: dict) -> Optional[str]:
+    instructions = recipe.get("instructions") or []
+    if _contains(question, _STEP_COUNT) and instructions:
+        return f"{_topic(recipe['name'])} 총 {len(instructions)}단계로 만듭니다."
+
+    match = _STEP.search(question)
+    # 단계의 조리 시간이나 방법을 묻는 질문은 단계 설명을 그대로 보여주는 대신 모델에게 넘김
+    if match and not _contains(question, _COOK_TIME) and not _contains(question, _PROCESS):
+        number = int(match.group(1))
+        for instruction in instructions:
+            if instruction.get("step") == number:
+                return f"{number}단계: {instruction['description']}"
+    return None
+
+
+# 앞에 있는 규칙부터 확인
+_RULES: List[Tuple[str, Callable[[str, dict], Optional[str]]]] = [
+    ("cook_time", _cook_time),
+    ("nutrition", _nutrition),
+    ("servings", _servings),
+    ("step", _steps),
+    ("ingredient_list", _ingredient_list),
+    ("ingredient_amount", _ingredient_amount),
+]
+
+
+def answer_locally(question: str, recipe: dict) -> Optional[IntentAnswer]:
+    """
+    조리 시간, 영양 정보, 재료 양, 조리 단계처럼 레시피에 저장된 정보로 답할 수 있는 질문이면
+    모델을 호출하지 않고 템플릿으로 답합니다. 답할 수 없는 질문은 None을 반환합니다.
+    """
+    question = question.strip().lower()
+    if not question or _contains(question, _OPEN_ENDED):
+        return None
+
+    for intent, rule in _RULES:
+        answer = rule(question, recipe)
+        if answer:
+            return IntentAnswer(intent, answer)
+    return None
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.config import CHAT_HISTORY_TOKEN_BUDGET, CHAT_RECENT_TURNS, RECIPE_CONTEXT_CACHE_SIZE
+from app.database import chat_session_collection
+from app.utils import metrics
+from app.utils.cancellation import GenerationContext, estimate_tokens
+from app.utils.llm_utils import create_chat_completion
+
+SYSTEM_PROMPT = "당신은 요리 전문가입니다. 레시피와 조리 방법에 대한 질문에 친절하고 전문적으로 답변해주세요."
+
+# (레시피 ID, ETag) → 프롬프트에 넣을 레시피 정보, 오래 쓰지 않은 항목부터 제거
+_context_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+# 세션 ID → 진행 중인 대화 요약 작업 (같은 세션은 한 번에 하나만 요약)
+_compacting: Dict[str, asyncio.Task] = {}
+
+
+def _render_recipe(recipe: dict) -> str:
+    # 영양 정보 문자열 구성
+    nutrition_info = (f"칼로리: {recipe['nutrition']['calories']}kcal, "
+                      f"단백질: {recipe['nutrition']['protein']}g, "
+                      f"탄수화물: {recipe['nutrition']['carbohydrates']}g, "
+                      f"지방: {recipe['nutrition']['fat']}g")
+
+    # 재료 목록 문자열 구성
+    ingredients_list = "\n".join(f"- {ing['name']}: {ing['amount']}{ing['unit']}" for ing in recipe['ingredients'])
+
+    # 조리 과정 문자열 구성
+    instructions_list = "\n".join(f"{step['step']}. {step['description']}" for step in recipe['instructions'])
+
+    return f"""다음은 '{recipe['name']}'에 대한 레시피 정보입니다:
+
+요리 설명: {recipe['description']}
+조리 시간: {recipe['cookTime']}
+영양 정보: {nutrition_info}
+
+재료:
+{ingredients_list}
+
+조리 과정:
+{instructions_list}
+
+주의사항:
+1. 답변은 친절하고 이해하기 쉽게, 간결하게 작성해주세요.
+2. 줄바꿈이나 마크다운 문법 없이 채팅 형식으로 작성해주세요."""
+
+
+def recipe_context(recipe: dict, recipe_etag: str) -> str:
+    """
+    프롬프트 앞부분에 넣을 레시피 정보를 반환합니다.
+    레시피 버전(ETag)별로 한 번만 만들어 두므로, 같은 레시피의 대화는 매번 같은 앞부분을 사용하여
+    모델 제공자의 프롬프트 캐시가 적용됩니다.
+    """
+    key = (str(recipe["_id"]), recipe_etag)
+    context = _context_cache.get(key)
+    if context is not None:
+        _context_cache.move_to_end(key)
+        metrics.increment("chat.context_cache_hits")
+        return context
+
+    metrics.increment("chat.context_cache_misses")
+    context = _render_recipe(recipe)
+    _context_cache[key] = context
+    while len(_context_cache) > RECIPE_CONTEXT_CACHE_SIZE:
+        _context_cache.popitem(last=False)
+    return context
+
+
+def build_messages(context: str, session: Optional[dict], question: str) -> List[dict]:
+    """
+    고정된 앞부분(시스템 프롬프트, 레시피 정보) 뒤에 이전 대화 요약, 최근 대화, 새 질문 순서로 메시지를 구성합니다.
+    """
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": context},
+    ]
+    if session:
+        if session.get("summary"):
+            messages.append({"role": "system", "content": f"지금까지의 대화 요약: {session['summary']}"})
+        for turn in session.get("turns", []):
+            messages.append({"role": "user", "content": turn["question"]})
+            messages.append({"role": "assistant", "content": turn["answer"]})
+    messages.append({"role": "user", "content": f"사용자의 질문: {question}"})
+    return messages
+
+
+async def find_session(session_id: str, user_id: str, recipe_id: str) -> Optional[dict]:
+    """
+    사용자의 해당 레시피 채팅 세션을 조회합니다. 없으면 None을 반환합니다.
+    """
+    try:
+        object_id = ObjectId(session_id)
+    except Exception:
+        return None
+    return await chat_session_collection.find_one({"_id": object_id, "user_id": user_id, "recipe_id": recipe_id})
+
+
+async def _summarize(summary: str, turns: List[dict]) -> str:
+    conversation = "\n".join(f"사용자: {turn['question']}\n요리 전문가: {turn['answer']}" for turn in turns)
+    prompt = f"""다음은 레시피에 대한 사용자와 요리 전문가의 대화입니다.
+이전 요약과 새 대화를 합쳐, 이후 답변에 필요한 내용(사용자의 상황, 질문한 내용, 답변의 요지)만 3문장 이내로 요약해주세요.
+
+이전 요약: {summary or "없음"}
+
+새 대화:
+{conversation}
+"""
+    messages = [
+        {"role": "system", "content": "당신은 대화를 간결하게 요약하는 도우미입니다."},
+        {"role": "user", "content": prompt}
+    ]
+    response = await create_chat_completion("chat_summary", messages, GenerationContext(), completion_tokens=200)
+    return response.choices[0].message.content.strip()
+
+
+def _needs_compaction(session: dict) -> bool:
+    turns = session.get("turns", [])
+    history = [{"content": turn["question"] + turn["answer"]} for turn in turns]
+    return len(turns) > CHAT_RECENT_TURNS and estimate_tokens(history, 0) > CHAT_HISTORY_TOKEN_BUDGET
+
+
+async def _compact(session: dict) -> None:
+    session_id = str(session["_id"])
+    try:
+        turns = session["turns"]
+        summary = await _summarize(session.get("summary", ""), turns[:-CHAT_RECENT_TURNS])
+        # 요약하는 동안 새 대화가 추가되었으면 버전이 달라 갱신하지 않고, 다음 대화에서 다시 요약
+        result = await chat_session_collection.update_one(
+            {"_id": session["_id"], "version": session.get("version", 0)},
+            {"$set": {"summary": summary, "turns": turns[-CHAT_RECENT_TURNS:]}, "$inc": {"version": 1}}
+        )
+        if result.modified_count:
+            metrics.increment("chat.history_compactions")
+        else:
+            metrics.increment("chat.history_compactions_skipped")
+    except Exception as e:
+        logging.warning(f"Chat history compaction failed for {session_id}: {e}")
+    finally:
+        _compacting.pop(session_id, None)
+
+
+async def save_turn(session: Optional[dict], user_id: str, recipe_id: str, question: str, answer: str) -> str:
+    """
+    대화를 세션에 저장하고 세션 ID를 반환합니다. 세션이 없으면 새로 만듭니다.
+    대화는 $push로 추가하므로 같은 세션에 동시에 질문해도 서로의 대화를 덮어쓰지 않습니다.
+    최근 대화가 토큰 예산을 넘으면 최근 CHAT_RECENT_TURNS개를 제외한 대화를 백그라운드에서 요약에 합쳐,
+    응답을 늦추지 않으면서 대화가 길어져도 매 질문의 입력 토큰이 일정 범위를 넘지 않도록 합니다.
+    """
+    now = datetime.now(timezone.utc)
+    turn = {"question": question, "answer": answer}
+
+    if session is None:
+        result = await chat_session_collection.insert_one({
+            "user_id": user_id,
+            "recipe_id": recipe_id,
+            "summary": "",
+            "turns": [turn],
+            "version": 0,
+            "updated_at": now,
+        })
+        return str(result.inserted_id)
+
+    session_id = str(session["_id"])
+    updated = await chat_session_collection.find_one_and_update(
+        {"_id": session["_id"]},
+        {"$push": {"turns": turn}, "$inc": {"version": 1}, "$set": {"updated_at": now}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated and _needs_compaction(updated) and session_id not in _compacting:
+        _compacting[session_id] = asyncio.create_task(_compact(updated))
+    return session_id
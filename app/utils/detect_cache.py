@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app.config import DETECT_CACHE_MAX_DISTANCE
+from app.database import ingredient_detect_cache_collection
+from app.utils import metrics
+
+HASH_BITS = 64
+
+
+def hash_bands(phash: int) -> List[str]:
+    """
+    해시를 (허용 거리 + 1)개의 구간으로 나눕니다.
+    비둘기집 원리에 따라 허용 거리 이내의 해시는 적어도 한 구간이 정확히 일치하므로,
+    구간 인덱스로 후보를 찾은 뒤 해밍 거리를 계산하면 됩니다.
+    """
+    count = DETECT_CACHE_MAX_DISTANCE + 1
+    bands = []
+    for index in range(count):
+        start = index * HASH_BITS // count
+        end = (index + 1) * HASH_BITS // count
+        value = (phash >> start) & ((1 << (end - start)) - 1)
+        bands.append(f"{count}:{index}:{value:x}")
+    return bands
+
+
+async def find_cached_ingredients(user_id: str, phash: int) -> Optional[List[str]]:
+    """
+    같은 사용자가 올린 허용 해밍 거리 이내의 이미지에 대해 저장된 탐지 결과가 있으면 반환합니다.
+    비슷해 보이는 다른 사용자의 사진에 그 사용자의 탐지 결과를 돌려주지 않도록 사용자별로만 찾습니다.
+    """
+    candidates = await ingredient_detect_cache_collection.find(
+        {"user_id": user_id, "bands": {"$in": hash_bands(phash)}},
+        {"hash": 1, "ingredients": 1}
+    ).to_list(length=None)
+
+    best = None
+    best_distance = DETECT_CACHE_MAX_DISTANCE + 1
+    for candidate in candidates:
+        distance = (int(candidate["hash"], 16) ^ phash).bit_count()
+        if distance < best_distance:
+            best, best_distance = candidate, distance
+
+    if best is None:
+        metrics.increment("detect_cache.misses")
+        return None
+
+    metrics.increment("detect_cache.hits")
+    return best["ingredients"]
+
+
+async def store_detected_ingredients(user_id: str, phash: int, ingredients: List[str]) -> None:
+    """
+    사용자의 이미지 해시와 탐지된 식재료 목록을 캐시에 저장합니다.
+    """
+    await ingredient_detect_cache_collection.insert_one({
+        "user_id": user_id,
+        "hash": f"{phash:016x}",
+        "bands": hash_bands(phash),
+        "ingredients": ingredients,
+        "created_at": datetime.now(timezone.utc),
+    })
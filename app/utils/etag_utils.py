@@ -0,0 +1,60 @@
+import hashlib
+from typing import Dict, Optional, Type
+
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.utils.response_utils import pick_fields
+
+
+def compute_etag(content: dict, image_base64: Optional[str] = None) -> str:
+    """
+    생성된 콘텐츠와 이미지로부터 변하지 않는 ETag를 계산합니다.
+    """
+    digest = hashlib.blake2b(orjson.dumps(content, option=orjson.OPT_SORT_KEYS), digest_size=16)
+    if image_base64:
+        digest.update(image_base64.encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+
+async def ensure_etag(collection, document: dict, model: Type[BaseModel]) -> str:
+    """
+    문서에 저장된 ETag를 반환합니다. ETag가 없는 예전 문서는 계산해서 저장해 둡니다.
+    """
+    etag = document.get("etag")
+    if etag is None:
+        etag = compute_etag(pick_fields(document, model), document.get("image_base64"))
+        await collection.update_one({"_id": document["_id"]}, {"$set": {"etag": etag}})
+    return etag
+
+
+def version_etag(name: str, version: int) -> str:
+    """
+    컬렉션 버전으로부터 ETag를 만듭니다.
+    """
+    return f'"{name}-v{version}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """
+    If-None-Match 헤더가 주어진 ETag와 일치하는지 확인합니다.
+    """
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return etag in candidates
+
+
+def cache_headers(etag: Optional[str], cache_control: str) -> Dict[str, str]:
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
@@ -0,0 +1,129 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional, Union
+
+from fastapi import HTTPException
+
+# 응답의 최상위 키 → 문서 경로 (문자열) 또는 응답 키 아래에 펼쳐지는 문서 필드 목록
+FieldMap = Dict[str, Union[str, List[str]]]
+
+
+def _split(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [path.strip() for path in value.split(",") if path.strip()]
+
+
+def _collapse(paths: Iterable[str]) -> List[str]:
+    # 상위 경로가 이미 있으면 하위 경로는 생략 (Mongo projection 경로 충돌 방지)
+    result = []
+    for path in sorted(set(paths)):
+        if not any(path == kept or path.startswith(kept + ".") for kept in result):
+            result.append(path)
+    return result
+
+
+def _document_paths(path: str, field_map: FieldMap) -> List[str]:
+    head, _, rest = path.partition(".")
+    target = field_map[head]
+    if isinstance(target, list):
+        return [rest] if rest else list(target)
+    return [f"{target}.{rest}" if rest else target]
+
+
+def _keep(value, paths: List[List[str]]):
+    if isinstance(value, list):
+        return [_keep(item, paths) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    kept = {}
+    for key in value:
+        children = [path[1:] for path in paths if path[0] == key]
+        if not children:
+            continue
+        kept[key] = value[key] if any(not child for child in children) else _keep(value[key], children)
+    return kept
+
+
+def _drop(value, path: List[str]) -> None:
+    if isinstance(value, list):
+        for item in value:
+            _drop(item, path)
+        return
+    if not isinstance(value, dict) or path[0] not in value:
+        return
+    if len(path) == 1:
+        del value[path[0]]
+    else:
+        _drop(value[path[0]], path[1:])
+
+
+class Fieldset:
+    """
+    fields= / exclude= 쿼리 파라미터로 지정한 응답 필드 집합입니다.
+    경로는 응답 기준의 점 표기법(예: recipe.nutrition)을 사용합니다.
+    """
+
+    def __init__(self, fields: Optional[str] = None, exclude: Optional[str] = None):
+        self.include = _collapse(_split(fields))
+        self.exclude = _collapse(_split(exclude))
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def _validate(self, field_map: FieldMap) -> None:
+        for path in self.include + self.exclude:
+            if path.partition(".")[0] not in field_map:
+                raise HTTPException(status_code=400, detail=f"알 수 없는 필드입니다: {path}")
+
+    def projection(self, field_map: FieldMap, required: Iterable[str] = ("_id",)) -> Optional[dict]:
+        """
+        요청된 필드만 읽도록 Mongo projection을 만듭니다.
+        required 경로는 응답에 포함되지 않더라도 항상 읽습니다.
+        """
+        self._validate(field_map)
+        if self.include:
+            paths = list(required)
+            for path in self.include:
+                paths.extend(_document_paths(path, field_map))
+            return {path: 1 for path in _collapse(paths)}
+
+        if self.exclude:
+            required = set(required)
+            paths = [document_path for path in self.exclude for document_path in _document_paths(path, field_map)]
+            projection = {path: 0 for path in _collapse(paths) if path not in required}
+            return projection or None
+
+        return None
+
+    def inclusion_projection(self, field_map: FieldMap, required: Iterable[str] = ("_id",)) -> dict:
+        """
+        항상 포함 방식으로 projection을 만듭니다.
+        fields가 없으면 field_map의 모든 필드에서 exclude를 뺀 필드를 읽습니다.
+        """
+        self._validate(field_map)
+        required = list(required)
+        paths = required + [document_path for path in (self.include or list(field_map))
+                            for document_path in _document_paths(path, field_map)]
+        excluded = {document_path for path in self.exclude for document_path in _document_paths(path, field_map)}
+        return {path: 1 for path in _collapse(paths) if path not in excluded or path in required}
+
+    def prune(self, content: dict) -> dict:
+        """
+        응답에서 요청되지 않은 필드를 제거합니다.
+        """
+        if self.include:
+            content = _keep(content, [path.split(".") for path in self.include])
+        for path in self.exclude:
+            _drop(content, path.split("."))
+        return content
+
+    def etag(self, etag: Optional[str]) -> Optional[str]:
+        """
+        일부 필드만 담은 응답은 전체 응답과 구별되는 ETag를 사용합니다.
+        """
+        if not self or not etag:
+            return etag
+        key = ",".join(self.include) + "|" + ",".join(self.exclude)
+        suffix = hashlib.blake2b(key.encode("utf-8"), digest_size=4).hexdigest()
+        return f'{etag[:-1]}-{suffix}"'
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict
+
+from app.config import GENERATED_MAX_AGE_DAYS, PROMPT_ROLLOUT_PERCENT, PROMPT_VERSIONS, REFRESH_CONCURRENCY
+from app.utils import metrics
+from app.utils.cancellation import GenerationContext
+
+# 진행 중인 백그라운드 재생성 작업 (키 → 작업)
+_refreshing: Dict[str, asyncio.Task] = {}
+
+
+def generation_metadata(route: str, model: str) -> dict:
+    """
+    생성된 문서에 함께 저장하는 생성 정보(모델, 프롬프트 버전, 생성 시각)입니다.
+    """
+    return {
+        "model": model,
+        "prompt_version": PROMPT_VERSIONS.get(route, 1),
+        "generated_at": datetime.now(timezone.utc),
+    }
+
+
+def _rollout_bucket(document_id) -> int:
+    # 문서마다 고정된 0~99 구간 (롤아웃 비율을 올리면 같은 문서가 계속 포함됨)
+    return zlib.crc32(str(document_id).encode()) % 100
+
+
+def is_stale(route: str, document: dict) -> bool:
+    """
+    문서를 다시 생성해야 하는지 확인합니다.
+    다른 문서가 바뀌어 함께 바꿔야 한다고 표시되었거나, 생성 후 GENERATED_MAX_AGE_DAYS가 지났거나,
+    이전 프롬프트 버전으로 생성되었고 PROMPT_ROLLOUT_PERCENT 구간에 들면 오래된 문서입니다.
+    생성 정보가 없는 예전 문서는 프롬프트 버전 1로 봅니다.
+    """
+    generation = document.get("generation") or {}
+    if generation.get("stale"):
+        return True
+
+    if generation.get("prompt_version", 1) < PROMPT_VERSIONS.get(route, 1) \
+            and _rollout_bucket(document["_id"]) < PROMPT_ROLLOUT_PERCENT:
+        return True
+
+    max_age_days = GENERATED_MAX_AGE_DAYS.get(route, 0)
+    generated_at = generation.get("generated_at")
+    if max_age_days and generated_at:
+        age = datetime.now(timezone.utc) - generated_at.replace(tzinfo=timezone.utc)
+        return age > timedelta(days=max_age_days)
+    return False
+
+
+async def _refresh(route: str, key: str, factory: Callable[[GenerationContext], Awaitable]) -> None:
+    try:
+        await factory(GenerationContext())
+        metrics.increment(f"freshness.{route}.refreshed")
+    except Exception as e:
+        metrics.increment(f"freshness.{route}.refresh_errors")
+        logging.error(f"Background refresh failed for {key}: {e}", exc_info=True)
+    finally:
+        _refreshing.pop(key, None)
+
+
+def schedule_refresh(route: str, key: str, factory: Callable[[GenerationContext], Awaitable]) -> None:
+    """
+    오래된 문서를 백그라운드에서 다시 생성합니다. 요청은 기다리지 않고 기존 문서로 바로 응답합니다.
+    같은 키의 작업이 진행 중이거나 동시에 REFRESH_CONCURRENCY개가 진행 중이면 예약하지 않으며,
+    예약되지 않은 문서는 다음에 읽힐 때 다시 시도되므로 프롬프트 버전을 올려도 재생성이 조금씩 퍼집니다.
+    """
+    metrics.increment(f"freshness.{route}.stale_served")
+    if key in _refreshing or len(_refreshing) >= REFRESH_CONCURRENCY:
+        metrics.increment(f"freshness.{route}.refresh_deferred")
+        return
+    _refreshing[key] = asyncio.create_task(_refresh(route, key, factory))
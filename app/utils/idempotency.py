@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, NamedTuple, Optional, Set, TypeVar
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+
+from app.config import IDEMPOTENCY_LOCK_SECONDS, IDEMPOTENCY_POLL_INTERVAL, IDEMPOTENCY_WAIT_SECONDS
+from app.database import idempotency_collection
+from app.utils import metrics
+from app.utils.cancellation import GenerationContext, run_cancellable, running_task
+
+T = TypeVar("T", bound=BaseModel)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+# 백그라운드에서 끝난 작업의 결과를 기록하는 작업 (완료 전에 가비지 컬렉션되지 않도록 참조를 유지)
+_settling: Set[asyncio.Task] = set()
+
+
+class IdempotencyClaim(NamedTuple):
+    """
+    Idempotency-Key 확인 결과입니다.
+    response가 있으면 같은 키로 이미 끝난 요청의 응답이고, 없으면 이 요청이 생성을 맡습니다.
+    """
+    id: str
+    response: Optional[dict]
+
+
+def _fingerprint(route: str, payload: BaseModel) -> str:
+    return hashlib.sha256(f"{route}:{payload.model_dump_json()}".encode()).hexdigest()
+
+
+async def _take_over(entry: dict, fingerprint: str) -> bool:
+    # 작업하던 서버가 중단되어 오래 남은 진행 중 표시는 이 요청이 넘겨받음
+    now = datetime.now(timezone.utc)
+    result = await idempotency_collection.update_one(
+        {"_id": entry["_id"], "status": "in_progress", "started_at": entry["started_at"]},
+        {"$set": {"fingerprint": fingerprint, "started_at": now, "created_at": now}}
+    )
+    return result.modified_count == 1
+
+
+async def claim_idempotency_key(http_request: Request, user_id: str, route: str,
+                                payload: BaseModel) -> Optional[IdempotencyClaim]:
+    """
+    Idempotency-Key 헤더가 있으면 키에 진행 중 표시를 남기고, 같은 키의 요청이 이미 있으면 그 결과를 기다립니다.
+    헤더가 없으면 None을 반환합니다.
+    같은 키로 내용이 다른 요청을 보내면 422, 기다리는 시간이 IDEMPOTENCY_WAIT_SECONDS를 넘으면 409를 반환합니다.
+    """
+    key = http_request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key는 255자를 넘을 수 없습니다.")
+
+    entry_id = f"{user_id}:{route}:{key}"
+    fingerprint = _fingerprint(route, payload)
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    waited = False
+
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            await idempotency_collection.insert_one({
+                "_id": entry_id,
+                "fingerprint": fingerprint,
+                "status": "in_progress",
+                "started_at": now,
+                "created_at": now,
+            })
+            return IdempotencyClaim(entry_id, None)
+        except DuplicateKeyError:
+            pass
+
+        entry = await idempotency_collection.find_one({"_id": entry_id})
+        if entry is None:
+            # 앞선 요청이 실패하여 표시가 지워졌으면 다시 시도
+            continue
+        if entry["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail="같은 Idempotency-Key로 다른 요청을 보낼 수 없습니다.")
+        if entry["status"] == "completed":
+            metrics.increment(f"idempotency.{route}.waited" if waited else f"idempotency.{route}.replayed")
+            return IdempotencyClaim(entry_id, entry["response"])
+
+        started_at = entry["started_at"].replace(tzinfo=timezone.utc)
+        if now - started_at > timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS) and await _take_over(entry, fingerprint):
+            metrics.increment(f"idempotency.{route}.taken_over")
+            return IdempotencyClaim(entry_id, None)
+
+        if asyncio.get_running_loop().time() > deadline:
+            raise HTTPException(status_code=409, detail="같은 Idempotency-Key의 요청이 아직 처리 중입니다.")
+        if await http_request.is_disconnected():
+            raise HTTPException(status_code=499, detail="클라이언트 연결이 끊어졌습니다.")
+        waited = True
+        await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+
+async def _release(claim: IdempotencyClaim) -> None:
+    # 진행 중 표시를 지워 같은 키로 다시 시도할 수 있게 함
+    await idempotency_collection.delete_one({"_id": claim.id, "status": "in_progress"})
+
+
+async def _store_response(claim: IdempotencyClaim, result: BaseModel) -> None:
+    try:
+        await idempotency_collection.update_one(
+            {"_id": claim.id, "status": "in_progress"},
+            {"$set": {"status": "completed", "response": result.model_dump(),
+                      "created_at": datetime.now(timezone.utc)}}
+        )
+    except Exception as e:
+        # 결과는 이미 저장되었으므로 응답은 그대로 반환
+        logging.warning(f"Failed to store idempotent response for {claim.id}: {e}")
+
+
+async def complete_idempotent(claim: Optional[IdempotencyClaim], work: Awaitable[T]) -> T:
+    """
+    생성 작업을 실행하고, 성공하면 응답을 키에 저장합니다. 실패하거나 취소되면 진행 중 표시를 지워 다시 시도할 수 있게 합니다.
+    생성 작업 안에서 호출하므로, 클라이언트 연결이 끊겨 백그라운드에서 끝난 작업의 결과도 저장됩니다.
+    """
+    if claim is None:
+        return await work
+
+    try:
+        result = await work
+    except BaseException:
+        await _release(claim)
+        raise
+
+    await _store_response(claim, result)
+    return result
+
+
+async def _settle(claim: IdempotencyClaim, task: asyncio.Task) -> None:
+    try:
+        if task.cancelled() or task.exception() is not None:
+            await _release(claim)
+        else:
+            await _store_response(claim, task.result())
+    finally:
+        _settling.discard(asyncio.current_task())
+
+
+def _schedule_settle(claim: IdempotencyClaim, task: asyncio.Task) -> None:
+    _settling.add(asyncio.create_task(_settle(claim, task)))
+
+
+async def run_idempotent(http_request: Request, claim: Optional[IdempotencyClaim], key: str,
+                         work: Callable[[GenerationContext], Awaitable[T]]) -> T:
+    """
+    run_cancellable로 생성 작업을 실행하고 결과를 Idempotency-Key에 기록합니다.
+    같은 생성 키의 작업이 이미 진행 중이면 이 요청의 작업은 실행되지 않으므로,
+    함께 기다린 작업이 끝나거나 실패한 뒤 이 요청에서 진행 중 표시를 완료하거나 지웁니다.
+    클라이언트 연결이 끊겨도 작업이 백그라운드에서 계속되면 표시를 지우지 않으므로,
+    같은 키로 다시 요청하면 새로 생성하지 않고 그 결과를 기다립니다.
+    """
+    if claim is None:
+        return await run_cancellable(http_request, key, work)
+
+    try:
+        result = await run_cancellable(http_request, key,
+                                       lambda context: complete_idempotent(claim, work(context)))
+    except BaseException:
+        task = running_task(key)
+        if task is None:
+            await _release(claim)
+        else:
+            # 연결이 끊겨도 작업이 백그라운드에서 계속되면 표시를 남겨 두고, 작업이 끝난 뒤 결과를 저장하거나 표시를 지움
+            task.add_done_callback(lambda finished: _schedule_settle(claim, finished))
+        raise
+
+    # 이 요청의 작업이 실행되었다면 이미 완료되어 있으므로 아무것도 바뀌지 않음
+    await _store_response(claim, result)
+    return result
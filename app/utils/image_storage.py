@@ -0,0 +1,101 @@
+import base64
+from typing import AsyncIterator, Optional, Tuple
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from app.config import IMAGE_STORAGE
+from app.database import db
+
+# GridFS에 저장된 이미지를 제공하는 경로
+IMAGE_URL_PREFIX = "/images/"
+
+
+class InlineImageStorage:
+    """
+    이미지를 data URL 문자열로 만들어 문서에 직접 저장합니다.
+    받은 조각을 바로 Base64로 인코딩하므로 원본 바이트 전체를 따로 들고 있지 않습니다.
+    """
+
+    async def save(self, chunks: AsyncIterator[bytes], mime_type: str) -> str:
+        parts = [f"data:{mime_type};base64,"]
+        remainder = b""
+        async for chunk in chunks:
+            chunk = remainder + chunk
+            # Base64는 3바이트 단위로 인코딩되므로 나머지는 다음 조각과 합쳐서 처리
+            aligned = len(chunk) - len(chunk) % 3
+            parts.append(base64.b64encode(chunk[:aligned]).decode("ascii"))
+            remainder = chunk[aligned:]
+        parts.append(base64.b64encode(remainder).decode("ascii"))
+        return "".join(parts)
+
+
+class GridFSImageStorage:
+    """
+    이미지를 GridFS에 조각 단위로 저장하고, 문서에는 이미지 경로만 남깁니다.
+    """
+
+    def __init__(self):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name="images")
+
+    async def save(self, chunks: AsyncIterator[bytes], mime_type: str) -> str:
+        upload_stream = self.bucket.open_upload_stream("image", metadata={"contentType": mime_type})
+        try:
+            async for chunk in chunks:
+                await upload_stream.write(chunk)
+        except BaseException:
+            await upload_stream.abort()
+            raise
+        await upload_stream.close()
+        return f"{IMAGE_URL_PREFIX}{upload_stream._id}"
+
+
+image_storage = GridFSImageStorage() if IMAGE_STORAGE == "gridfs" else InlineImageStorage()
+
+
+async def read_image(value: str) -> Tuple[bytes, str]:
+    """
+    문서에 저장된 이미지 값(data URL 또는 GridFS 경로)에서 이미지 바이트와 MIME 타입을 읽습니다.
+    """
+    if value.startswith(IMAGE_URL_PREFIX):
+        bucket = AsyncIOMotorGridFSBucket(db, bucket_name="images")
+        grid_out = await bucket.open_download_stream(ObjectId(value[len(IMAGE_URL_PREFIX):]))
+        return await grid_out.read(), (grid_out.metadata or {}).get("contentType", "image/png")
+
+    header, _, data = value.partition(",")
+    mime_type = header[len("data:"):].split(";")[0] or "image/png"
+    return base64.b64decode(data), mime_type
+
+
+async def portable_image(value: Optional[str]) -> Optional[str]:
+    """
+    다른 인스턴스에서도 읽을 수 있도록 GridFS 경로를 data URL로 바꿉니다.
+    """
+    if not value or not value.startswith(IMAGE_URL_PREFIX):
+        return value
+    data, mime_type = await read_image(value)
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+async def store_image(data: bytes, mime_type: str) -> str:
+    """
+    이미지 바이트를 설정된 이미지 저장소에 저장하고 문서에 저장할 이미지 값을 반환합니다.
+    """
+    async def chunks():
+        yield data
+
+    return await image_storage.save(chunks(), mime_type)
+
+
+async def delete_image(value: Optional[str]) -> None:
+    """
+    문서에서 더 이상 쓰지 않는 이미지를 저장소에서 지웁니다. data URL은 문서와 함께 사라지므로 GridFS 이미지만 지웁니다.
+    """
+    if not value or not value.startswith(IMAGE_URL_PREFIX):
+        return
+    bucket = AsyncIOMotorGridFSBucket(db, bucket_name="images")
+    try:
+        await bucket.delete(ObjectId(value[len(IMAGE_URL_PREFIX):]))
+    except NoFile:
+        pass
@@ -1,11 +1,147 @@
+import asyncio
 import base64
+import io
+from typing import NamedTuple, Tuple
 
-import requests
+import httpx
+from fastapi import HTTPException, UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
 
+from app.config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE, INGEST_MAX_EDGE, INGEST_JPEG_QUALITY, \
+    IMAGE_FETCH_TIMEOUT, IMAGE_FETCH_MAX_BYTES, IMAGE_FETCH_MAX_CONNECTIONS
+from app.utils import metrics
+from app.utils.image_storage import image_storage
 
-def download_and_encode_image(image_url: str) -> str:
-    response = requests.get(image_url)
-    if response.status_code == 200:
-        return base64.b64encode(response.content).decode('utf-8')
-    else:
-        raise Exception(f"Failed to download image from {image_url}")
\ No newline at end of file
+# 이미지 다운로드에 재사용하는 연결 풀
+_http_client: httpx.AsyncClient | None = None
+
+# 다시 인코딩하지 않고 그대로 보낼 수 있는 원본 형식 → MIME 타입
+_PASSTHROUGH_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+_EXIF_ORIENTATION = 0x0112
+
+
+class IngestedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    original_size: int
+    phash: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return max(self.original_size - len(self.data), 0)
+
+    def to_data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=IMAGE_FETCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=IMAGE_FETCH_MAX_CONNECTIONS),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def fetch_image_to_storage(image_url: str) -> str:
+    """
+    이미지를 내려받아 설정된 이미지 저장소로 바로 흘려보내고, 문서에 저장할 이미지 값을 반환합니다.
+    다운로드한 이미지 전체를 메모리에 모아 두지 않습니다.
+    """
+    async with get_http_client().stream("GET", image_url) as response:
+        if response.status_code != 200:
+            raise Exception(f"Failed to download image from {image_url}")
+
+        content_length = int(response.headers.get("content-length", 0))
+        if content_length > IMAGE_FETCH_MAX_BYTES:
+            raise Exception(f"Image from {image_url} is too large: {content_length} bytes")
+
+        mime_type = response.headers.get("content-type", "image/png").split(";")[0]
+
+        async def chunks():
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > IMAGE_FETCH_MAX_BYTES:
+                    raise Exception(f"Image from {image_url} is too large")
+                yield chunk
+            metrics.increment("image_fetch.bytes", received)
+
+        return await image_storage.save(chunks(), mime_type)
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    이미지의 64비트 차이 해시(dHash)를 계산합니다.
+    거의 같은 이미지는 해밍 거리가 작은 해시를 갖습니다.
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def _downscale_and_encode(buffer: io.BytesIO, original_size: int) -> Tuple[bytes, str, int]:
+    with Image.open(buffer) as image:
+        original_format = image.format
+        original_dimensions = image.size
+        oriented = image.getexif().get(_EXIF_ORIENTATION, 1) == 1
+
+        # JPEG는 디코딩 단계에서 바로 축소하여 메모리와 시간을 절약
+        image.draft("RGB", (INGEST_MAX_EDGE, INGEST_MAX_EDGE))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGB")
+        image.thumbnail((INGEST_MAX_EDGE, INGEST_MAX_EDGE), Image.LANCZOS)
+        phash = perceptual_hash(image)
+
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=INGEST_JPEG_QUALITY, optimize=True)
+        data = output.getvalue()
+
+    # 이미 작게 압축된 이미지는 다시 인코딩하면 오히려 커질 수 있으므로,
+    # 축소나 회전이 필요 없고 모델이 읽을 수 있는 형식이면 원본을 그대로 사용
+    if (len(data) >= original_size and oriented and image.size == original_dimensions
+            and original_format in _PASSTHROUGH_FORMATS):
+        return buffer.getvalue(), _PASSTHROUGH_FORMATS[original_format], phash
+    return data, "image/jpeg", phash
+
+
+async def ingest_upload(upload: UploadFile) -> IngestedImage:
+    """
+    업로드된 이미지를 크기 제한을 지키며 조각 단위로 읽고,
+    EXIF 회전을 적용한 뒤 최대 변 길이에 맞게 축소하여 JPEG로 다시 인코딩합니다.
+    다시 인코딩한 결과가 원본보다 작지 않으면 (축소나 회전이 필요 없는 경우) 원본을 그대로 사용합니다.
+    """
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="이미지 파일이 너무 큽니다.")
+
+    buffer = io.BytesIO()
+    original_size = 0
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        original_size += len(chunk)
+        if original_size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="이미지 파일이 너무 큽니다.")
+        buffer.write(chunk)
+    buffer.seek(0)
+
+    try:
+        data, mime_type, phash = await asyncio.to_thread(_downscale_and_encode, buffer, original_size)
+    except (UnidentifiedImageError, OSError):
+        raise HTTPException(status_code=400, detail="유효한 이미지 파일이 아닙니다.")
+
+    ingested = IngestedImage(data=data, mime_type=mime_type, original_size=original_size, phash=phash)
+    metrics.increment("ingest.images")
+    metrics.increment("ingest.bytes_saved", ingested.bytes_saved)
+    return ingested
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Tuple
+
+from openai import APIConnectionError, InternalServerError, NotFoundError, RateLimitError
+
+from app.config import client as openai_client, MODEL_ROUTES, MODEL_TIERS, LLM_CONCURRENCY
+from app.utils import metrics
+from app.utils.cancellation import GenerationContext, estimate_tokens
+
+# 다음 모델로 대체해 볼 가치가 있는 오류
+_FALLBACK_ERRORS = (APIConnectionError, InternalServerError, NotFoundError, RateLimitError)
+
+# 동시에 진행되는 모델 호출 수를 제한
+llm_limiter = asyncio.Semaphore(LLM_CONCURRENCY)
+
+
+def models_for_route(route: str) -> List[str]:
+    """
+    라우트에 지정된 티어의 모델 목록을 대체 순서대로 반환합니다.
+    """
+    tier = MODEL_ROUTES.get(route, "standard")
+    return MODEL_TIERS[tier]
+
+
+async def create_chat_completion(route: str, messages: List[dict], context: Optional[GenerationContext] = None,
+                                 completion_tokens: int = 500, **kwargs):
+    """
+    라우팅 테이블에 따라 선택한 모델로 Chat Completion API를 호출합니다.
+    동시 호출 수는 LLM_CONCURRENCY로 제한됩니다.
+    호출이 실패하면 같은 티어의 다음 모델로 대체하고, 모델별 응답 시간을 기록합니다.
+    context가 주어지면 호출이 끝나기 전까지 예상 토큰을 작업에 기록해 두어,
+    작업이 취소될 때 절약된 토큰으로 집계되도록 합니다.
+    """
+    tokens = estimate_tokens(messages, completion_tokens)
+    if context:
+        context.expect_tokens(tokens)
+
+    models = models_for_route(route)
+    for index, model in enumerate(models):
+        try:
+            async with llm_limiter:
+                started = time.perf_counter()
+                response = await openai_client.chat.completions.create(model=model, messages=messages, **kwargs)
+        except _FALLBACK_ERRORS as e:
+            metrics.increment(f"llm.errors.{model}")
+            if index == len(models) - 1:
+                raise
+            logging.warning(f"Model {model} failed for route {route}, falling back: {e}")
+            metrics.increment(f"llm.fallbacks.{route}")
+            continue
+
+        elapsed = time.perf_counter() - started
+        metrics.observe(f"llm.latency.{model}", elapsed)
+        metrics.observe(f"llm.route_latency.{route}", elapsed)
+        break
+
+    if context:
+        context.spend_tokens(tokens)
+    return response
+
+
+async def stream_chat_completion(route: str, messages: List[dict], on_text: Callable[[str], None],
+                                 context: Optional[GenerationContext] = None, completion_tokens: int = 500,
+                                 **kwargs) -> Tuple[str, str]:
+    """
+    create_chat_completion과 같지만 응답을 스트리밍으로 받으며, 텍스트 조각을 받을 때마다 on_text를 호출합니다.
+    응답 전체 텍스트와 응답한 모델 이름을 반환합니다.
+    다음 모델로의 대체는 첫 조각을 받기 전에 실패한 경우에만 시도합니다.
+    """
+    tokens = estimate_tokens(messages, completion_tokens)
+    if context:
+        context.expect_tokens(tokens)
+
+    models = models_for_route(route)
+    for index, model in enumerate(models):
+        parts: List[str] = []
+        try:
+            async with llm_limiter:
+                started = time.perf_counter()
+                stream = await openai_client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                                     **kwargs)
+                async for chunk in stream:
+                    model = chunk.model or model
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if not parts:
+                            metrics.observe(f"llm.first_token_latency.{route}", time.perf_counter() - started)
+                        parts.append(delta)
+                        on_text(delta)
+        except _FALLBACK_ERRORS as e:
+            metrics.increment(f"llm.errors.{model}")
+            if parts or index == len(models) - 1:
+                raise
+            logging.warning(f"Model {model} failed for route {route}, falling back: {e}")
+            metrics.increment(f"llm.fallbacks.{route}")
+            continue
+
+        elapsed = time.perf_counter() - started
+        metrics.observe(f"llm.latency.{model}", elapsed)
+        metrics.observe(f"llm.route_latency.{route}", elapsed)
+        break
+
+    if context:
+        context.spend_tokens(tokens)
+    return "".join(parts), model
@@ -0,0 +1,68 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.utils.nutrition_utils import NUTRITION_FIELDS, numeric_fields
+from app.utils.recipe_index import normalize_ingredient
+from app.utils.unit_utils import normalize_unit
+
+
+def _base_servings(recipe: dict) -> float:
+    # 인분 수가 없는 예전 레시피는 1인분으로 간주
+    return float(recipe.get("servings") or 1)
+
+
+def _nutrition_values(recipe: dict) -> dict:
+    # 숫자 필드가 아직 백필되지 않은 문서는 문자열에서 바로 읽음
+    return recipe.get("nutritionValues") or numeric_fields(recipe)["nutritionValues"]
+
+
+def summarize_plan(recipes: List[dict], servings: List[float], refrigerator: List[dict]) -> dict:
+    """
+    식단에 담긴 레시피의 영양 정보와 재료를 인분 수에 맞춰 합산하고,
+    냉장고에 있는 재료를 뺀 장보기 목록을 만듭니다.
+    영양 정보는 1인분 기준이고, 재료 양은 레시피의 인분 수 기준입니다.
+    """
+    servings = np.asarray(servings, dtype=np.float64)
+
+    # 레시피 × 영양소 행렬과 인분 수 벡터의 곱으로 영양 정보 합계를 구함
+    nutrition = np.array([[_nutrition_values(recipe).get(field) or 0.0 for field in NUTRITION_FIELDS]
+                          for recipe in recipes], dtype=np.float64).reshape(len(recipes), len(NUTRITION_FIELDS))
+    nutrition_totals = servings @ nutrition
+
+    # 모든 재료를 (레시피 번호, 재료 키 번호, 기준 단위 양) 배열로 펼친 뒤 bincount로 합산
+    keys: Dict[Tuple[str, str], int] = {}
+    names: List[str] = []
+    recipe_positions, key_positions, amounts = [], [], []
+    for position, recipe in enumerate(recipes):
+        for ingredient in recipe.get("ingredients", []):
+            amount, unit = normalize_unit(float(ingredient.get("amount") or 0), ingredient.get("unit", ""))
+            key = (normalize_ingredient(ingredient["name"]), unit)
+            if key not in keys:
+                keys[key] = len(keys)
+                names.append(ingredient["name"])
+            recipe_positions.append(position)
+            key_positions.append(keys[key])
+            amounts.append(amount)
+
+    scale = servings / np.array([_base_servings(recipe) for recipe in recipes], dtype=np.float64)
+    weights = np.asarray(amounts, dtype=np.float64) * scale[np.asarray(recipe_positions, dtype=np.int64)]
+    totals = np.bincount(np.asarray(key_positions, dtype=np.int64), weights=weights, minlength=len(keys))
+
+    # 냉장고에 있는 같은 재료(같은 기준 단위)의 양을 뺌
+    available = np.zeros(len(keys), dtype=np.float64)
+    for item in refrigerator:
+        amount, unit = normalize_unit(float(item.get("amount") or 0), item.get("unit", ""))
+        position = keys.get((normalize_ingredient(item["name"]), unit))
+        if position is not None:
+            available[position] += amount
+    needed = np.maximum(totals - available, 0.0)
+
+    units = [unit for _, unit in keys]
+    return {
+        "nutrition": {field: round(float(value), 1) for field, value in zip(NUTRITION_FIELDS, nutrition_totals)},
+        "ingredients": [{"name": name, "amount": round(float(amount), 2), "unit": unit}
+                        for name, amount, unit in zip(names, totals, units)],
+        "shopping_list": [{"name": name, "amount": round(float(amount), 2), "unit": unit}
+                          for name, amount, unit in zip(names, needed, units) if amount > 0],
+    }
@@ -0,0 +1,52 @@
+from collections import defaultdict
+from typing import Dict, Tuple
+
+# 프로세스 단위의 간단한 인메모리 지표 저장소
+_counters: Dict[str, float] = defaultdict(float)
+_timings: Dict[str, Dict[str, float]] = {}
+# 비율 지표 이름 → (분자 카운터, 분모 카운터)
+_ratios: Dict[str, Tuple[str, str]] = {}
+
+
+def increment(name: str, value: float = 1) -> None:
+    """
+    카운터 지표를 증가시킵니다.
+    """
+    _counters[name] += value
+
+
+def observe(name: str, value: float) -> None:
+    """
+    시간(초) 등의 관측값을 기록합니다. 개수, 합계, 최소, 최대값을 유지합니다.
+    """
+    stats = _timings.get(name)
+    if stats is None:
+        _timings[name] = {"count": 1, "total": value, "min": value, "max": value}
+        return
+
+    stats["count"] += 1
+    stats["total"] += value
+    stats["min"] = min(stats["min"], value)
+    stats["max"] = max(stats["max"], value)
+
+
+def register_ratio(name: str, numerator: str, denominator: str) -> None:
+    """
+    두 카운터의 비율을 지표로 등록합니다. (예: 모델 호출 없이 답한 질문의 비율)
+    """
+    _ratios[name] = (numerator, denominator)
+
+
+def snapshot() -> dict:
+    """
+    현재까지 기록된 모든 지표를 반환합니다.
+    """
+    timings = {
+        name: {**stats, "avg": stats["total"] / stats["count"]}
+        for name, stats in _timings.items()
+    }
+    ratios = {
+        name: _counters.get(numerator, 0) / _counters[denominator]
+        for name, (numerator, denominator) in _ratios.items() if _counters.get(denominator)
+    }
+    return {"counters": dict(_counters), "timings": timings, "ratios": ratios}
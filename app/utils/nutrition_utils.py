@@ -0,0 +1,93 @@
+import re
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.database import recipe_collection
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# 'h', 'm'은 '1h30m'처럼 붙여 쓰는 경우도 있으므로 뒤에 영문자가 오지 않는지만 확인
+_HOURS = re.compile(r"(\d+(?:\.\d+)?)\s*(?:시간|hours?|hrs?|h(?![a-z]))", re.IGNORECASE)
+_MINUTES = re.compile(r"(\d+(?:\.\d+)?)\s*(?:분|minutes?|mins?|m(?![a-z]))", re.IGNORECASE)
+_HALF_HOUR = re.compile(r"시간\s*반")
+# '30분~40분', '1-2시간', '30 to 40 minutes' 같은 범위의 구분자
+_RANGE = re.compile(r"\s*[~〜\-–]\s*|\s+to\s+", re.IGNORECASE)
+
+# 문자열로 저장된 영양 정보 필드
+NUTRITION_FIELDS = ("calories", "protein", "carbohydrates", "fat")
+
+# 백필할 때 한 번에 보내는 업데이트 수
+_BACKFILL_BATCH_SIZE = 500
+
+
+def parse_amount(value) -> Optional[float]:
+    """
+    '25g', '약 25 g' 같은 값에서 숫자를 읽습니다. 읽을 수 없으면 None을 반환합니다.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _NUMBER.search(value.replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def _duration_minutes(text: str) -> Optional[float]:
+    # 단위가 있는 시간만 분으로 바꾸고, 단위가 없으면 None
+    hours = sum(float(amount) for amount in _HOURS.findall(text))
+    minutes = sum(float(amount) for amount in _MINUTES.findall(text))
+    if _HALF_HOUR.search(text):
+        minutes += 30
+    if not hours and not minutes:
+        return None
+    return hours * 60 + minutes
+
+
+def parse_cook_time(value) -> Optional[int]:
+    """
+    '1시간 30분', '1시간 반', '45분', '1h30m', '1.5 hours' 같은 조리 시간을 분 단위 정수로 바꿉니다.
+    '30분~40분'처럼 범위로 적힌 시간은 큰 쪽을 사용합니다.
+    """
+    if isinstance(value, (int, float)):
+        return round(value)
+    if not isinstance(value, str):
+        return None
+
+    parts = [part for part in _RANGE.split(value) if part.strip()]
+    durations = [duration for duration in map(_duration_minutes, parts) if duration is not None]
+    if durations:
+        return round(max(durations))
+
+    # 단위가 없으면 분으로 간주
+    amounts = [amount for amount in map(parse_amount, parts) if amount is not None]
+    return round(max(amounts)) if amounts else None
+
+
+def numeric_fields(recipe: dict) -> dict:
+    """
+    레시피 문서의 영양 정보와 조리 시간으로부터 필터와 정렬에 쓰는 숫자 필드를 만듭니다.
+    """
+    nutrition = recipe.get("nutrition") or {}
+    return {
+        "nutritionValues": {field: parse_amount(nutrition.get(field)) for field in NUTRITION_FIELDS},
+        "cookTimeMinutes": parse_cook_time(recipe.get("cookTime")),
+    }
+
+
+async def backfill_numeric_fields() -> int:
+    """
+    숫자 필드가 없는 예전 레시피에 숫자 필드를 채우고, 채운 문서 수를 반환합니다.
+    """
+    updates = []
+    updated = 0
+    cursor = recipe_collection.find({"nutritionValues": {"$exists": False}}, {"nutrition": 1, "cookTime": 1})
+    async for recipe in cursor:
+        updates.append(UpdateOne({"_id": recipe["_id"]}, {"$set": numeric_fields(recipe)}))
+        if len(updates) >= _BACKFILL_BATCH_SIZE:
+            await recipe_collection.bulk_write(updates, ordered=False)
+            updated += len(updates)
+            updates = []
+    if updates:
+        await recipe_collection.bulk_write(updates, ordered=False)
+        updated += len(updates)
+    return updated
@@ -0,0 +1,180 @@
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from app.database import recipe_collection
+
+_SPACES = re.compile(r"\s+")
+_PARENTHESES = re.compile(r"\([^)]*\)")
+
+
+def normalize_ingredient(name: str) -> str:
+    """
+    재료 이름을 비교할 수 있도록 괄호 안 설명과 공백을 제거하고 소문자로 바꿉니다.
+    """
+    return _SPACES.sub("", _PARENTHESES.sub("", name)).lower()
+
+
+class RecipeMatch(NamedTuple):
+    id: str
+    name: str
+    coverage: float
+    matched: int
+    total: int
+    missing_ingredients: List[str]
+
+
+class RecipeIndex:
+    """
+    저장된 레시피의 재료 역색인입니다.
+    재료마다 그 재료를 쓰는 레시피 번호 배열을 두고, 냉장고 재료의 배열을 이어 붙여 bincount 하면
+    모든 레시피의 보유 재료 수를 한 번에 구할 수 있습니다.
+    """
+
+    def __init__(self):
+        self._vocabulary: Dict[str, int] = {}
+        self._postings: List[List[int]] = []
+        self._posting_arrays: Dict[int, np.ndarray] = {}
+        self._recipe_ids: List[str] = []
+        self._recipe_names: List[str] = []
+        self._recipe_ingredients: List[List[str]] = []
+        self._positions: Dict[str, int] = {}
+        self._totals: List[int] = []
+        self._totals_array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._recipe_ids)
+
+    async def build(self) -> None:
+        """
+        저장된 모든 레시피의 재료 이름만 읽어 색인을 만듭니다.
+        """
+        cursor = recipe_collection.find({}, {"name": 1, "ingredients.name": 1})
+        async for recipe in cursor:
+            self.add(str(recipe["_id"]), recipe.get("name", ""),
+                     [ingredient["name"] for ingredient in recipe.get("ingredients", [])])
+
+    def add(self, recipe_id: str, name: str, ingredient_names: Iterable[str]) -> None:
+        """
+        레시피 하나를 색인에 추가합니다. 이미 있는 레시피는 무시합니다.
+        """
+        if recipe_id in self._positions:
+            return
+
+        position = len(self._recipe_ids)
+        names = list(dict.fromkeys(ingredient_names))
+        terms = {normalize_ingredient(ingredient) for ingredient in names}
+        terms.discard("")
+        for term in terms:
+            term_id = self._vocabulary.setdefault(term, len(self._vocabulary))
+            if term_id == len(self._postings):
+                self._postings.append([])
+            self._postings[term_id].append(position)
+            self._posting_arrays.pop(term_id, None)
+
+        self._positions[recipe_id] = position
+        self._recipe_ids.append(recipe_id)
+        self._recipe_names.append(name)
+        self._recipe_ingredients.append(names)
+        self._totals.append(len(terms))
+        self._totals_array = None
+
+    def update(self, recipe_id: str, name: str, ingredient_names: Iterable[str]) -> None:
+        """
+        다시 생성된 레시피의 재료를 같은 번호에 반영합니다. 색인에 없는 레시피는 추가합니다.
+        """
+        position = self._positions.get(recipe_id)
+        if position is None:
+            self.add(recipe_id, name, ingredient_names)
+            return
+
+        old_terms = {normalize_ingredient(ingredient) for ingredient in self._recipe_ingredients[position]}
+        names = list(dict.fromkeys(ingredient_names))
+        terms = {normalize_ingredient(ingredient) for ingredient in names}
+        old_terms.discard("")
+        terms.discard("")
+        for term in old_terms - terms:
+            term_id = self._vocabulary[term]
+            self._postings[term_id].remove(position)
+            self._posting_arrays.pop(term_id, None)
+        for term in terms - old_terms:
+            term_id = self._vocabulary.setdefault(term, len(self._vocabulary))
+            if term_id == len(self._postings):
+                self._postings.append([])
+            self._postings[term_id].append(position)
+            self._posting_arrays.pop(term_id, None)
+
+        self._recipe_names[position] = name
+        self._recipe_ingredients[position] = names
+        self._totals[position] = len(terms)
+        self._totals_array = None
+
+    def _posting(self, term_id: int) -> np.ndarray:
+        array = self._posting_arrays.get(term_id)
+        if array is None:
+            array = np.asarray(self._postings[term_id], dtype=np.int32)
+            self._posting_arrays[term_id] = array
+        return array
+
+    def _totals_vector(self) -> np.ndarray:
+        if self._totals_array is None:
+            self._totals_array = np.asarray(self._totals, dtype=np.int32)
+        return self._totals_array
+
+    def coverage(self, terms: Set[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        정규화된 재료 이름 집합으로 각 레시피의 재료를 얼마나 갖추었는지 (보유 재료 수, 비율) 배열로 반환합니다.
+        """
+        term_ids = [self._vocabulary[term] for term in terms if term in self._vocabulary]
+        count = len(self._recipe_ids)
+        if not term_ids or count == 0:
+            matched = np.zeros(count, dtype=np.int32)
+        else:
+            matched = np.bincount(np.concatenate([self._posting(term_id) for term_id in term_ids]),
+                                  minlength=count).astype(np.int32)
+        ratio = matched / np.maximum(self._totals_vector(), 1)
+        return matched, ratio
+
+    def recommend(self, ingredient_names: Iterable[str], limit: int = 10, min_coverage: float = 0.0,
+                  name_contains: Optional[str] = None) -> List[RecipeMatch]:
+        """
+        주어진 재료로 만들 수 있는 비율이 높은 순서로 레시피를 반환합니다.
+        비율이 같으면 부족한 재료가 적은 레시피를 먼저 반환합니다.
+        """
+        available = {normalize_ingredient(name) for name in ingredient_names}
+        matched, ratio = self.coverage(available)
+
+        candidates = np.flatnonzero((matched > 0) & (ratio >= min_coverage))
+        if name_contains and len(candidates):
+            # 이름 조건은 재료 조건을 통과한 적은 수의 후보에만 확인
+            keyword = normalize_ingredient(name_contains)
+            mask = [keyword in normalize_ingredient(self._recipe_names[position]) for position in candidates]
+            candidates = candidates[np.asarray(mask, dtype=bool)]
+        if len(candidates) == 0:
+            return []
+
+        # 상위 limit개의 경계 비율을 구하고 그 이상인 후보만 정렬 (전체 정렬을 피함)
+        # 경계 비율과 같은 후보는 모두 남겨 부족한 재료 수로 비교하므로 전체를 정렬한 결과와 같음
+        totals = self._totals_vector()
+        if len(candidates) > limit:
+            threshold = -np.partition(-ratio[candidates], limit - 1)[limit - 1]
+            candidates = candidates[ratio[candidates] >= threshold]
+        missing = totals[candidates] - matched[candidates]
+        order = np.lexsort((missing, -ratio[candidates]))[:limit]
+
+        results = []
+        for position in candidates[order]:
+            results.append(RecipeMatch(
+                id=self._recipe_ids[position],
+                name=self._recipe_names[position],
+                coverage=float(ratio[position]),
+                matched=int(matched[position]),
+                total=int(totals[position]),
+                missing_ingredients=[ingredient for ingredient in self._recipe_ingredients[position]
+                                     if normalize_ingredient(ingredient) not in available],
+            ))
+        return results
+
+
+recipe_index = RecipeIndex()
@@ -0,0 +1,65 @@
+import json
+import re
+from typing import List, NamedTuple, Optional
+
+# 이미지 프롬프트에 넣는 재료 수
+IMAGE_PROMPT_INGREDIENTS = 5
+
+_STRING = r'"((?:[^"\\]|\\.)*)"'
+_NAME = re.compile(r'"name"\s*:\s*' + _STRING)
+_DESCRIPTION = re.compile(r'"description"\s*:\s*' + _STRING)
+_INGREDIENTS = re.compile(r'"ingredients"\s*:\s*\[')
+_INSTRUCTIONS = re.compile(r'"instructions"\s*:')
+
+
+class ImagePromptFields(NamedTuple):
+    name: str
+    description: str
+    ingredient_names: List[str]
+
+
+def _unescape(value: str) -> str:
+    return json.loads(f'"{value}"')
+
+
+class RecipeStreamParser:
+    """
+    스트리밍으로 받는 레시피 JSON에서 이미지 프롬프트에 필요한 필드(이름, 설명, 앞쪽 재료 이름)를 찾습니다.
+    전체 JSON이 끝나기 전에 필드가 모두 나오면 이미지 생성을 먼저 시작할 수 있습니다.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._fields: Optional[ImagePromptFields] = None
+
+    def feed(self, delta: str) -> Optional[ImagePromptFields]:
+        """
+        받은 텍스트 조각을 추가하고, 필드가 처음으로 모두 갖춰지면 그 값을 반환합니다. 그 외에는 None을 반환합니다.
+        """
+        if self._fields is not None:
+            return None
+        self._text += delta
+        self._fields = self._parse(self._text)
+        return self._fields
+
+    @staticmethod
+    def _parse(text: str) -> Optional[ImagePromptFields]:
+        ingredients = _INGREDIENTS.search(text)
+        if ingredients is None:
+            return None
+        # 재료 목록 앞의 최상위 필드에서 이름과 설명을 찾음 (재료 이름과 구분)
+        head = text[:ingredients.start()]
+        name, description = _NAME.search(head), _DESCRIPTION.search(head)
+        if name is None or description is None:
+            return None
+
+        body = text[ingredients.end():]
+        instructions = _INSTRUCTIONS.search(body)
+        if instructions is not None:
+            body = body[:instructions.start()]
+        names = [_unescape(match.group(1)) for match in _NAME.finditer(body)]
+        # 재료가 충분히 나왔거나 재료 목록이 끝났으면 준비 완료
+        if len(names) < IMAGE_PROMPT_INGREDIENTS and instructions is None:
+            return None
+        return ImagePromptFields(_unescape(name.group(1)), _unescape(description.group(1)),
+                                 names[:IMAGE_PROMPT_INGREDIENTS])
@@ -0,0 +1,28 @@
+from typing import Dict, Optional, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def pick_fields(document: dict, model: Type[BaseModel]) -> dict:
+    """
+    우리 컬렉션에서 읽은 문서에서 모델에 정의된 필드만 골라냅니다.
+    저장할 때 이미 검증한 데이터이므로 다시 검증하지 않습니다.
+    필드가 추가되기 전에 저장된 문서에는 그 필드가 없으므로 모델의 기본값으로 채웁니다.
+    """
+    fields = {}
+    for name, field in model.model_fields.items():
+        if name in document:
+            fields[name] = document[name]
+        elif not field.is_required():
+            fields[name] = field.get_default(call_default_factory=True)
+    return fields
+
+
+def trusted_response(content: dict, status_code: int = 200,
+                     headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """
+    검증을 거치지 않고 orjson으로 한 번만 직렬화하여 응답합니다.
+    FastAPI는 Response 객체를 그대로 반환하므로 response_model 검증과 직렬화가 다시 일어나지 않습니다.
+    """
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
@@ -0,0 +1,29 @@
+from app.utils.nutrition_utils import NUTRITION_FIELDS, numeric_fields
+from app.utils.unit_utils import normalize_unit, to_display_unit
+
+
+def scale_recipe(recipe: dict, servings: int) -> dict:
+    """
+    레시피의 재료 양을 주어진 인분 수에 맞게 바꾸고, 전체 영양 정보를 다시 계산합니다.
+    같은 입력에는 항상 같은 결과를 반환하므로 모델을 다시 호출하지 않아도 됩니다.
+    """
+    original_servings = recipe.get("servings") or 1
+    factor = servings / original_servings
+
+    ingredients = []
+    for ingredient in recipe.get("ingredients", []):
+        amount, unit = normalize_unit(float(ingredient.get("amount") or 0) * factor, ingredient.get("unit", ""))
+        amount, unit = to_display_unit(amount, unit, ingredient.get("unit", ""))
+        ingredients.append({"name": ingredient["name"], "amount": amount, "unit": unit})
+
+    # 영양 정보는 1인분 기준이므로 인분 수를 곱해 전체 양을 구함
+    values = recipe.get("nutritionValues") or numeric_fields(recipe)["nutritionValues"]
+    total_nutrition = {field: round((values.get(field) or 0.0) * servings, 1) for field in NUTRITION_FIELDS}
+
+    return {
+        "servings": servings,
+        "original_servings": original_servings,
+        "ingredients": ingredients,
+        "nutrition": recipe.get("nutrition"),
+        "total_nutrition": total_nutrition,
+    }
@@ -0,0 +1,137 @@
+import gzip
+import logging
+import os
+from typing import Dict, Iterable, List
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+
+from app.config import IMAGE_STORAGE, SEED_PACK_BATCH_SIZE
+from app.database import recipe_collection, ingredients_info_collection, cooking_step_collection, \
+    seed_pack_collection
+from app.utils.image_storage import IMAGE_URL_PREFIX, portable_image, read_image, store_image
+
+# 시드 팩에 담는 컬렉션 (레시피를 먼저 기록해야 조리 단계의 레시피 ID를 바꿀 수 있음)
+SEED_COLLECTIONS = {
+    "recipes": recipe_collection,
+    "ingredients_info": ingredients_info_collection,
+    "cooking_steps": cooking_step_collection,
+}
+
+
+async def _write_documents(file, name: str, cursor) -> int:
+    count = 0
+    async for document in cursor:
+        # GridFS에 저장된 이미지는 다른 인스턴스에서 읽을 수 없으므로 data URL로 바꿔서 기록
+        document["image_base64"] = await portable_image(document.get("image_base64"))
+        file.write(json_util.dumps({"collection": name, "document": document}) + "\n")
+        count += 1
+    return count
+
+
+async def write_seed_pack(path: str, recipe_names: Iterable[str], ingredient_names: Iterable[str],
+                          include_cooking_steps: bool = True) -> Dict[str, int]:
+    """
+    주어진 이름의 레시피, 식재료 정보, (선택적으로) 레시피의 조리 단계를 gzip 압축 NDJSON 시드 팩으로 기록합니다.
+    한 줄에 문서 하나씩 커서에서 읽는 대로 기록하므로 메모리 사용량은 문서 수와 관계없습니다.
+    """
+    recipe_names, ingredient_names = list(recipe_names), list(ingredient_names)
+    counts = {}
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        recipe_ids = [str(recipe["_id"]) async for recipe in
+                      recipe_collection.find({"name": {"$in": recipe_names}}, {"_id": 1})]
+        counts["recipes"] = await _write_documents(
+            file, "recipes", recipe_collection.find({"name": {"$in": recipe_names}}).batch_size(SEED_PACK_BATCH_SIZE))
+        counts["ingredients_info"] = await _write_documents(
+            file, "ingredients_info",
+            ingredients_info_collection.find({"name": {"$in": ingredient_names}}).batch_size(SEED_PACK_BATCH_SIZE))
+        if include_cooking_steps:
+            counts["cooking_steps"] = await _write_documents(
+                file, "cooking_steps",
+                cooking_step_collection.find({"recipe_id": {"$in": recipe_ids}}).batch_size(SEED_PACK_BATCH_SIZE))
+    return counts
+
+
+async def _existing_keys(name: str, documents: List[dict]) -> Dict[tuple, str]:
+    # 이미 저장된 같은 문서 (레시피와 식재료는 이름, 조리 단계는 레시피 ID와 단계 번호로 구분)
+    if name == "cooking_steps":
+        cursor = cooking_step_collection.find(
+            {"recipe_id": {"$in": list({document["recipe_id"] for document in documents})}},
+            {"recipe_id": 1, "step_number": 1})
+        return {(stored["recipe_id"], stored["step_number"]): str(stored["_id"]) async for stored in cursor}
+
+    cursor = SEED_COLLECTIONS[name].find({"name": {"$in": [document["name"] for document in documents]}},
+                                         {"name": 1})
+    return {(stored["name"],): str(stored["_id"]) async for stored in cursor}
+
+
+def _key(name: str, document: dict) -> tuple:
+    if name == "cooking_steps":
+        return document["recipe_id"], document["step_number"]
+    return (document["name"],)
+
+
+async def _insert_batch(name: str, documents: List[dict], recipe_ids: Dict[str, str]) -> int:
+    if name == "cooking_steps":
+        # 같은 이름의 레시피가 이미 있어 시드 팩의 레시피를 건너뛰었으면 기존 레시피에 연결
+        for document in documents:
+            document["recipe_id"] = recipe_ids.get(document["recipe_id"], document["recipe_id"])
+
+    existing = await _existing_keys(name, documents)
+    new_documents = []
+    for document in documents:
+        stored_id = existing.get(_key(name, document))
+        if name == "recipes":
+            recipe_ids[str(document["_id"])] = stored_id or str(document["_id"])
+        if stored_id:
+            continue
+        image = document.get("image_base64")
+        if IMAGE_STORAGE == "gridfs" and image and not image.startswith(IMAGE_URL_PREFIX):
+            document["image_base64"] = await store_image(*await read_image(image))
+        existing[_key(name, document)] = str(document["_id"])
+        new_documents.append(document)
+
+    if not new_documents:
+        return 0
+    try:
+        result = await SEED_COLLECTIONS[name].insert_many(new_documents, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # 같은 _id가 이미 있는 문서는 건너뜀
+        return e.details.get("nInserted", 0)
+
+
+async def load_seed_pack(path: str) -> None:
+    """
+    시드 팩의 문서 중 아직 없는 문서를 일괄 추가합니다.
+    같은 파일(이름, 크기, 수정 시각)은 한 번만 읽으며, 문서를 SEED_PACK_BATCH_SIZE개씩 나누어 순서 없이 삽입합니다.
+    """
+    if not path or not os.path.exists(path):
+        return
+
+    stat = os.stat(path)
+    pack_id = f"{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+    if await seed_pack_collection.find_one({"_id": pack_id}):
+        return
+
+    recipe_ids: Dict[str, str] = {}
+    counts = {name: 0 for name in SEED_COLLECTIONS}
+    batch: List[dict] = []
+    batch_name = None
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json_util.loads(line)
+            if batch and (record["collection"] != batch_name or len(batch) >= SEED_PACK_BATCH_SIZE):
+                counts[batch_name] += await _insert_batch(batch_name, batch, recipe_ids)
+                batch = []
+            batch_name = record["collection"]
+            document = record["document"]
+            document["_id"] = ObjectId(document["_id"]) if isinstance(document["_id"], str) else document["_id"]
+            batch.append(document)
+    if batch:
+        counts[batch_name] += await _insert_batch(batch_name, batch, recipe_ids)
+
+    await seed_pack_collection.insert_one({"_id": pack_id, "counts": counts})
+    logging.info(f"Loaded seed pack {path}: {counts}")
@@ -0,0 +1,212 @@
+import os
+import re
+import uuid
+import zlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from app.config import EMBEDDING_DIM, SIMILARITY_INDEX_PATH
+from app.database import recipe_collection
+
+_SPACES = re.compile(r"\s+")
+
+# 필드별 가중치 (이름과 재료가 설명보다 레시피의 성격을 더 잘 나타냄)
+_FIELD_WEIGHTS = (("name", 2.0), ("ingredients", 1.5), ("description", 1.0))
+
+# 실행 중에 추가되는 벡터 배열을 늘릴 때 한 번에 확보하는 최소 행 수
+_MIN_CAPACITY = 1024
+# 시작할 때 다시 임베딩할 레시피를 한 번에 읽는 수와, 저장할 때 한 번에 쓰는 행 수
+_LOAD_BATCH_SIZE = 1000
+_SAVE_BATCH_SIZE = 4096
+
+
+def _ngrams(text: str) -> Iterable[str]:
+    text = f" {_SPACES.sub(' ', text.strip().lower())} "
+    for size in (2, 3):
+        for start in range(len(text) - size + 1):
+            yield text[start:start + size]
+
+
+def embed_recipe(name: str, description: str, ingredient_names: Iterable[str]) -> np.ndarray:
+    """
+    이름, 설명, 재료 이름의 문자 n-gram을 해싱하여 고정 길이의 단위 벡터를 만듭니다.
+    외부 임베딩 서비스 없이 같은 입력에 항상 같은 벡터를 반환합니다.
+    """
+    texts = {"name": name, "description": description, "ingredients": " ".join(ingredient_names)}
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for field, weight in _FIELD_WEIGHTS:
+        grams = list(_ngrams(texts[field]))
+        if not grams:
+            continue
+        hashes = np.fromiter((zlib.crc32(f"{field}:{gram}".encode("utf-8")) for gram in grams),
+                             dtype=np.uint32, count=len(grams))
+        # 상위 비트로 부호를 정해 해시 충돌의 영향을 상쇄
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % EMBEDDING_DIM, signs * (weight / np.sqrt(len(grams))))
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SimilarityIndex:
+    """
+    레시피 임베딩의 최근접 이웃 색인입니다.
+    벡터는 스냅샷마다 새 이름의 파일에 쓰고, 레시피 ID와 ETag 목록 파일을 임시 파일에서 이름을 바꿔 교체하여
+    스냅샷을 확정합니다. 여러 워커가 동시에 저장해도 ID 목록은 항상 자기 벡터 파일과 짝이 맞습니다.
+    시작할 때 스냅샷을 메모리 매핑으로 열고, 삭제된 레시피는 빼고 바뀌었거나 없는 레시피만 다시 임베딩합니다.
+    실행 중에 추가한 레시피는 메모리에만 두고 종료할 때 저장합니다.
+    """
+
+    def __init__(self, path: str):
+        self._path = f"{path}.{EMBEDDING_DIM}"
+        self._ids_path = f"{self._path}.ids"
+        self._token: Optional[str] = None
+        # 스냅샷의 벡터 (쓰기 시 복사되는 메모리 매핑)와 그 뒤에 추가된 벡터
+        self._base = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._extra = np.zeros((_MIN_CAPACITY, EMBEDDING_DIM), dtype=np.float32)
+        self._ids: List[str] = []
+        self._etags: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._removed: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _vectors_path(self, token: str) -> str:
+        return f"{self._path}.{token}.f32"
+
+    def _read_snapshot(self) -> None:
+        if not os.path.exists(self._ids_path):
+            return
+        with open(self._ids_path, encoding="utf-8") as file:
+            token = file.readline().strip()
+            entries = [line.split() for line in file if line.strip()]
+        vectors_path = self._vectors_path(token)
+        row_size = EMBEDDING_DIM * np.dtype(np.float32).itemsize
+        if not entries or not os.path.exists(vectors_path) or os.path.getsize(vectors_path) != len(entries) * row_size:
+            # 짝이 맞는 벡터 파일이 없으면 처음부터 다시 임베딩
+            return
+        self._token = token
+        self._base = np.memmap(vectors_path, dtype=np.float32, mode="c", shape=(len(entries), EMBEDDING_DIM))
+        self._ids = [entry[0] for entry in entries]
+        self._etags = [entry[1] if len(entry) > 1 else "" for entry in entries]
+        self._positions = {recipe_id: position for position, recipe_id in enumerate(self._ids)}
+
+    async def load(self) -> None:
+        """
+        저장된 스냅샷을 열고 데이터베이스와 맞춥니다.
+        삭제된 레시피는 빼고, ETag가 달라진 레시피와 스냅샷에 없는 레시피만 임베딩한 뒤 바뀐 것이 있으면 다시 저장합니다.
+        """
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        self._read_snapshot()
+
+        stored = {str(recipe["_id"]): recipe.get("etag") or ""
+                  async for recipe in recipe_collection.find({}, {"etag": 1})}
+        for recipe_id in [recipe_id for recipe_id in self._positions if recipe_id not in stored]:
+            self.remove(recipe_id)
+        outdated = [recipe_id for recipe_id, etag in stored.items()
+                    if recipe_id not in self._positions or self._etags[self._positions[recipe_id]] != etag]
+
+        for start in range(0, len(outdated), _LOAD_BATCH_SIZE):
+            batch = [ObjectId(recipe_id) for recipe_id in outdated[start:start + _LOAD_BATCH_SIZE]]
+            async for recipe in recipe_collection.find(
+                    {"_id": {"$in": batch}}, {"name": 1, "description": 1, "ingredients.name": 1, "etag": 1}):
+                self.update(str(recipe["_id"]), recipe.get("name", ""), recipe.get("description", ""),
+                            [ingredient["name"] for ingredient in recipe.get("ingredients", [])],
+                            recipe.get("etag") or "")
+
+        if outdated or self._removed:
+            self.save()
+
+    def add(self, recipe_id: str, name: str, description: str, ingredient_names: Iterable[str],
+            etag: str = "") -> None:
+        """
+        레시피 하나를 임베딩하여 색인에 추가합니다. 이미 있는 레시피는 무시합니다.
+        """
+        if recipe_id in self._positions:
+            return
+        position = len(self._ids)
+        offset = position - len(self._base)
+        if offset >= len(self._extra):
+            self._extra = np.concatenate([self._extra, np.zeros_like(self._extra)])
+        self._extra[offset] = embed_recipe(name, description, ingredient_names)
+        self._ids.append(recipe_id)
+        self._etags.append(etag)
+        self._positions[recipe_id] = position
+
+    def update(self, recipe_id: str, name: str, description: str, ingredient_names: Iterable[str],
+               etag: str = "") -> None:
+        """
+        다시 생성된 레시피의 벡터를 같은 행에 덮어씁니다. 색인에 없는 레시피는 추가합니다.
+        """
+        position = self._positions.get(recipe_id)
+        if position is None:
+            self.add(recipe_id, name, description, ingredient_names, etag)
+            return
+        self._row(position)[:] = embed_recipe(name, description, ingredient_names)
+        self._etags[position] = etag
+
+    def remove(self, recipe_id: str) -> None:
+        """
+        삭제된 레시피를 검색 결과에서 제외합니다. 행은 다음에 저장할 때 빠집니다.
+        """
+        position = self._positions.pop(recipe_id, None)
+        if position is not None:
+            self._removed.add(position)
+
+    def _row(self, position: int) -> np.ndarray:
+        if position < len(self._base):
+            return self._base[position]
+        return self._extra[position - len(self._base)]
+
+    def save(self) -> None:
+        """
+        삭제된 행을 뺀 스냅샷을 새 벡터 파일에 쓰고, ID 목록 파일을 임시 파일에서 이름을 바꿔 교체합니다.
+        """
+        positions = [position for position in range(len(self._ids)) if position not in self._removed]
+        token = uuid.uuid4().hex
+        with open(self._vectors_path(token), "wb") as file:
+            for start in range(0, len(positions), _SAVE_BATCH_SIZE):
+                rows = np.stack([self._row(position) for position in positions[start:start + _SAVE_BATCH_SIZE]])
+                file.write(rows.astype(np.float32).tobytes())
+        ids_tmp = f"{self._ids_path}.{token}.tmp"
+        with open(ids_tmp, "w", encoding="utf-8") as file:
+            file.write(token + "\n")
+            file.write("".join(f"{self._ids[position]} {self._etags[position]}\n" for position in positions))
+        os.replace(ids_tmp, self._ids_path)
+
+        # 이전 스냅샷의 벡터 파일 정리 (다른 워커가 이미 지웠을 수 있음)
+        if self._token:
+            try:
+                os.remove(self._vectors_path(self._token))
+            except OSError:
+                pass
+        self._token = token
+
+    def contains(self, recipe_id: str) -> bool:
+        return recipe_id in self._positions
+
+    def similar(self, recipe_id: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        주어진 레시피와 코사인 유사도가 높은 순서로 (레시피 ID, 유사도)를 반환합니다.
+        """
+        position = self._positions[recipe_id]
+        query = np.array(self._row(position))
+        count = len(self._ids)
+        scores = np.concatenate([np.asarray(self._base @ query),
+                                 self._extra[:count - len(self._base)] @ query])
+        scores[position] = -np.inf
+        if self._removed:
+            scores[list(self._removed)] = -np.inf
+
+        limit = min(limit, len(self._positions) - 1)
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[index], float(scores[index])) for index in top]
+
+
+similarity_index = SimilarityIndex(SIMILARITY_INDEX_PATH)
@@ -0,0 +1,68 @@
+from typing import Tuple
+
+# 단위 → (기준 단위, 기준 단위로의 배율)
+# 부피 단위의 컵, 큰술, 작은술은 한국 계량 기준(1컵 = 200ml)을 따름
+_UNITS = {
+    "g": ("g", 1.0), "그램": ("g", 1.0), "gram": ("g", 1.0), "grams": ("g", 1.0),
+    "kg": ("g", 1000.0), "킬로그램": ("g", 1000.0),
+    "mg": ("g", 0.001), "밀리그램": ("g", 0.001),
+    "ml": ("ml", 1.0), "밀리리터": ("ml", 1.0), "cc": ("ml", 1.0),
+    "l": ("ml", 1000.0), "리터": ("ml", 1000.0),
+    "컵": ("ml", 200.0), "cup": ("ml", 200.0), "cups": ("ml", 200.0),
+    "큰술": ("ml", 15.0), "큰스푼": ("ml", 15.0), "tbsp": ("ml", 15.0), "T": ("ml", 15.0),
+    "작은술": ("ml", 5.0), "작은스푼": ("ml", 5.0), "tsp": ("ml", 5.0), "t": ("ml", 5.0),
+}
+
+
+def normalize_unit(amount: float, unit: str) -> Tuple[float, str]:
+    """
+    양과 단위를 기준 단위(무게는 g, 부피는 ml)로 바꿉니다.
+    개, 쪽, 장처럼 바꿀 수 없는 단위는 그대로 반환합니다.
+    """
+    unit = (unit or "").strip()
+    # 대소문자로 구분하는 T(큰술)와 t(작은술)를 먼저 확인
+    base = _UNITS.get(unit) or _UNITS.get(unit.lower())
+    if base is None:
+        return amount, unit
+    base_unit, factor = base
+    return amount * factor, base_unit
+
+
+# 숟가락, 컵으로 계량하는 단위 (바꿀 때도 같은 계량 도구 단위를 사용)
+_MEASURE_UNITS = (("컵", 200.0), ("큰술", 15.0), ("작은술", 5.0))
+
+
+def _round_to(amount: float, step: float) -> float:
+    return max(round(amount / step) * step, step)
+
+
+def _is_measure_unit(unit: str) -> bool:
+    base = _UNITS.get(unit) or _UNITS.get(unit.lower())
+    return base is not None and base[0] == "ml" and base[1] in {size for _, size in _MEASURE_UNITS}
+
+
+def to_display_unit(amount: float, unit: str, original_unit: str) -> Tuple[float, str]:
+    """
+    기준 단위의 양을 읽기 좋은 단위와 자릿수로 바꿉니다.
+    원래 단위가 컵이나 숟가락이면 컵, 큰술, 작은술 중 1 이상이 되는 가장 큰 단위를 사용합니다.
+    """
+    if amount <= 0:
+        return amount, unit
+
+    if unit == "g":
+        if amount >= 1000:
+            return round(amount / 1000, 2), "kg"
+        return (round(amount) if amount >= 10 else round(amount, 1)), "g"
+
+    if unit == "ml":
+        if _is_measure_unit(original_unit.strip()):
+            for name, size in _MEASURE_UNITS:
+                if amount >= size or name == "작은술":
+                    # 작은술은 1/4, 그 외에는 1/2 단위로 맞춤
+                    return _round_to(amount / size, 0.25 if name == "작은술" else 0.5), name
+        if amount >= 1000:
+            return round(amount / 1000, 2), "L"
+        return (round(amount) if amount >= 10 else round(amount, 1)), "ml"
+
+    # 개수 단위는 0.5개 단위로 맞춤
+    return _round_to(amount, 0.5), unit
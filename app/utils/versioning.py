@@ -0,0 +1,123 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from app.config import CHANGE_LOG_RETAINED_VERSIONS
+from app.database import versions_collection, change_log_collection
+
+# 삭제 기록 정리를 시도하는 버전 간격
+_PRUNE_INTERVAL = 100
+# 이보다 오래된 변경 로그 기록 중 표시는 서버가 중단되어 남은 것으로 보고 무시
+_PENDING_TIMEOUT = timedelta(seconds=60)
+
+# (변경 종류, 문서 ID, 변경 후 항목) — 변경 종류는 "upsert" 또는 "delete"
+Change = Tuple[str, str, Optional[dict]]
+
+
+def _version_key(user_id: str, name: str) -> str:
+    return f"{user_id}:{name}"
+
+
+async def get_version(user_id: str, name: str) -> int:
+    """
+    사용자 컬렉션의 현재 버전을 반환합니다. 한 번도 변경되지 않았다면 0입니다.
+    """
+    document = await versions_collection.find_one({"_id": _version_key(user_id, name)})
+    return document["version"] if document else 0
+
+
+async def bump_version(user_id: str, name: str) -> int:
+    """
+    사용자 컬렉션이 변경되었음을 기록하고 새 버전을 반환합니다.
+    """
+    document = await versions_collection.find_one_and_update(
+        {"_id": _version_key(user_id, name)},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return document["version"]
+
+
+async def reset_changes(user_id: str, name: str) -> int:
+    """
+    변경 로그를 거치지 않고 컬렉션이 바뀌었을 때 (데이터 가져오기 등) 버전을 올리고 기준 버전을 새 버전으로 올립니다.
+    이전 버전으로 요청하는 클라이언트는 전체 목록으로 다시 동기화합니다.
+    """
+    version = await bump_version(user_id, name)
+    await versions_collection.update_one({"_id": _version_key(user_id, name)}, {"$max": {"floor": version}})
+    return version
+
+
+async def record_changes(user_id: str, name: str, changes: List[Change]) -> int:
+    """
+    사용자 컬렉션 버전을 올리고 변경 로그에 변경 내용을 기록합니다.
+    문서마다 가장 최근 변경 하나만 남기므로 로그 크기는 변경량이 아닌 문서 수에 비례합니다.
+    변경 로그를 다 쓰기 전에는 진행 중 표시를 남겨, 읽는 쪽이 아직 기록되지 않은 버전을 넘어가지 않게 합니다.
+    """
+    key = _version_key(user_id, name)
+    pending = f"pending.{uuid.uuid4().hex}"
+    await versions_collection.update_one(
+        {"_id": key}, {"$set": {pending: {"started_at": datetime.now(timezone.utc)}}}, upsert=True)
+    try:
+        version = await bump_version(user_id, name)
+        await versions_collection.update_one({"_id": key}, {"$set": {f"{pending}.version": version}})
+        if changes:
+            await change_log_collection.bulk_write([
+                UpdateOne(
+                    {"user_id": user_id, "collection": name, "document_id": document_id},
+                    {"$set": {"version": version, "op": op, "document": document}},
+                    upsert=True,
+                )
+                for op, document_id, document in changes
+            ], ordered=False)
+    finally:
+        await versions_collection.update_one({"_id": key}, {"$unset": {pending: ""}})
+
+    # 오래된 삭제 기록을 정리하고, 그보다 이전 버전의 요청은 전체 동기화하도록 기준 버전을 올림
+    if version % _PRUNE_INTERVAL == 0 and version > CHANGE_LOG_RETAINED_VERSIONS:
+        floor = version - CHANGE_LOG_RETAINED_VERSIONS
+        await change_log_collection.delete_many(
+            {"user_id": user_id, "collection": name, "op": "delete", "version": {"$lte": floor}})
+        await versions_collection.update_one({"_id": key}, {"$max": {"floor": floor}})
+
+    return version
+
+
+def _complete_version(state: dict, since: int) -> int:
+    """
+    변경 로그가 모두 기록된 가장 높은 버전을 반환합니다.
+    진행 중인 기록이 있으면 그 버전 바로 앞까지만, 버전을 아직 받지 않은 기록이 있으면 since까지만 인정합니다.
+    서버가 중단되어 남은 오래된 진행 중 표시는 무시합니다.
+    """
+    version = state.get("version", 0)
+    expired = datetime.now(timezone.utc) - _PENDING_TIMEOUT
+    for entry in state.get("pending", {}).values():
+        if entry["started_at"].replace(tzinfo=timezone.utc) < expired:
+            continue
+        version = min(version, entry["version"] - 1 if "version" in entry else since)
+    return max(version, since)
+
+
+async def get_changes(user_id: str, name: str, since: int) -> Optional[Tuple[int, List[dict], List[str]]]:
+    """
+    since 버전 이후의 변경 내용을 (변경 로그가 모두 기록된 버전, 변경된 항목, 삭제된 ID) 형태로 반환합니다.
+    그 버전보다 나중의 변경이 함께 포함될 수 있지만 다음 요청에서 다시 보내므로 적용해도 문제없습니다.
+    삭제 기록이 이미 정리된 오래된 버전이거나 알 수 없는 버전이면 None을 반환하므로 전체 목록으로 응답해야 합니다.
+    """
+    state = await versions_collection.find_one({"_id": _version_key(user_id, name)}) or {}
+    if since < state.get("floor", 0) or since > state.get("version", 0):
+        return None
+    # 클라이언트는 반환한 버전부터 다시 요청하므로, 로그가 아직 기록되지 않은 버전은 넘어가지 않음
+    version = _complete_version(state, since)
+
+    entries = await change_log_collection.find(
+        {"user_id": user_id, "collection": name, "version": {"$gt": since}},
+        {"_id": 0, "op": 1, "document_id": 1, "document": 1}
+    ).to_list(length=None)
+
+    upserts = [entry["document"] for entry in entries if entry["op"] == "upsert"]
+    deletes = [entry["document_id"] for entry in entries if entry["op"] == "delete"]
+    return version, upserts, deletes
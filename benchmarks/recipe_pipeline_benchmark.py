@@ -0,0 +1,91 @@
+"""
+/recipe 생성에서 레시피 텍스트와 이미지를 순서대로 생성할 때와 겹쳐서 생성할 때의 소요 시간을 비교합니다.
+OpenAI 클라이언트를 지연 시간만 흉내 내는 가짜 클라이언트로 바꿔서 실제 API를 호출하지 않습니다.
+
+실행: python -m benchmarks.recipe_pipeline_benchmark
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import app.routes.recipe.recipe as recipe_route
+import app.utils.llm_utils as llm_utils
+from app.utils.cancellation import GenerationContext
+
+# 스트리밍 조각 하나당 지연 (초)와 조각 크기 (문자 수)
+CHUNK_DELAY = 0.02
+CHUNK_SIZE = 16
+# DALL·E 이미지 생성 지연 (초)
+IMAGE_DELAY = 2.0
+
+RECIPE = {
+    "name": "김치찌개",
+    "description": "잘 익은 김치와 돼지고기로 끓인 얼큰한 찌개",
+    "cookTime": "40분",
+    "servings": 2,
+    "nutrition": {"calories": 350, "protein": "20g", "carbohydrates": "15g", "fat": "22g"},
+    "ingredients": [{"name": name, "amount": 100, "unit": "g"}
+                    for name in ("김치", "돼지고기", "두부", "대파", "양파", "고춧가루", "마늘")],
+    "instructions": [{"step": step, "description": "재료를 넣고 중불에서 충분히 끓이며 간을 맞춥니다. " * 3}
+                     for step in range(1, 8)],
+}
+CONTENT = json.dumps(RECIPE, ensure_ascii=False)
+
+
+def _chunks():
+    return [CONTENT[start:start + CHUNK_SIZE] for start in range(0, len(CONTENT), CHUNK_SIZE)]
+
+
+class FakeStream:
+    def __init__(self, model: str):
+        self._model = model
+
+    def __aiter__(self):
+        return self._generate()
+
+    async def _generate(self):
+        for text in _chunks():
+            await asyncio.sleep(CHUNK_DELAY)
+            yield SimpleNamespace(model=self._model, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+async def fake_chat_create(model: str, messages, stream: bool = False, **kwargs):
+    if stream:
+        return FakeStream(model)
+    await asyncio.sleep(CHUNK_DELAY * len(_chunks()))
+    return SimpleNamespace(model=model, choices=[SimpleNamespace(message=SimpleNamespace(content=CONTENT))])
+
+
+async def fake_image_generate(**kwargs):
+    await asyncio.sleep(IMAGE_DELAY)
+    return SimpleNamespace(data=[SimpleNamespace(url="https://example.com/image.png")])
+
+
+FAKE_CLIENT = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fake_chat_create)),
+                              images=SimpleNamespace(generate=fake_image_generate))
+
+
+async def measure(pipelined: bool) -> float:
+    messages = [{"role": "user", "content": "김치찌개 레시피"}]
+    started = time.perf_counter()
+    content, _, image_url = await recipe_route.generate_recipe_content(messages, GenerationContext(), pipelined)
+    elapsed = time.perf_counter() - started
+    assert content == CONTENT and image_url
+    return elapsed
+
+
+async def main():
+    llm_utils.openai_client = FAKE_CLIENT
+    recipe_route.openai_client = FAKE_CLIENT
+
+    text_seconds = CHUNK_DELAY * len(_chunks())
+    print(f"text {text_seconds:.2f} s ({len(_chunks())} chunks), image {IMAGE_DELAY:.2f} s")
+    sequential = await measure(pipelined=False)
+    print(f"sequential: {sequential:.2f} s")
+    pipelined = await measure(pipelined=True)
+    print(f"pipelined:  {pipelined:.2f} s ({(1 - pipelined / sequential) * 100:.0f}% faster)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""
+냉장고 재료 기반 레시피 추천의 색인 구축 및 조회 시간을 측정합니다.
+
+실행: python -m benchmarks.recommend_benchmark
+"""
+import random
+import timeit
+
+from app.utils.recipe_index import RecipeIndex
+
+RECIPE_COUNT = 100_000
+VOCABULARY_SIZE = 3_000
+FRIDGE_SIZE = 40
+
+
+def build_index(rng: random.Random) -> RecipeIndex:
+    index = RecipeIndex()
+    for number in range(RECIPE_COUNT):
+        ingredients = [f"재료{rng.randrange(VOCABULARY_SIZE)}" for _ in range(rng.randint(5, 15))]
+        index.add(f"{number:024x}", f"레시피{number}", ingredients)
+    return index
+
+
+def main(number: int = 20):
+    rng = random.Random(0)
+    started = timeit.default_timer()
+    index = build_index(rng)
+    print(f"build {RECIPE_COUNT} recipes: {(timeit.default_timer() - started) * 1000:.1f} ms")
+
+    fridge = [f"재료{rng.randrange(VOCABULARY_SIZE // 10)}" for _ in range(FRIDGE_SIZE)]
+    index.recommend(fridge)  # 재료별 배열 캐시 준비
+
+    recommend_ms = min(timeit.repeat(lambda: index.recommend(fridge), number=number, repeat=3)) / number * 1000
+    print(f"recommend (top 10, {FRIDGE_SIZE} fridge items): {recommend_ms:.2f} ms")
+
+    named_ms = min(timeit.repeat(lambda: index.recommend(fridge, limit=1, min_coverage=0.5, name_contains="레시피1"),
+                                 number=number, repeat=3)) / number * 1000
+    print(f"pre-generation check (name filter): {named_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+캐시 적중 시 응답 직렬화 비용을 엔드포인트별로 비교합니다.
+
+기존 경로: 모델 생성 → 응답 모델로 감싸기 → FastAPI의 response_model 검증 및 직렬화 → json.dumps
+최적화 경로: 문서에서 필드만 골라 orjson으로 한 번 직렬화
+
+실행: python -m benchmarks.serialization_benchmark
+"""
+import json
+import timeit
+
+import orjson
+from bson import ObjectId
+
+from app.models.recipe.cooking_step_models import CookingStep, CookingStepResponse
+from app.models.recipe.ingredient_info_models import Ingredient, IngredientResponse
+from app.models.recipe.recipe_models import Recipe, RecipeResponse
+from app.utils.response_utils import pick_fields
+
+# 생성된 이미지와 비슷한 크기의 Base64 문자열 (약 2MB)
+IMAGE_BASE64 = "data:image/png;base64," + "A" * (2 * 1024 * 1024)
+
+RECIPE_DOCUMENT = {
+    "_id": ObjectId(),
+    "name": "김치찌개",
+    "description": "잘 익은 김치와 돼지고기로 끓인 한국의 대표적인 찌개입니다.",
+    "cookTime": "40분",
+    "servings": 2,
+    "nutrition": {"calories": 450, "protein": "25g", "carbohydrates": "20g", "fat": "28g"},
+    "ingredients": [{"name": f"재료{i}", "amount": 100.0, "unit": "g"} for i in range(12)],
+    "instructions": [{"step": i, "description": "재료를 손질하고 냄비에 넣어 끓입니다. " * 4} for i in range(1, 9)],
+    "image_base64": IMAGE_BASE64,
+}
+
+COOKING_STEP_DOCUMENT = {
+    "_id": ObjectId(),
+    "recipe_id": str(ObjectId()),
+    "step_number": 3,
+    "description": "중불에서 김치를 충분히 볶아 신맛을 날리고 감칠맛을 끌어올립니다. " * 10,
+    "image_base64": IMAGE_BASE64,
+}
+
+INGREDIENT_DOCUMENT = {
+    "_id": ObjectId(),
+    "name": "대파",
+    "description": "향이 강하고 단맛이 있어 국물 요리에 널리 쓰이는 채소입니다. " * 10,
+    "image_base64": IMAGE_BASE64,
+}
+
+
+def _fastapi_path(response_model, response):
+    # FastAPI가 response_model에 대해 수행하는 검증과 직렬화, 그리고 JSONResponse의 인코딩을 흉내냅니다
+    validated = response_model.model_validate(response.model_dump())
+    content = validated.model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def legacy_recipe():
+    document = dict(RECIPE_DOCUMENT)
+    image_base64 = document.pop("image_base64")
+    response = RecipeResponse(id=str(document["_id"]), recipe=Recipe(**document), image_base64=image_base64)
+    return _fastapi_path(RecipeResponse, response)
+
+
+def fast_recipe():
+    return orjson.dumps({
+        "id": str(RECIPE_DOCUMENT["_id"]),
+        "recipe": pick_fields(RECIPE_DOCUMENT, Recipe),
+        "image_base64": RECIPE_DOCUMENT["image_base64"],
+    })
+
+
+def legacy_cooking_step():
+    response = CookingStepResponse(id=str(COOKING_STEP_DOCUMENT["_id"]),
+                                   cooking_step=CookingStep(**COOKING_STEP_DOCUMENT),
+                                   image_base64=COOKING_STEP_DOCUMENT["image_base64"])
+    return _fastapi_path(CookingStepResponse, response)
+
+
+def fast_cooking_step():
+    return orjson.dumps({
+        "id": str(COOKING_STEP_DOCUMENT["_id"]),
+        "cooking_step": pick_fields(COOKING_STEP_DOCUMENT, CookingStep),
+        "image_base64": COOKING_STEP_DOCUMENT["image_base64"],
+    })
+
+
+def legacy_ingredient_info():
+    document = dict(INGREDIENT_DOCUMENT)
+    image_base64 = document.pop("image_base64")
+    ingredient_id = str(document.pop("_id"))
+    response = IngredientResponse(ingredient=Ingredient(**document), image_base64=image_base64, id=ingredient_id)
+    return _fastapi_path(IngredientResponse, response)
+
+
+def fast_ingredient_info():
+    return orjson.dumps({
+        "id": str(INGREDIENT_DOCUMENT["_id"]),
+        "ingredient": pick_fields(INGREDIENT_DOCUMENT, Ingredient),
+        "image_base64": INGREDIENT_DOCUMENT["image_base64"],
+    })
+
+
+BENCHMARKS = {
+    "POST /recipe": (legacy_recipe, fast_recipe),
+    "POST /recipe/cooking-step": (legacy_cooking_step, fast_cooking_step),
+    "POST /recipe/ingredient-info": (legacy_ingredient_info, fast_ingredient_info),
+}
+
+
+def main(number: int = 50):
+    print(f"{'endpoint':<32}{'legacy (ms)':>14}{'fast (ms)':>14}{'speedup':>10}")
+    for endpoint, (legacy, fast) in BENCHMARKS.items():
+        assert json.loads(legacy()) == json.loads(fast())
+        legacy_ms = min(timeit.repeat(legacy, number=number, repeat=3)) / number * 1000
+        fast_ms = min(timeit.repeat(fast, number=number, repeat=3)) / number * 1000
+        print(f"{endpoint:<32}{legacy_ms:>14.3f}{fast_ms:>14.3f}{legacy_ms / fast_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import pytest
+
+chat_intents = pytest.importorskip("app.utils.chat_intents")
+
+RECIPE = {
+    "name": "김치찌개",
+    "cookTime": "40분",
+    "servings": 2,
+    "nutrition": {"calories": 450, "protein": "25g", "carbohydrates": "20g", "fat": "28g"},
+    "ingredients": [
+        {"name": "김치", "amount": 300, "unit": "g"},
+        {"name": "양파", "amount": 1, "unit": "개"},
+        {"name": "마늘", "amount": 3, "unit": "쪽"},
+    ],
+    "instructions": [{"step": step, "description": f"{step}단계 설명"} for step in range(1, 6)],
+}
+
+
+@pytest.mark.parametrize("question", [
+    "칼로리 낮추려면?",
+    "지방 빼고 만들 수 있나요?",
+    "단백질 보충하려면 뭘 더 넣을까요?",
+    "저탄수화물로 하려면?",
+    "몇 분 끓여요?",
+    "김치 몇 분 볶아요?",
+    "3단계에서 몇 분 끓여요?",
+    "양파가 꼭 필요해요?",
+    "마늘 넣는 타이밍이 언제예요?",
+    "마늘은 2번 나눠 넣어요?",
+])
+def test_open_questions_go_to_model(question):
+    assert chat_intents.answer_locally(question, RECIPE) is None
+
+
+@pytest.mark.parametrize("question, intent, answer", [
+    ("조리 시간이 얼마나 걸려요?", "cook_time", "김치찌개는 총 40분 정도 걸립니다."),
+    ("칼로리가 얼마예요?", "nutrition", "김치찌개는 1인분 기준 450kcal입니다."),
+    ("김치 얼마나 넣어요?", "ingredient_amount", "김치는 300g 넣으면 됩니다."),
+    ("3단계 알려주세요", "step", "3단계: 3단계 설명"),
+])
+def test_stored_facts_answered_locally(question, intent, answer):
+    assert chat_intents.answer_locally(question, RECIPE) == (intent, answer)
@@ -0,0 +1,29 @@
+import pytest
+
+nutrition_utils = pytest.importorskip("app.utils.nutrition_utils")
+
+
+@pytest.mark.parametrize("value, minutes", [
+    ("45분", 45),
+    ("1시간 30분", 90),
+    ("1시간 반", 90),
+    ("2시간", 120),
+    ("30분~40분", 40),
+    ("30~40분", 40),
+    ("1-2시간", 120),
+    ("1시간~1시간 30분", 90),
+    ("1h30m", 90),
+    ("1h 30m", 90),
+    ("45 min", 45),
+    ("1.5 hours", 90),
+    ("30 to 40 minutes", 40),
+    ("40", 40),
+    (25, 25),
+])
+def test_parse_cook_time(value, minutes):
+    assert nutrition_utils.parse_cook_time(value) == minutes
+
+
+@pytest.mark.parametrize("value", [None, "", "적당히"])
+def test_parse_cook_time_unknown(value):
+    assert nutrition_utils.parse_cook_time(value) is None